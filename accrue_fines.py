@@ -0,0 +1,49 @@
+"""
+Nightly overdue fine accrual for Library Management System
+Brings the fine on every overdue open loan up to date in one transaction.
+Safe to rerun: a second run for the same day changes nothing.
+
+Usage:
+    python accrue_fines.py                      # accrue as of today
+    python accrue_fines.py --date 2024-05-01 --fine-per-day 0.5
+    python accrue_fines.py --metrics-file /var/lib/node_exporter/library_accrual.prom
+"""
+import argparse
+import os
+from datetime import date
+
+from database import init_database, migrate_database, DATABASE_FILE
+from db_operations import FineManager
+import metrics
+
+
+def print_summary(summary):
+    """Print the accrual summary"""
+    print(f"✓ Accrued fines as of {summary['as_of']} in {summary['elapsed']:.2f}s")
+    print(f"  Overdue loans: {summary['overdue_loans']:,}")
+    print(f"  Fines created: {summary['created']:,}, updated: {summary['updated']:,}")
+    print(f"  Added to member balances: ${summary['amount_added']:,.2f}")
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Accrue day-based fines on overdue loans")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="accrue as of this day (YYYY-MM-DD, default today)")
+    parser.add_argument("--fine-per-day", type=float, default=1.0, help="fine per whole day overdue")
+    parser.add_argument("--metrics-file", default=None,
+                        help="write the run's metrics here in the Prometheus text format (textfile collector)")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATABASE_FILE):
+        init_database()
+    else:
+        migrate_database()
+
+    print_summary(FineManager.accrue_overdue_fines(args.date, args.fine_per_day))
+    if args.metrics_file:
+        metrics.write_textfile(args.metrics_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Asyncio facade over the database operations for Library Management System
+Every call runs the matching synchronous manager method on a bounded pool of
+database threads, so the event loop never blocks on SQLite.
+
+Usage:
+    books = await AsyncBookManager.search_books("dune")
+    success, message = await AsyncBorrowingManager.borrow_book(member_id, book_id)
+    async for book in AsyncBookManager.iter_books():
+        ...
+"""
+import asyncio
+import contextvars
+import functools
+import inspect
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from db_operations import BookManager, MemberManager, BorrowingManager, FineManager, ReportManager
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Get the database thread pool, sized to the connection pool
+
+    Each worker keeps reusing the pooled connection it had last, so with no more
+    workers than connections a call never waits for a free connection.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=database.POOL_MAX_SIZE, thread_name_prefix="library-db")
+        return _executor
+
+
+def shutdown_executor(wait=True):
+    """Stop the database threads; queued calls that haven't started are cancelled"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def run_in_db_thread(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on a database thread and return an awaitable for its result
+
+    Cancelling the await before the call starts keeps it from ever running. Once
+    started, the manager call runs to completion (committing or rolling back as a
+    whole) and only its result is discarded. The call sees the caller's context,
+    so it runs on the branch chosen with database.use_branch().
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+async def iterate_in_db_thread(generator_func, *args, chunk_size=500, **kwargs):
+    """Async-iterate a manager generator, pulling chunk_size items per trip to a database thread"""
+    iterator = generator_func(*args, **kwargs)
+    while True:
+        chunk = await run_in_db_thread(list, itertools.islice(iterator, chunk_size))
+        for item in chunk:
+            yield item
+        if len(chunk) < chunk_size:
+            return
+
+
+def _async_method(func):
+    """Wrap one manager method: coroutine for plain methods, async generator for generators"""
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def method(*args, **kwargs):
+            return iterate_in_db_thread(func, *args, **kwargs)
+    else:
+        @functools.wraps(func)
+        async def method(*args, **kwargs):
+            return await run_in_db_thread(func, *args, **kwargs)
+    return staticmethod(method)
+
+
+def async_facade(manager):
+    """Build an Async<Manager> class exposing every public method of manager as awaitable"""
+    methods = {name: _async_method(getattr(manager, name))
+               for name, member in vars(manager).items()
+               if isinstance(member, staticmethod) and not name.startswith("_")}
+    methods["__doc__"] = f"Awaitable {manager.__name__} operations run on the database thread pool"
+    return type(f"Async{manager.__name__}", (), methods)
+
+
+AsyncBookManager = async_facade(BookManager)
+AsyncMemberManager = async_facade(MemberManager)
+AsyncBorrowingManager = async_facade(BorrowingManager)
+AsyncFineManager = async_facade(FineManager)
+AsyncReportManager = async_facade(ReportManager)
@@ -0,0 +1,809 @@
+"""
+Performance benchmarks for Library Management System
+Each benchmark runs against a throwaway database and prints its results.
+
+Usage:
+    python benchmark.py            # run every benchmark
+    python benchmark.py pool       # run selected benchmarks by name
+"""
+import asyncio
+import csv
+import http.client
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager
+
+import database
+import db_operations
+import metrics
+from database import init_database, close_pool, use_branch
+from db_operations import BookManager, MemberManager, BorrowingManager, FineManager, ReportManager, BranchManager
+from models import Book, Member, BorrowingRecord
+from async_operations import AsyncBookManager, AsyncMemberManager, shutdown_executor
+from http_service import make_server
+from init_sample_data import generate_library
+from parallel_reports import circulation_report
+from export import export_tables
+
+
+@contextmanager
+def temp_database():
+    """Point the application at a fresh database file for the duration of a benchmark"""
+    original = database.DATABASE_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_FILE = os.path.join(tmp, "benchmark.db")
+        init_database()
+        try:
+            yield database.DATABASE_FILE
+        finally:
+            close_pool()
+            database.DATABASE_FILE = original
+
+
+@contextmanager
+def quiet():
+    """Silence the managers' progress and error prints"""
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        yield
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+@contextmanager
+def caches_disabled():
+    """Turn off the by-ID row caches so every lookup goes to the database"""
+    sizes = {cache: cache.max_size for cache in (db_operations.book_cache, db_operations.member_cache)}
+    for cache in sizes:
+        cache.clear()
+        cache.max_size = 0
+    try:
+        yield
+    finally:
+        for cache, size in sizes.items():
+            cache.max_size = size
+            cache.reset_stats()
+
+
+def measure(func, ops):
+    """Call func() ops times and return operations per second"""
+    start = time.perf_counter()
+    for _ in range(ops):
+        func()
+    elapsed = time.perf_counter() - start
+    return ops / elapsed if elapsed else float("inf")
+
+
+def timed(func):
+    """Run func() once and return elapsed seconds"""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def print_result(label, before, after, unit="ops/sec"):
+    """Print a before/after comparison line"""
+    print(f"  {label:<28} before: {before:>12,.0f} {unit}   after: {after:>12,.0f} {unit}   "
+          f"speedup: {after / before:.1f}x")
+
+
+def bench_connection_pool(ops=5000):
+    """Connect-per-call vs pooled connections for BookManager.get_book_by_id"""
+    print("Connection pool: BookManager.get_book_by_id")
+    with temp_database() as path:
+        with quiet():
+            for i in range(100):
+                BookManager.add_book(Book(f"Title {i}", f"Author {i}", f"isbn-{i}", 2000, 2, "Fiction"))
+
+        def lookup():
+            BookManager.get_book_by_id(50)
+
+        with caches_disabled():
+            # "Before": a brand-new sqlite3 connection for every call
+            pooled = database.get_connection
+            database.get_connection = lambda: sqlite3.connect(path)
+            try:
+                before = measure(lookup, ops)
+            finally:
+                database.get_connection = pooled
+
+            after = measure(lookup, ops)
+        print_result("get_book_by_id", before, after)
+        print(f"  Pool status: {database.get_pool().status()}")
+
+
+WORDS = ["history", "garden", "river", "night", "empire", "secret", "winter", "stone", "ocean", "machine",
+         "shadow", "silver", "kingdom", "letters", "journey", "science", "island", "mirror", "forest", "crown"]
+NAMES = ["Smith", "Garcia", "Okafor", "Tanaka", "Muller", "Rossi", "Novak", "Silva", "Kowalski", "Ivanova"]
+CATEGORIES = ["Fiction", "Science", "History", "Fantasy", "Biography", "Romance", "Mystery", "Self-Help"]
+
+
+def insert_books(path, count, seed=1):
+    """Insert count generated books straight into the database"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executemany("""
+        INSERT INTO books (title, author, isbn, publication_year, quantity, available_quantity, category)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, ((f"{rng.choice(WORDS).title()} of the {rng.choice(WORDS).title()} {i}",
+           f"{rng.choice(NAMES)} {rng.choice(NAMES)}",
+           f"978-{i:010d}", rng.randint(1900, 2024), 3, 3, rng.choice(CATEGORIES))
+          for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def insert_members(path, count):
+    """Insert count generated members straight into the database"""
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO members (name, email, outstanding_fine) VALUES (?, ?, ?)",
+                     ((f"Member {i}", f"member{i}@example.com", (i % 7) * 0.5) for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def insert_borrowings(path, count, books, members, seed=3):
+    """Insert count active loans, a fifth of them overdue, and take the copies off the shelf"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    loans = [(rng.randint(1, members), rng.randint(1, books),
+              now - timedelta(days=rng.randint(1, 30)),
+              now + timedelta(days=rng.randint(-10, 40)))
+             for _ in range(count)]
+    conn = sqlite3.connect(path)
+    conn.executemany("""
+        INSERT INTO borrowing (member_id, book_id, borrow_date, due_date, status)
+        VALUES (?, ?, ?, ?, 'borrowed')
+    """, loans)
+    conn.executemany("UPDATE books SET available_quantity = available_quantity - 1 WHERE book_id = ?",
+                     ((book_id,) for _, book_id, _, _ in loans))
+    conn.commit()
+    conn.close()
+
+
+def bench_search(books=50000, ops=200):
+    """LIKE '%term%' scan vs FTS5 prefix search for BookManager.search_books"""
+    print(f"Catalog search: BookManager.search_books over {books:,} books")
+    with temp_database() as path:
+        insert_books(path, books)
+
+        def search():
+            BookManager.search_books("kingdom tanaka", limit=20)
+
+        # "Before": no FTS5, so search falls back to LIKE scans
+        db_operations.FTS5_AVAILABLE = False
+        try:
+            before = measure(search, ops)
+        finally:
+            db_operations.FTS5_AVAILABLE = database.FTS5_AVAILABLE
+
+        after = measure(search, ops)
+        print_result("search_books", before, after)
+
+
+def bench_bulk_import(books=20000):
+    """Per-row add_book loop vs BookManager.add_books_bulk"""
+    print(f"Catalog ingestion: {books:,} books")
+    rng = random.Random(2)
+    feed = [Book(f"{rng.choice(WORDS).title()} {i}", rng.choice(NAMES), f"978{i:010d}", 2000, 1, rng.choice(CATEGORIES))
+            for i in range(books)]
+
+    with temp_database():
+        start = time.perf_counter()
+        with quiet():
+            for book in feed:
+                BookManager.add_book(book)
+        before = books / (time.perf_counter() - start)
+
+    with temp_database():
+        summary = BookManager.add_books_bulk(feed, batch_size=5000)
+        after = summary["rows_per_sec"]
+    print_result("add_books_bulk", before, after, unit="rows/sec")
+
+
+def bench_bulk_members(members=100000):
+    """Per-row add_member loop vs MemberManager.add_members_bulk"""
+    print(f"Member enrollment: {members:,} members")
+    roster = [Member(f"Student {i}", f"student{i}@uni.edu", f"555-{i:07d}", f"{i} Campus Way")
+              for i in range(members)]
+
+    with temp_database():
+        start = time.perf_counter()
+        with quiet():
+            for member in roster:
+                MemberManager.add_member(member)
+        before = members / (time.perf_counter() - start)
+
+    with temp_database():
+        summary = MemberManager.add_members_bulk(roster, batch_size=5000)
+        after = summary["rows_per_sec"]
+    print_result("add_members_bulk", before, after, unit="rows/sec")
+
+
+def legacy_borrow_book(path, member_id, book_id, borrow_duration_days=14):
+    """The old checkout: read on one connection, then insert and decrement with two commits"""
+    conn = sqlite3.connect(path, timeout=30)
+    row = conn.execute("SELECT available_quantity FROM books WHERE book_id = ?", (book_id,)).fetchone()
+    conn.close()
+    if not row or row[0] <= 0:
+        return False
+    borrowing = BorrowingRecord(member_id, book_id, borrow_duration_days)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("""
+        INSERT INTO borrowing (member_id, book_id, borrow_date, due_date, status)
+        VALUES (?, ?, ?, ?, ?)
+    """, (member_id, book_id, borrowing.borrow_date, borrowing.due_date, borrowing.status))
+    conn.commit()
+    conn.execute("UPDATE books SET available_quantity = available_quantity - 1 WHERE book_id = ?", (book_id,))
+    conn.commit()
+    conn.close()
+    return True
+
+
+def run_desks(borrow, desks, attempts):
+    """Run borrow() from several threads at once; return (successes, elapsed seconds)"""
+    results = []
+
+    def desk():
+        for _ in range(attempts):
+            results.append(borrow())
+
+    threads = [threading.Thread(target=desk) for _ in range(desks)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.count(True), time.perf_counter() - start
+
+
+def bench_checkout(desks=4, attempts=500, copies=1000):
+    """Legacy three-connection checkout vs single-transaction borrow_book under concurrency"""
+    print(f"Checkout: {desks} desks x {attempts} attempts on a book with {copies} copies")
+    outcomes = {}
+    for label in ("before", "after"):
+        with temp_database() as path:
+            book = Book("Contested Title", "Popular Author", None, 2024, copies, "Fiction")
+            member = Member("Busy Reader")
+            BookManager.add_book(book)
+            MemberManager.add_member(member)
+            if label == "before":
+                borrow = lambda: legacy_borrow_book(path, member.member_id, book.book_id)
+            else:
+                borrow = lambda: BorrowingManager.borrow_book(member.member_id, book.book_id)[0]
+            successes, elapsed = run_desks(borrow, desks, attempts)
+            available = BookManager.get_book_by_id(book.book_id).available_quantity
+            outcomes[label] = (desks * attempts / elapsed, successes, available)
+    before, after = outcomes["before"], outcomes["after"]
+    print_result("borrow_book", before[0], after[0])
+    for label, (_, successes, available) in outcomes.items():
+        print(f"  {label:<7} successful loans: {successes:>5}   available copies afterwards: {available}")
+
+
+def peak_memory(func):
+    """Run func() and return (peak traced memory in MB, elapsed seconds)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6, elapsed
+
+
+def bench_streaming(books=200000):
+    """get_all_books (full list) vs iter_books (keyset pages) peak memory"""
+    print(f"Full table read: {books:,} books")
+    with temp_database() as path:
+        insert_books(path, books)
+
+        def load_all():
+            for book in BookManager.get_all_books():
+                pass
+
+        def stream():
+            for book in BookManager.iter_books():
+                pass
+
+        for label, func in (("get_all_books", load_all), ("iter_books", stream)):
+            peak, elapsed = peak_memory(func)
+            print(f"  {label:<28} peak memory: {peak:>8.1f} MB   time: {elapsed:.2f}s   "
+                  f"({books / elapsed:,.0f} rows/sec)")
+
+
+class LegacyBook:
+    """The old dict-backed Book, whose __init__ stamps created_at with datetime.now()"""
+    def __init__(self, title, author, isbn=None, publication_year=None, quantity=1, category=None):
+        self.book_id = None
+        self.title = title
+        self.author = author
+        self.isbn = isbn
+        self.publication_year = publication_year
+        self.quantity = quantity
+        self.available_quantity = quantity
+        self.category = category
+        self.created_at = datetime.now()
+
+
+def legacy_get_all_books():
+    """The old get_all_books: fetch tuples, then copy fields out by position"""
+    with database.pooled_connection() as conn:
+        rows = conn.execute("SELECT * FROM books").fetchall()
+    books = []
+    for row in rows:
+        book = LegacyBook(row[1], row[2], row[3], row[4], row[5], row[7])
+        book.book_id = row[0]
+        book.available_quantity = row[6]
+        books.append(book)
+    return books
+
+
+def bench_row_models(books=1000000):
+    """Positional dict-backed models vs slot models built by the row factory"""
+    print(f"Materializing {books:,} book rows")
+    with temp_database() as path:
+        insert_books(path, books)
+        for label, func in (("tuples + dict models", legacy_get_all_books),
+                            ("row factory + slots", BookManager.get_all_books)):
+            elapsed = min(timed(func) for _ in range(3))
+            peak, _ = peak_memory(func)
+            print(f"  {label:<28} peak memory: {peak:>8.1f} MB   time: {elapsed:.2f}s   "
+                  f"({books / elapsed:,.0f} rows/sec)")
+
+
+def legacy_report():
+    """The old show_reports: load every row, then count in Python"""
+    books = BookManager.get_all_books()
+    members = MemberManager.get_all_members()
+    active_borrowings = BorrowingManager.get_all_borrowings()
+    overdue = BorrowingManager.get_overdue_books()
+    categories = {}
+    for book in books:
+        cat = book.category or "Uncategorized"
+        categories[cat] = categories.get(cat, 0) + 1
+    return (len(books), sum(b.available_quantity for b in books), sum(b.quantity - b.available_quantity for b in books),
+            len(members), len([m for m in members if m.membership_status == 'active']),
+            sum(m.outstanding_fine for m in members), len(active_borrowings), len(overdue),
+            sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5])
+
+
+def bench_reports(books=200000, members=50000, loans=20000):
+    """Python-loop show_reports vs the counter-backed ReportManager.get_dashboard_stats"""
+    print(f"Dashboard report: {books:,} books, {members:,} members, {loans:,} active loans")
+    with temp_database() as path:
+        insert_books(path, books)
+        insert_members(path, members)
+        insert_borrowings(path, loans, books, members)
+        before = timed(legacy_report)
+        after = min(timed(ReportManager.get_dashboard_stats) for _ in range(5))
+        print(f"  {'report':<28} before: {before * 1000:>10,.1f} ms   after: {after * 1000:>10,.1f} ms   "
+              f"speedup: {before / after:.0f}x")
+        recount = timed(ReportManager.check_stats)
+        print(f"  {'full recount (check_stats)':<28} {recount * 1000:>10,.1f} ms")
+
+
+def legacy_member_details(member_id):
+    """The old view_member_details: member, loans and fines on separate connections, then a book lookup per loan"""
+    member = MemberManager.get_member_by_id(member_id)
+    loans = [(borrow, BookManager.get_book_by_id(borrow.book_id))
+             for borrow in BorrowingManager.get_active_borrowings(member_id)]
+    fines = [f for f in FineManager.get_member_fines(member_id) if not f.paid]
+    return member, loans, fines
+
+
+def bench_member_dashboard(loans=200, ops=200):
+    """Per-loan lookups vs MemberManager.get_member_dashboard for a member with many loans"""
+    print(f"Member details: {loans:,} active loans on one member")
+    with temp_database() as path:
+        insert_books(path, loans)
+        insert_members(path, 1)
+        insert_borrowings(path, loans, loans, 1)
+        before = measure(lambda: legacy_member_details(1), ops)
+        after = measure(lambda: MemberManager.get_member_dashboard(1), ops)
+        print(f"  {'view member details':<28} before: {1000 / before:>10,.2f} ms   after: {1000 / after:>10,.2f} ms   "
+              f"speedup: {after / before:.1f}x")
+
+
+def bench_lookup_cache(books=10000, ops=50000):
+    """Uncached vs LRU-cached get_book_by_id / get_member_by_id on a skewed workload"""
+    print(f"Lookup cache: {books:,} books and members, {ops:,} lookups skewed toward popular IDs")
+    with temp_database() as path:
+        insert_books(path, books)
+        insert_members(path, books)
+        rng = random.Random(7)
+        # Roughly 80% of lookups go to 10% of the IDs, like a desk serving regulars
+        ids = [rng.randint(1, books // 10) if rng.random() < 0.8 else rng.randint(1, books) for _ in range(ops)]
+        lookups = iter(())
+
+        def lookup():
+            book_id = next(lookups)
+            BookManager.get_book_by_id(book_id)
+            MemberManager.get_member_by_id(book_id)
+
+        with caches_disabled():
+            lookups = iter(ids)
+            before = measure(lookup, ops)
+        lookups = iter(ids)
+        after = measure(lookup, ops)
+        print_result("get_book/member_by_id", before, after)
+        print(f"  Book cache:   {db_operations.book_cache.status()}")
+        print(f"  Member cache: {db_operations.member_cache.status()}")
+
+
+def legacy_accrue_fines(path, as_of, fine_per_day=1.0):
+    """Row-at-a-time accrual: one lookup, fine write and balance update per overdue loan"""
+    conn = sqlite3.connect(path)
+    midnight = datetime.combine(as_of, datetime.min.time())
+    overdue = conn.execute("""
+        SELECT borrow_id, member_id, due_date FROM borrowing
+        WHERE status = 'borrowed' AND due_date < ?
+    """, (str(midnight),)).fetchall()
+    for borrow_id, member_id, due_date in overdue:
+        days = (midnight - datetime.fromisoformat(due_date)).days
+        if days < 1:
+            continue
+        amount = days * fine_per_day
+        row = conn.execute("SELECT fine_id, amount FROM fines WHERE borrow_id = ? AND accrued_date IS NOT NULL",
+                           (borrow_id,)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO fines (member_id, borrow_id, amount, reason, accrued_date) VALUES (?, ?, ?, ?, ?)",
+                         (member_id, borrow_id, amount, f"Overdue fine - {days} days overdue (accrued)", str(as_of)))
+            delta = amount
+        else:
+            conn.execute("UPDATE fines SET amount = ?, accrued_date = ? WHERE fine_id = ?", (amount, str(as_of), row[0]))
+            delta = amount - row[1]
+        conn.execute("UPDATE members SET outstanding_fine = outstanding_fine + ? WHERE member_id = ?", (delta, member_id))
+    conn.commit()
+    conn.close()
+
+
+def bench_fine_accrual(loans=1000000, books=100000, members=50000):
+    """Row-at-a-time accrual vs the set-based FineManager.accrue_overdue_fines"""
+    print(f"Overdue fine accrual: {loans:,} open loans")
+    today = datetime.now().date()
+    timings = {}
+    for label in ("row-at-a-time", "set-based"):
+        with temp_database() as path:
+            insert_books(path, books)
+            insert_members(path, members)
+            insert_borrowings(path, loans, books, members)
+            if label == "row-at-a-time":
+                timings[label] = timed(lambda: legacy_accrue_fines(path, today))
+            else:
+                summary = FineManager.accrue_overdue_fines(today)
+                timings[label] = summary["elapsed"]
+                rerun = FineManager.accrue_overdue_fines(today)
+                next_day = FineManager.accrue_overdue_fines(today + timedelta(days=1))
+    print(f"  {'first run':<28} before: {timings['row-at-a-time']:>8.2f} s   after: {timings['set-based']:>8.2f} s   "
+          f"speedup: {timings['row-at-a-time'] / timings['set-based']:.1f}x   ({summary['overdue_loans']:,} overdue loans)")
+    print(f"  {'same-day rerun':<28} {rerun['elapsed']:.2f} s, ${rerun['amount_added']:,.2f} added")
+    print(f"  {'next day':<28} {next_day['elapsed']:.2f} s, {next_day['updated']:,} fines updated")
+
+
+def run_requests(handler, requests, concurrency=64):
+    """Serve requests through handler(term, member_id) from an event loop
+
+    Returns (requests/sec, longest event loop stall in ms) measured by a 1 ms ticker.
+    """
+    async def serve():
+        stall = 0.0
+        done = False
+
+        async def ticker():
+            nonlocal stall
+            last = time.perf_counter()
+            while not done:
+                await asyncio.sleep(0.001)
+                now = time.perf_counter()
+                stall = max(stall, now - last - 0.001)
+                last = now
+
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(request):
+            async with limit:
+                await handler(*request)
+
+        tick = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        await asyncio.gather(*(one(request) for request in requests))
+        elapsed = time.perf_counter() - start
+        done = True
+        await tick
+        return len(requests) / elapsed, stall * 1000
+
+    return asyncio.run(serve())
+
+
+def bench_async(books=50000, members=5000, requests=2000):
+    """Sync managers called from the event loop vs the async facade on the database threads"""
+    print(f"Concurrent kiosk requests: {requests:,} search + member dashboard lookups")
+    with temp_database() as path:
+        insert_books(path, books)
+        insert_members(path, members)
+        insert_borrowings(path, members * 4, books, members)
+        rng = random.Random(11)
+        workload = [(f"{rng.choice(WORDS)} {rng.choice(WORDS)[:3]}", rng.randint(1, members)) for _ in range(requests)]
+
+        async def sync_handler(term, member_id):
+            BookManager.search_books(term, limit=20)
+            MemberManager.get_member_dashboard(member_id)
+
+        async def async_handler(term, member_id):
+            await asyncio.gather(AsyncBookManager.search_books(term, limit=20),
+                                 AsyncMemberManager.get_member_dashboard(member_id))
+
+        before, before_stall = run_requests(sync_handler, workload)
+        after, after_stall = run_requests(async_handler, workload)
+        shutdown_executor()
+        print_result("requests", before, after, "req/sec")
+        print(f"  {'longest event loop stall':<28} before: {before_stall:>10,.1f} ms   after: {after_stall:>10,.1f} ms")
+
+
+def load_test(port, paths, clients, keep_alive):
+    """Send paths from client threads, each reusing one connection or opening one per request
+
+    Returns (requests/sec, sorted latencies in ms).
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def client(share):
+        mine = []
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        for path in share:
+            start = time.perf_counter()
+            connection.request("GET", path, headers={} if keep_alive else {"Connection": "close"})
+            connection.getresponse().read()
+            mine.append((time.perf_counter() - start) * 1000)
+            if not keep_alive:
+                connection.close()
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(paths[i::clients],)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(paths) / (time.perf_counter() - start), sorted(latencies)
+
+
+def bench_http(books=50000, members=5000, requests=5000, clients=16):
+    """Connection per request vs keep-alive clients against the threaded HTTP service"""
+    print(f"HTTP service: {requests:,} mixed GETs from {clients} client threads")
+    with temp_database() as path:
+        insert_books(path, books)
+        insert_members(path, members)
+        insert_borrowings(path, members * 4, books, members)
+        rng = random.Random(13)
+        paths = [rng.choice([f"/books/{rng.randint(1, books)}",
+                             f"/books?q={rng.choice(WORDS)}",
+                             f"/members/{rng.randint(1, members)}",
+                             f"/overdue?limit=20"])
+                 for _ in range(requests)]
+
+        server = make_server(port=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        port = server.server_address[1]
+        try:
+            before, before_latencies = load_test(port, paths, clients, keep_alive=False)
+            after, after_latencies = load_test(port, paths, clients, keep_alive=True)
+        finally:
+            server.shutdown()
+            server.server_close()
+        print_result("requests", before, after, "req/sec")
+        for label, q in (("p50 latency", 0.5), ("p99 latency", 0.99)):
+            print(f"  {label:<28} before: {before_latencies[int(q * len(paths)) - 1]:>10,.2f} ms   "
+                  f"after: {after_latencies[int(q * len(paths)) - 1]:>10,.2f} ms")
+
+
+class LockedCounter:
+    """The obvious thread-safe counter: one lock around every update"""
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+def bench_metrics(threads=8, updates=200000, books=10000, searches=5000):
+    """Locked vs per-thread-cell counter updates from many threads, and the cost on search_books"""
+    print(f"Metrics: {threads} threads x {updates:,} counter updates; search_books with and without metrics")
+
+    def hammer(counter):
+        def worker():
+            inc = counter.inc
+            for _ in range(updates):
+                inc()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker_thread in workers:
+            worker_thread.start()
+        for worker_thread in workers:
+            worker_thread.join()
+        return threads * updates / (time.perf_counter() - start)
+
+    locked = LockedCounter()
+    cells = metrics.Counter("bench_updates_total", "Benchmark updates", registry=metrics.Registry())
+    print_result("counter.inc()", hammer(locked), hammer(cells), "updates/sec")
+    assert locked.value == cells.value() == threads * updates
+
+    with temp_database() as path:
+        insert_books(path, books)
+        untracked = BookManager.search_books.__wrapped__
+        term = WORDS[0]
+        before = measure(lambda: untracked(term, limit=20), searches)
+        after = measure(lambda: BookManager.search_books(term, limit=20), searches)
+        print_result("search_books", before, after)
+        histogram = metrics.OPERATION_SECONDS.labels("search")
+        per_update = timed(lambda: [histogram.observe(0.001) for _ in range(updates)]) / updates
+        print(f"  One histogram observe: {per_update * 1e6:.2f} us")
+
+
+def bench_branches(desks=8, attempts=300, books=20000):
+    """Checkouts from many desks on one shared file vs one shard per branch, and a fan-out search"""
+    print(f"Branches: {desks} desks x {attempts} checkouts, all on one file vs one branch shard each")
+    rates = {}
+    for label in ("before", "after"):
+        with temp_database():
+            branch_ids = [f"branch{i}" for i in range(desks)] if label == "after" else [None] * desks
+            with quiet():
+                for branch_id in set(branch_ids):
+                    with use_branch(branch_id):
+                        if branch_id is not None:
+                            BranchManager.create_branch(branch_id)
+                        BookManager.add_book(Book("Shared Title", "Author", None, 2024, desks * attempts))
+                        MemberManager.add_member(Member("Desk Reader"))
+
+            def desk(branch_id):
+                with use_branch(branch_id):
+                    for _ in range(attempts):
+                        BorrowingManager.borrow_book(1, 1)
+
+            threads = [threading.Thread(target=desk, args=(branch_id,)) for branch_id in branch_ids]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            rates[label] = desks * attempts / (time.perf_counter() - start)
+            if label == "after":
+                loans = BranchManager.get_dashboard_stats(branch_ids)["active_borrowings"]
+    print_result("borrow_book", rates["before"], rates["after"])
+    print(f"  Loans recorded across branches: {loans:,}")
+
+    with temp_database(), quiet():
+        branch_ids = [f"branch{i}" for i in range(4)]
+        for i, branch_id in enumerate(branch_ids):
+            BranchManager.create_branch(branch_id)
+            with use_branch(branch_id):
+                insert_books(database.branch_database_file(branch_id), books // len(branch_ids), seed=i)
+
+        def one_by_one():
+            for branch_id in branch_ids:
+                with use_branch(branch_id):
+                    BookManager.search_books(WORDS[0], limit=20)
+
+        before = measure(one_by_one, 200)
+        after = measure(lambda: BranchManager.search_catalog(WORDS[0], limit=20, branch_ids=branch_ids), 200)
+    print_result(f"search {len(branch_ids)} branches", before, after)
+
+
+def bench_parallel_reports(loans=1000000, books=20000):
+    """Year report on one vs several worker processes, and whole-table vs date-bisected partitions"""
+    cores = os.cpu_count() or 1
+    print(f"Parallel reports: {loans:,} loans over two years, {cores} CPU core(s)")
+    with temp_database():
+        with quiet():
+            generate_library(books, books // 2, loans, seed=1, progress=lambda message: None)
+        today = date.today()
+        start = today - timedelta(days=365)
+        serial = circulation_report(start, today, workers=1)
+        rate = lambda report: report["loans"]["loans"] / report["elapsed"]
+        for workers in sorted({2, 4, cores} - {1}):
+            report = circulation_report(start, today, workers=workers)
+            assert report["loans"]["loans"] == serial["loans"]["loans"] and report["fines"] == serial["fines"]
+            print_result(f"year report, {workers} workers", rate(serial), rate(report), "loans/sec")
+
+        start = today - timedelta(days=30)
+        whole = circulation_report(start, today, partition="rowid")
+        bisected = circulation_report(start, today, partition="date")
+        assert whole["loans"]["loans"] == bisected["loans"]["loans"] and whole["fines"] == bisected["fines"]
+        print_result("month report, date ranges", rate(whole), rate(bisected), "loans/sec")
+
+
+def bench_export(loans=1000000, books=20000):
+    """Load-everything vs streamed export peak memory, rows/sec per format, and an incremental run"""
+    print(f"Export: {loans:,} loans, {books:,} books, {books // 2:,} members")
+    with temp_database(), tempfile.TemporaryDirectory() as tmp:
+        with quiet():
+            generate_library(books, books // 2, loans, seed=1, progress=lambda message: None)
+
+        def load_all():
+            # What a dump built on the get_all_* pattern does: fetchall() into models, then write
+            with database.pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = BorrowingRecord.row_factory
+                records = cursor.execute("SELECT * FROM borrowing").fetchall()
+            with open(os.path.join(tmp, "borrowing.csv"), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerows([getattr(record, slot) for slot in record.__slots__] for record in records)
+
+        def stream():
+            export_tables(os.path.join(tmp, "memory"), tables=["borrowing"])
+
+        for label, func in (("fetchall + write", load_all), ("export borrowing (csv)", stream)):
+            peak, elapsed = peak_memory(func)
+            print(f"  {label:<28} peak memory: {peak:>8.1f} MB   time: {elapsed:.2f}s (traced)")
+
+        watermark = os.path.join(tmp, "watermark.json")
+        for fmt, compress in (("csv", False), ("csv", True), ("jsonl", False), ("jsonl", True)):
+            summary = export_tables(os.path.join(tmp, "full"), fmt=fmt, compress=compress,
+                                    watermark_file=watermark if (fmt, compress) == ("csv", False) else None)
+            label = f"full export ({fmt}{', gzip' if compress else ''})"
+            print(f"  {label:<28} {summary['rows']:>10,} rows   {summary['bytes'] / 1e6:>8.1f} MB   "
+                  f"{summary['elapsed']:.2f}s   ({summary['rows_per_sec']:,.0f} rows/sec)")
+
+        # A busy day: 1% of open loans returned, 1% of unpaid fines paid
+        with database.pooled_connection() as conn:
+            borrow_ids = [row[0] for row in conn.execute("SELECT borrow_id FROM borrowing WHERE status = 'borrowed'")]
+            fine_ids = [row[0] for row in conn.execute("SELECT fine_id FROM fines WHERE paid = 0")]
+        with quiet():
+            BorrowingManager.return_books(borrow_ids[:len(borrow_ids) // 100])
+            for fine_id in fine_ids[:len(fine_ids) // 100]:
+                FineManager.pay_fine(fine_id)
+        summary = export_tables(os.path.join(tmp, "delta"), fmt="jsonl", watermark_file=watermark)
+        print(f"  {'incremental export (jsonl)':<28} {summary['rows']:>10,} rows   {summary['bytes'] / 1e6:>8.1f} MB   "
+              f"{summary['elapsed']:.2f}s")
+
+
+BENCHMARKS = {
+    "pool": bench_connection_pool,
+    "search": bench_search,
+    "bulk": bench_bulk_import,
+    "members": bench_bulk_members,
+    "checkout": bench_checkout,
+    "stream": bench_streaming,
+    "report": bench_reports,
+    "dashboard": bench_member_dashboard,
+    "models": bench_row_models,
+    "cache": bench_lookup_cache,
+    "accrual": bench_fine_accrual,
+    "async": bench_async,
+    "http": bench_http,
+    "metrics": bench_metrics,
+    "branches": bench_branches,
+    "parallel": bench_parallel_reports,
+    "export": bench_export,
+}
+
+
+def main(names):
+    """Run the named benchmarks (all when none are given)"""
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+        print()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,380 @@
+"""
+Scaling benchmark suite for Library Management System
+Runs every manager operation and the main.py list and report screens against
+synthetic libraries of increasing size, records latency percentiles and
+throughput in a JSON results file, and flags regressions against a stored baseline.
+
+Usage:
+    python benchmark_suite.py                                   # default sizes, write perf_results.json
+    python benchmark_suite.py --sizes 1000 10000 100000 --only search_books get_all_books
+    python benchmark_suite.py --save-baseline                   # keep this run as perf_baseline.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import main as screens
+from benchmark import temp_database, quiet, caches_disabled
+from database import pooled_connection, branch_database_file
+from db_operations import BookManager, MemberManager, BorrowingManager, FineManager, ReportManager, BranchManager
+from init_sample_data import generate_library, synthetic_isbn, TITLE_WORDS, LAST_NAMES
+from models import Book, Member
+
+DEFAULT_SIZES = [1000, 10000, 100000]  # Books per fixture; members and loans scale with it
+MEMBERS_PER_BOOK = 0.5
+LOANS_PER_BOOK = 5
+SEED = 42
+
+ITERATIONS = 200           # Calls per operation at most
+TIME_BUDGET = 1.0          # Seconds per operation before stopping early...
+MIN_CALLS = 3              # ...once at least this many calls were timed
+BULK_ROWS = 100            # Rows per add_*_bulk call
+BRANCHES = 3               # Copies of the fixture used as branch shards for the cross-branch workloads
+
+REGRESSION_THRESHOLD = 1.25  # Flag a p50 more than 25% slower than the baseline...
+NOISE_FLOOR_MS = 0.05        # ...and slower by more than this
+LINEAR_GROWTH = 0.7          # Scaling exponent from which an operation is flagged as growing with n
+
+MANAGERS = [BookManager, MemberManager, BorrowingManager, FineManager, ReportManager, BranchManager]
+
+
+class Exhausted(Exception):
+    """A workload ran out of prepared rows (loans to return, fines to pay, ...)"""
+
+
+class Fixture:
+    """Row IDs and sample records of one synthetic library, prepared before timing starts"""
+
+    def __init__(self, size, report):
+        self.size = size
+        self.report = report
+        self.rng = random.Random(SEED)
+        self.books = report["books"]
+        self.members = report["members"]
+        self.counter = 0
+        self.added_books = []
+        self.added_members = []
+        with pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Book.row_factory
+            self.sample_books = cursor.execute("SELECT * FROM books ORDER BY random() LIMIT 500").fetchall()
+            cursor = conn.cursor()
+            cursor.row_factory = Member.row_factory
+            self.sample_members = cursor.execute("SELECT * FROM members ORDER BY random() LIMIT 500").fetchall()
+            self.shelved = [row[0] for row in conn.execute(
+                "SELECT book_id FROM books WHERE available_quantity > 0 ORDER BY random() LIMIT 2000")]
+            self.open_loans = [row[0] for row in conn.execute(
+                "SELECT borrow_id FROM borrowing WHERE status = 'borrowed' ORDER BY random() LIMIT 2000")]
+            self.unpaid_fines = [row[0] for row in conn.execute(
+                "SELECT fine_id FROM fines WHERE paid = 0 ORDER BY random() LIMIT 2000")]
+            self.max_fine_id = conn.execute("SELECT COALESCE(MAX(fine_id), 0) FROM fines").fetchone()[0]
+        self.branches = None
+
+    def book_id(self):
+        """A random existing book ID"""
+        return self.rng.randint(1, self.books)
+
+    def member_id(self):
+        """A random existing member ID"""
+        return self.rng.randint(1, self.members)
+
+    def branch_ids(self):
+        """Branch shards for the cross-branch workloads: copies of the fixture, made on first use"""
+        if self.branches is None:
+            self.branches = [f"bench{i}" for i in range(BRANCHES)]
+            with pooled_connection() as conn:
+                for branch_id in self.branches:
+                    shard = sqlite3.connect(branch_database_file(branch_id))
+                    conn.backup(shard)
+                    shard.close()
+        return self.branches
+
+    def take(self, rows, count=1):
+        """Pop count prepared rows, or stop the workload when they run out"""
+        if len(rows) < count:
+            raise Exhausted()
+        return [rows.pop() for _ in range(count)]
+
+    def new_book(self):
+        """A Book with a title and ISBN no other row has"""
+        self.counter += 1
+        return Book(f"Benchmark Title {self.counter}", "Bench Author", synthetic_isbn(900000000 + self.counter),
+                    2024, 2, "Fiction")
+
+    def new_member(self):
+        """A Member with an email no other row has"""
+        self.counter += 1
+        return Member(f"Bench Member {self.counter}", f"bench{self.counter}@example.org", "555-0000", "1 Bench St")
+
+
+def drain(iterable):
+    """Consume an iterator without keeping its items"""
+    deque(iterable, maxlen=0)
+
+
+def add_book(fx):
+    """Add one book, keeping its ID for the delete workload"""
+    book = fx.new_book()
+    BookManager.add_book(book)
+    fx.added_books.append(book.book_id)
+
+
+def add_member(fx):
+    """Register one member, keeping its ID for the delete workload"""
+    member = fx.new_member()
+    MemberManager.add_member(member)
+    fx.added_members.append(member.member_id)
+
+
+@contextmanager
+def scripted_screens(fx):
+    """Drive main.py screens without a terminal: no clearing, scripted answers to prompts"""
+    def answer(prompt=""):
+        if "Member ID" in prompt:
+            return str(fx.member_id())
+        return "q" if "[Q]uit" in prompt else ""
+
+    saved = screens.clear_screen, getattr(screens, "input", None)
+    screens.clear_screen = lambda: None
+    screens.input = answer
+    try:
+        yield
+    finally:
+        screens.clear_screen = saved[0]
+        if saved[1] is None:
+            del screens.input
+        else:
+            screens.input = saved[1]
+
+
+# (name, workload(fixture)) in run order: reads first, then writes, then deletes of rows the writes added
+WORKLOADS = [
+    ("BookManager.get_book_by_id", lambda fx: BookManager.get_book_by_id(fx.book_id())),
+    ("BookManager.get_book_by_isbn", lambda fx: BookManager.get_book_by_isbn(fx.rng.choice(fx.sample_books).isbn)),
+    ("BookManager.search_books", lambda fx: BookManager.search_books(fx.rng.choice(TITLE_WORDS), limit=20)),
+    ("BookManager.get_books_page", lambda fx: BookManager.get_books_page(fx.book_id(), page_size=20)),
+    ("BookManager.get_all_books", lambda fx: BookManager.get_all_books()),
+    ("BookManager.iter_books", lambda fx: drain(BookManager.iter_books())),
+    ("MemberManager.get_member_by_id", lambda fx: MemberManager.get_member_by_id(fx.member_id())),
+    ("MemberManager.get_member_dashboard", lambda fx: MemberManager.get_member_dashboard(fx.member_id())),
+    ("MemberManager.search_members", lambda fx: MemberManager.search_members(fx.rng.choice(LAST_NAMES))),
+    ("MemberManager.get_members_page", lambda fx: MemberManager.get_members_page(fx.member_id(), page_size=20)),
+    ("MemberManager.get_all_members", lambda fx: MemberManager.get_all_members()),
+    ("MemberManager.iter_members", lambda fx: drain(MemberManager.iter_members())),
+    ("BorrowingManager.get_active_borrowings", lambda fx: BorrowingManager.get_active_borrowings(fx.member_id())),
+    ("BorrowingManager.get_all_borrowings", lambda fx: BorrowingManager.get_all_borrowings()),
+    ("BorrowingManager.iter_borrowings", lambda fx: drain(BorrowingManager.iter_borrowings())),
+    ("BorrowingManager.get_borrowings_page", lambda fx: BorrowingManager.get_borrowings_page(fx.rng.choice(fx.open_loans) - 1, page_size=20)),
+    ("BorrowingManager.get_overdue_books", lambda fx: BorrowingManager.get_overdue_books()),
+    ("FineManager.get_member_fines", lambda fx: FineManager.get_member_fines(fx.member_id())),
+    ("FineManager.get_unpaid_fines", lambda fx: FineManager.get_unpaid_fines(fx.rng.randint(0, fx.max_fine_id), limit=20)),
+    ("FineManager.get_unpaid_fines_summary", lambda fx: FineManager.get_unpaid_fines_summary()),
+    ("ReportManager.get_dashboard_stats", lambda fx: ReportManager.get_dashboard_stats()),
+    ("ReportManager.check_stats", lambda fx: ReportManager.check_stats()),
+    ("BranchManager.get_branches", lambda fx: BranchManager.get_branches()),
+    ("BranchManager.search_catalog", lambda fx: BranchManager.search_catalog(
+        fx.rng.choice(TITLE_WORDS), limit=20, branch_ids=fx.branch_ids())),
+    ("BranchManager.get_dashboard_stats", lambda fx: BranchManager.get_dashboard_stats(fx.branch_ids())),
+    ("BranchManager.get_overdue_books", lambda fx: BranchManager.get_overdue_books(20, fx.branch_ids())),
+    ("screen.show_reports", lambda fx: screens.show_reports()),
+    ("screen.view_all_books", lambda fx: screens.view_all_books()),
+    ("screen.view_all_members", lambda fx: screens.view_all_members()),
+    ("screen.view_member_details", lambda fx: screens.view_member_details()),
+    ("screen.view_active_borrowings", lambda fx: screens.view_active_borrowings()),
+    ("screen.view_overdue_books", lambda fx: screens.view_overdue_books()),
+    ("screen.view_all_unpaid_fines", lambda fx: screens.view_all_unpaid_fines()),
+    ("BookManager.add_book", add_book),
+    ("BookManager.add_books_bulk", lambda fx: BookManager.add_books_bulk([fx.new_book() for _ in range(BULK_ROWS)])),
+    ("BookManager.update_book", lambda fx: BookManager.update_book(fx.rng.choice(fx.sample_books))),
+    ("MemberManager.add_member", add_member),
+    ("MemberManager.add_members_bulk", lambda fx: MemberManager.add_members_bulk(
+        [fx.new_member() for _ in range(BULK_ROWS)])),
+    ("MemberManager.update_member", lambda fx: MemberManager.update_member(fx.rng.choice(fx.sample_members))),
+    ("BorrowingManager.borrow_book", lambda fx: BorrowingManager.borrow_book(fx.member_id(), *fx.take(fx.shelved))),
+    ("BorrowingManager.borrow_books", lambda fx: BorrowingManager.borrow_books(fx.member_id(), fx.take(fx.shelved, 3))),
+    ("BorrowingManager.return_book", lambda fx: BorrowingManager.return_book(*fx.take(fx.open_loans))),
+    ("BorrowingManager.return_books", lambda fx: BorrowingManager.return_books(fx.take(fx.open_loans, 3))),
+    ("FineManager.pay_fine", lambda fx: FineManager.pay_fine(*fx.take(fx.unpaid_fines))),
+    ("FineManager.accrue_overdue_fines", lambda fx: FineManager.accrue_overdue_fines()),
+    ("ReportManager.rebuild_stats", lambda fx: ReportManager.rebuild_stats()),
+    ("BranchManager.create_branch", lambda fx: BranchManager.create_branch(f"new{fx.new_book().isbn}")),
+    ("BookManager.delete_book", lambda fx: BookManager.delete_book(*fx.take(fx.added_books))),
+    ("MemberManager.delete_member", lambda fx: MemberManager.delete_member(*fx.take(fx.added_members))),
+]
+
+
+def uncovered_operations():
+    """Public manager methods with no workload, so a new method can't slip past the suite"""
+    covered = {name for name, _ in WORKLOADS}
+    return [f"{manager.__name__}.{name}" for manager in MANAGERS
+            for name, member in vars(manager).items()
+            if isinstance(member, staticmethod) and not name.startswith("_")
+            and f"{manager.__name__}.{name}" not in covered]
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def time_operation(workload, fixture):
+    """Time calls of workload(fixture) until ITERATIONS calls or the time budget runs out
+
+    Returns calls, latency percentiles in ms and throughput, or None if no call could run.
+    """
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < ITERATIONS:
+        call_start = time.perf_counter()
+        try:
+            workload(fixture)
+        except Exhausted:
+            break
+        latencies.append(time.perf_counter() - call_start)
+        if len(latencies) >= MIN_CALLS and time.perf_counter() - start > TIME_BUDGET:
+            break
+    if not latencies:
+        return None
+    ordered = sorted(latency * 1000 for latency in latencies)
+    return {
+        "calls": len(ordered),
+        "p50_ms": percentile(ordered, 0.50),
+        "p90_ms": percentile(ordered, 0.90),
+        "p99_ms": percentile(ordered, 0.99),
+        "max_ms": ordered[-1],
+        "mean_ms": sum(ordered) / len(ordered),
+        "ops_per_sec": len(ordered) / sum(latencies),
+    }
+
+
+def run_size(size, names):
+    """Build a synthetic library of size books and time every selected operation on it"""
+    with temp_database():
+        with quiet():
+            report = generate_library(size, int(size * MEMBERS_PER_BOOK), size * LOANS_PER_BOOK,
+                                      seed=SEED, progress=lambda message: None)
+        print(f"\n{size:,} books, {report['members']:,} members, {report['loans']:,} loans, "
+              f"{report['fines']:,} fines (loaded in {report['elapsed']:.1f}s)")
+        fixture = Fixture(size, report)
+        results = {}
+        with caches_disabled(), scripted_screens(fixture):
+            for name, workload in WORKLOADS:
+                if names and name.split(".")[-1] not in names and name not in names:
+                    continue
+                with quiet():
+                    result = time_operation(workload, fixture)
+                if result is None:
+                    print(f"  {name:<42} skipped (nothing prepared to run on)")
+                    continue
+                results[name] = result
+                print(f"  {name:<42} p50 {result['p50_ms']:>9.3f} ms   p99 {result['p99_ms']:>9.3f} ms   "
+                      f"{result['ops_per_sec']:>10,.0f} ops/sec")
+    fixture_rows = {key: report[key] for key in ("books", "members", "loans", "fines", "open_loans")}
+    return {"fixture": fixture_rows, "operations": results}
+
+
+def scaling_exponents(results):
+    """Log-log slope of p50 latency from the smallest to the largest size: ~0 flat, ~1 linear in n"""
+    sizes = sorted(results, key=int)
+    if len(sizes) < 2:
+        return {}
+    small, large = results[sizes[0]]["operations"], results[sizes[-1]]["operations"]
+    ratio = math.log(int(sizes[-1]) / int(sizes[0]))
+    return {name: math.log(max(large[name]["p50_ms"], 1e-6) / max(small[name]["p50_ms"], 1e-6)) / ratio
+            for name in small if name in large}
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """List (size, operation, baseline p50, current p50) for operations slower than the baseline"""
+    regressions = []
+    for size, run in current["results"].items():
+        base_run = baseline.get("results", {}).get(size)
+        if not base_run:
+            continue
+        for name, result in run["operations"].items():
+            base = base_run["operations"].get(name)
+            if base is None:
+                continue
+            if (result["p50_ms"] > base["p50_ms"] * threshold
+                    and result["p50_ms"] - base["p50_ms"] > NOISE_FLOOR_MS):
+                regressions.append((size, name, base["p50_ms"], result["p50_ms"]))
+    return regressions
+
+
+def print_scaling(results, exponents):
+    """Print p50 latency per size with the scaling exponent, flagging operations that grow with n"""
+    sizes = sorted(results, key=int)
+    print("\nScaling (p50 ms by catalog size)")
+    print(f"  {'operation':<42}" + "".join(f"{int(size):>12,}" for size in sizes) + "   growth")
+    for name, _ in WORKLOADS:
+        if name not in exponents:
+            continue
+        row = "".join(f"{results[size]['operations'][name]['p50_ms']:>12.3f}" for size in sizes)
+        flag = "  <- grows with n" if exponents[name] >= LINEAR_GROWTH else ""
+        print(f"  {name:<42}{row}   n^{exponents[name]:.2f}{flag}")
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark every manager operation at increasing sizes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalog sizes (books)")
+    parser.add_argument("--only", nargs="+", default=[], help="operation names to run (default all)")
+    parser.add_argument("--output", default="perf_results.json", help="results file to write")
+    parser.add_argument("--baseline", default="perf_baseline.json", help="baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="p50 slowdown ratio counted as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="also write this run to the baseline file")
+    args = parser.parse_args()
+
+    missing = uncovered_operations()
+    if missing:
+        print(f"Warning: no workload for {', '.join(missing)}")
+
+    current = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": f"{platform.machine()} x{os.cpu_count()}",
+        "seed": SEED,
+        "uncovered": missing,
+        "results": {str(size): run_size(size, args.only) for size in args.sizes},
+    }
+    current["scaling"] = scaling_exponents(current["results"])
+    if current["scaling"]:
+        print_scaling(current["results"], current["scaling"])
+
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"✓ Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if not regressions:
+        print(f"✓ No regressions against {args.baseline} (from {baseline.get('created', 'unknown')})")
+        return 0
+    print(f"✗ {len(regressions)} regression(s) against {args.baseline}:")
+    for size, name, before, after in regressions:
+        print(f"  {name} at {int(size):,} books: p50 {before:.3f} ms -> {after:.3f} ms ({after / before:.1f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
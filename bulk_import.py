@@ -0,0 +1,92 @@
+"""
+Bulk import of catalog and member feeds for Library Management System
+Reads CSV or JSON Lines files lazily and loads them through the batched manager APIs.
+
+Usage:
+    python bulk_import.py books vendor_feed.csv [--batch-size N]
+    python bulk_import.py members enrollments.csv [--on-duplicate update|reject]
+"""
+import argparse
+import csv
+import json
+import os
+
+from database import init_database, migrate_database, DATABASE_FILE
+from db_operations import BookManager, MemberManager
+
+
+def read_records(path):
+    """Yield one dict per data row of a .csv or .jsonl file without loading the whole file"""
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Passed through so the importer reports it as a rejected row
+                    yield line
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+
+def print_progress(summary):
+    """Print a one-line progress report"""
+    print(f"\r  {summary['inserted']:,} inserted, {summary.get('updated', 0):,} updated, "
+          f"{len(summary['rejected']):,} rejected, "
+          f"{summary['rows_per_sec']:,.0f} rows/sec", end="", flush=True)
+
+
+def print_summary(summary, max_rejects=20):
+    """Print the final import summary"""
+    print(f"\n✓ Inserted {summary['inserted']:,} rows in {summary['elapsed']:.2f}s "
+          f"({summary['rows_per_sec']:,.0f} rows/sec)")
+    if summary.get("updated"):
+        print(f"✓ Updated {summary['updated']:,} existing rows")
+    if summary["rejected"]:
+        print(f"✗ Rejected {len(summary['rejected']):,} rows:")
+        for row_number, reason in summary["rejected"][:max_rejects]:
+            print(f"  Row {row_number}: {reason}")
+        if len(summary["rejected"]) > max_rejects:
+            print(f"  ... and {len(summary['rejected']) - max_rejects:,} more")
+
+
+def import_books(path, batch_size=1000, progress=print_progress):
+    """Import a book feed file; columns: title, author, isbn, publication_year, quantity, category"""
+    return BookManager.add_books_bulk(read_records(path), batch_size=batch_size, progress=progress)
+
+
+def import_members(path, batch_size=1000, on_duplicate="update", progress=print_progress):
+    """Import a member file; columns: name, email, phone, address"""
+    return MemberManager.add_members_bulk(read_records(path), batch_size=batch_size,
+                                          on_duplicate=on_duplicate, progress=progress)
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Bulk import a CSV or JSONL feed")
+    parser.add_argument("kind", choices=["books", "members"], help="what the file contains")
+    parser.add_argument("path", help="path to a .csv or .jsonl file")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per transaction")
+    parser.add_argument("--on-duplicate", choices=["update", "reject"], default="update",
+                        help="what to do with members whose email is already registered")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATABASE_FILE):
+        init_database()
+    else:
+        migrate_database()
+
+    print(f"Importing {args.kind} from {args.path}...")
+    if args.kind == "books":
+        summary = import_books(args.path, args.batch_size)
+    else:
+        summary = import_members(args.path, args.batch_size, args.on_duplicate)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
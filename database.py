@@ -3,12 +3,443 @@ Database setup and initialization for Library Management System
 """
 import sqlite3
 import os
+import glob
+import re
+import threading
+import time
+import weakref
+from urllib.parse import quote
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from models import normalize_isbn
+import instrumentation
 
 DATABASE_FILE = "library.db"
 
+# Branch shards live next to DATABASE_FILE: library.db -> library.<branch>.db
+BRANCH_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Connection pool settings
+POOL_MAX_SIZE = 8          # Maximum open connections per database file
+POOL_TIMEOUT = 10.0        # Seconds to wait for a free connection
+
+# Read-through cache settings
+CACHE_MAX_SIZE = 1024      # Rows kept per cache (books, members)
+CACHE_TTL = 5.0            # Seconds a cached row is served before it is read again
+
+# PRAGMAs applied to every pooled connection
+STORAGE_PROFILE = {
+    "journal_mode": "WAL",       # Readers don't block the writer
+    "synchronous": "NORMAL",     # Safe with WAL, one fsync per checkpoint
+    "cache_size": -16000,        # 16 MB page cache (negative = KiB)
+    "mmap_size": 268435456,      # Map up to 256 MB of the file
+    "temp_store": "MEMORY",      # Sorts and temp indexes stay in RAM
+}
+
+
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() hands it back to its pool"""
+    pool = None
+    finalizer = None
+    checked_out = False
+
+    def close(self):
+        """Return the connection to the pool instead of closing it"""
+        if self.pool is None:
+            super().close()
+        elif self.checked_out:
+            self.pool.release(self)
+
+    def close_for_real(self):
+        """Close the underlying SQLite handle"""
+        super().close()
+
+    # Statement timing hooks: with instrumentation off they add one flag check per call
+    def cursor(self, factory=sqlite3.Cursor):
+        """Open a cursor, a timing one while instrumentation is on"""
+        if instrumentation.enabled and factory is sqlite3.Cursor:
+            factory = instrumentation.InstrumentedCursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        """Run one statement on a new cursor"""
+        if instrumentation.enabled:
+            return self.cursor().execute(sql, parameters)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        """Run one statement for every parameter set on a new cursor"""
+        if instrumentation.enabled:
+            return self.cursor().executemany(sql, seq_of_parameters)
+        return super().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived connections to one database file"""
+
+    def __init__(self, database, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT, profile=None):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.profile = dict(STORAGE_PROFILE if profile is None else profile)
+        self.stats = {"created": 0, "reused": 0, "discarded": 0, "waits": 0}
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def acquire(self):
+        """Check out a healthy connection, preferring the one this thread used last"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                conn = self._take_idle()
+                if conn is None:
+                    if self._open < self.max_size:
+                        self._open += 1
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise sqlite3.OperationalError(
+                                f"Connection pool exhausted ({self.max_size} connections in use)")
+                        self.stats["waits"] += 1
+                        self._cond.wait(remaining)
+                        continue
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._forget()
+                    raise
+                self.stats["created"] += 1
+            elif self._is_healthy(conn):
+                self.stats["reused"] += 1
+            else:
+                self._discard(conn)
+                continue
+
+            conn.checked_out = True
+            self._local.last = weakref.ref(conn)
+            return conn
+
+    def release(self, conn):
+        """Roll back any unfinished transaction and park the connection"""
+        conn.checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed or len(self._idle) >= self.max_size:
+                keep = False
+            else:
+                self._idle.append(conn)
+                keep = True
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    def close(self):
+        """Close every idle connection; busy ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def status(self):
+        """Return a snapshot of pool usage"""
+        with self._cond:
+            return dict(self.stats, open=self._open, idle=len(self._idle), max_size=self.max_size)
+
+    def _take_idle(self):
+        """Pop an idle connection, giving this thread its previous one if parked"""
+        if not self._idle:
+            return None
+        ref = getattr(self._local, "last", None)
+        last = ref() if ref is not None else None
+        if last is not None and last in self._idle:
+            self._idle.remove(last)
+            return last
+        return self._idle.pop()
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(self.database, factory=PooledConnection, check_same_thread=False)
+        for pragma, value in self.profile.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        conn.pool = self
+        # A connection dropped without close() still frees its slot
+        conn.finalizer = weakref.finalize(conn, self._forget)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn):
+        """Cheap liveness probe run on every checkout"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        """Close a connection and free its slot"""
+        if conn.finalizer is not None:
+            conn.finalizer.detach()
+        conn.pool = None
+        try:
+            conn.close_for_real()
+        except sqlite3.Error:
+            pass
+        self.stats["discarded"] += 1
+        self._forget()
+
+    def _forget(self):
+        """Free one connection slot"""
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache of rows keyed by ID
+    
+    Writers invalidate the keys they change once their transaction commits. A
+    reader passes the token() it took before querying to put(), so a row read
+    before an invalidation is never stored after it. Writes from other
+    processes (the accrual job, bulk imports, another service) can't invalidate
+    anything here, so entries also expire ttl seconds after they were loaded
+    (ttl=None keeps them until evicted).
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, scope=None, ttl=CACHE_TTL):
+        self.max_size = max_size
+        # scope() namespaces the keys (e.g. by branch) so equal IDs from different shards don't collide
+        self.scope = scope
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "expirations": 0}
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, key):
+        """Return the cached value and mark it most recently used, or None"""
+        if self.scope is not None:
+            key = (self.scope(), key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def token(self):
+        """Take before loading a value from the database; pass to put()"""
+        return self._generation
+
+    def put(self, key, value, token):
+        """Cache a loaded value unless something was invalidated since token was taken"""
+        if self.scope is not None:
+            key = (self.scope(), key)
+        with self._lock:
+            if token != self._generation or self.max_size <= 0:
+                return
+            self._entries[key] = (value, None if self.ttl is None else time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, *keys):
+        """Drop the given keys"""
+        if self.scope is not None:
+            scope = self.scope()
+            keys = [(scope, key) for key in keys]
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.stats["invalidations"] += 1
+
+    def invalidate_if(self, predicate):
+        """Drop every cached value for which predicate(value) is true"""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, (value, _) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+                self.stats["invalidations"] += 1
+
+    def clear(self):
+        """Drop everything"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def reset_stats(self):
+        """Zero the hit/miss/eviction/invalidation counters"""
+        with self._lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def status(self):
+        """Return a snapshot of cache usage"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, size=len(self._entries), max_size=self.max_size,
+                        hit_rate=self.stats["hits"] / lookups if lookups else 0.0)
+
+
+_caches = weakref.WeakSet()
+
+
+def clear_caches():
+    """Empty every row cache (the database they were filled from is going away)"""
+    for cache in list(_caches):
+        cache.clear()
+
+
+_current_branch = ContextVar("branch", default=None)
+
+
+def current_branch():
+    """The branch ID that pooled connections are routed to in this context (None for DATABASE_FILE)"""
+    return _current_branch.get()
+
+
+def branch_database_file(branch_id):
+    """The shard file for a branch, next to DATABASE_FILE"""
+    if not isinstance(branch_id, str) or not BRANCH_ID_PATTERN.fullmatch(branch_id):
+        raise ValueError(f"Invalid branch ID: {branch_id!r} (use letters, digits, '-' and '_')")
+    root, ext = os.path.splitext(DATABASE_FILE)
+    return f"{root}.{branch_id}{ext or '.db'}"
+
+
+def current_database_file():
+    """The database file this context's pooled connections go to"""
+    branch_id = _current_branch.get()
+    return DATABASE_FILE if branch_id is None else branch_database_file(branch_id)
+
+
+def list_branches():
+    """Branch IDs that have a shard file next to DATABASE_FILE, sorted"""
+    root, ext = os.path.splitext(DATABASE_FILE)
+    ext = ext or ".db"
+    branches = []
+    for path in glob.glob(f"{glob.escape(root)}.*{glob.escape(ext)}"):
+        branch_id = path[len(root) + 1:-len(ext)]
+        if BRANCH_ID_PATTERN.fullmatch(branch_id):
+            branches.append(branch_id)
+    return sorted(branches)
+
+
+@contextmanager
+def use_branch(branch_id):
+    """Route every manager call made in this context (thread or task) to one branch's shard
+    
+    Each branch has its own file, pool and writer lock, so checkouts at one
+    branch never wait on another. use_branch(None) goes back to DATABASE_FILE.
+    """
+    if branch_id is not None:
+        branch_database_file(branch_id)
+    token = _current_branch.set(branch_id)
+    try:
+        yield branch_id
+    finally:
+        _current_branch.reset(token)
+
+
+@contextmanager
+def attached_branches(branch_ids):
+    """Open one read-only connection with each branch's shard attached, for cross-branch SQL
+    
+    Yields (conn, schemas) where schemas[i] is the schema name ("b0", "b1", ...)
+    that branch_ids[i] is attached under, e.g. SELECT ... FROM b0.books UNION ALL
+    SELECT ... FROM b1.books. SQLite caps how many files one connection can
+    attach (attach_limit()), so callers with more branches go in chunks.
+    """
+    conn = sqlite3.connect("file::memory:", uri=True, check_same_thread=False)
+    try:
+        if len(branch_ids) > attach_limit(conn):
+            raise ValueError(f"Can attach at most {attach_limit(conn)} branches per connection")
+        schemas = []
+        for i, branch_id in enumerate(branch_ids):
+            path = os.path.abspath(branch_database_file(branch_id))
+            if not os.path.exists(path):
+                raise ValueError(f"No such branch: {branch_id}")
+            conn.execute(f"ATTACH DATABASE ? AS b{i}", (f"file:{quote(path)}?mode=ro",))
+            schemas.append(f"b{i}")
+        yield conn, schemas
+    finally:
+        conn.close()
+
+
+def attach_limit(conn=None):
+    """How many databases one connection can attach (10 in default SQLite builds)"""
+    if conn is None:
+        conn = sqlite3.connect(":memory:")
+        try:
+            return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        finally:
+            conn.close()
+    return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+
+_pools = {}                # database file -> ConnectionPool
+_pools_root = None         # DATABASE_FILE the pools were opened under
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Get the connection pool for the current database file (the branch's shard inside use_branch)"""
+    global _pools_root
+    database_file = current_database_file()
+    with _pool_lock:
+        pool = _pools.get(database_file)
+        if pool is not None and _pools_root == DATABASE_FILE:
+            return pool
+        if _pools_root != DATABASE_FILE:
+            # DATABASE_FILE was repointed: the old main file and its shards are done with
+            for old in _pools.values():
+                old.close()
+            _pools.clear()
+            clear_caches()
+            _pools_root = DATABASE_FILE
+        pool = _pools[database_file] = ConnectionPool(database_file)
+        return pool
+
+
+def close_pool(database_file=None):
+    """Close pooled connections (call before moving or deleting a database file)
+    
+    Closes every pool, main and branches, unless one database_file is given.
+    """
+    with _pool_lock:
+        for path in [database_file] if database_file is not None else list(_pools):
+            pool = _pools.pop(path, None)
+            if pool is not None:
+                pool.close()
+        clear_caches()
+
+
 def init_database():
-    """Initialize the database with necessary tables"""
-    conn = sqlite3.connect(DATABASE_FILE)
+    """Initialize the database (the current branch's shard inside use_branch) with necessary tables"""
+    close_pool(current_database_file())
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Books table
@@ -72,12 +503,433 @@ def init_database():
     """)
     
     conn.commit()
+    apply_migrations(conn)
     conn.close()
     print("Database initialized successfully!")
 
+def create_books_fts(conn):
+    """Create the FTS5 catalog index and the triggers that keep it in sync with books"""
+    if not FTS5_AVAILABLE:
+        # BookManager.search_books falls back to LIKE; a build with FTS5 applies this later
+        print("FTS5 not available, catalog search will use LIKE matching")
+        raise MigrationUnavailable("SQLite was built without FTS5")
+    if has_books_fts(conn):
+        return
+    conn.execute("""
+        CREATE VIRTUAL TABLE books_fts USING fts5(
+            title, author, category,
+            content='books', content_rowid='book_id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author, category)
+            VALUES (new.book_id, new.title, new.author, new.category);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, category)
+            VALUES ('delete', old.book_id, old.title, old.author, old.category);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author, category ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, category)
+            VALUES ('delete', old.book_id, old.title, old.author, old.category);
+            INSERT INTO books_fts (rowid, title, author, category)
+            VALUES (new.book_id, new.title, new.author, new.category);
+        END
+    """)
+    # Index the books that already exist
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+
+def add_isbn_normalized(conn):
+    """Add the canonical ISBN-13 column and backfill it from the typed ISBNs"""
+    conn.execute("ALTER TABLE books ADD COLUMN isbn_normalized TEXT")
+    seen = set()
+    updates = []
+    for book_id, isbn in conn.execute("SELECT book_id, isbn FROM books WHERE isbn IS NOT NULL ORDER BY book_id"):
+        normalized = normalize_isbn(isbn)
+        if normalized is None:
+            continue
+        if normalized in seen:
+            # Same ISBN typed two ways; keep the oldest row as the canonical match
+            print(f"Duplicate ISBN {isbn} on book {book_id} left unnormalized")
+            continue
+        seen.add(normalized)
+        updates.append((normalized, book_id))
+    conn.executemany("UPDATE books SET isbn_normalized = ? WHERE book_id = ?", updates)
+    conn.execute("CREATE UNIQUE INDEX idx_books_isbn_normalized ON books(isbn_normalized)")
+
+# Dashboard counters kept in stats_counters: name -> full recount query
+STATS_RECOUNTS = {
+    "total_books": "SELECT COUNT(*) FROM books",
+    "available_books": "SELECT COALESCE(SUM(available_quantity), 0) FROM books",
+    "borrowed_books": "SELECT COALESCE(SUM(quantity - available_quantity), 0) FROM books",
+    "total_members": "SELECT COUNT(*) FROM members",
+    "active_members": "SELECT COUNT(*) FROM members WHERE membership_status = 'active'",
+    "outstanding_fines": "SELECT COALESCE(SUM(outstanding_fine), 0) FROM members",
+    "active_borrowings": "SELECT COUNT(*) FROM borrowing WHERE status = 'borrowed'",
+    "unpaid_fines": "SELECT COUNT(*) FROM fines WHERE paid = 0",
+    "unpaid_fine_amount": "SELECT COALESCE(SUM(amount), 0) FROM fines WHERE paid = 0",
+}
+
+# Trigger bodies that move the counters by one row's contribution: sign is +1 for new rows, -1 for old ones.
+# IS comparisons keep NULL columns from turning a counter into NULL.
+def _book_counts(row, sign):
+    """Move the book totals by one books row"""
+    return f"""
+        INSERT INTO stats_counters (name, value) VALUES
+            ('total_books', {sign}),
+            ('available_books', {sign} * COALESCE({row}.available_quantity, 0)),
+            ('borrowed_books', {sign} * COALESCE({row}.quantity - {row}.available_quantity, 0))
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;"""
+
+def _book_category(row, sign):
+    """Move one books row's category count, dropping categories that reach zero"""
+    category = f"COALESCE(NULLIF({row}.category, ''), 'Uncategorized')"
+    return f"""
+        INSERT INTO stats_categories (category, books) VALUES ({category}, {sign})
+        ON CONFLICT (category) DO UPDATE SET books = books + excluded.books;
+        DELETE FROM stats_categories WHERE category = {category} AND books = 0;"""
+
+def _member_counts(row, sign):
+    """Move the member totals by one members row"""
+    return f"""
+        INSERT INTO stats_counters (name, value) VALUES
+            ('total_members', {sign}),
+            ('active_members', {sign} * ({row}.membership_status IS 'active')),
+            ('outstanding_fines', {sign} * COALESCE({row}.outstanding_fine, 0))
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;"""
+
+def _loan_counts(row, sign):
+    """Move the active loan count and due-day bucket by one borrowing row"""
+    return f"""
+        INSERT INTO stats_counters (name, value)
+        SELECT 'active_borrowings', {sign} WHERE {row}.status IS 'borrowed'
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;
+        INSERT INTO stats_due_days (due_day, loans)
+        SELECT date({row}.due_date), {sign} WHERE {row}.status IS 'borrowed'
+        ON CONFLICT (due_day) DO UPDATE SET loans = loans + excluded.loans;
+        DELETE FROM stats_due_days WHERE due_day = date({row}.due_date) AND loans = 0;"""
+
+def _fine_counts(row, sign):
+    """Move the unpaid fine count and amount by one fines row"""
+    return f"""
+        INSERT INTO stats_counters (name, value)
+        SELECT 'unpaid_fines', {sign} WHERE {row}.paid IS 0
+        UNION ALL
+        SELECT 'unpaid_fine_amount', {sign} * {row}.amount WHERE {row}.paid IS 0
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;"""
+
+STATS_TRIGGERS = {
+    "stats_books_insert": ("AFTER INSERT ON books", _book_counts("new", 1) + _book_category("new", 1)),
+    "stats_books_delete": ("AFTER DELETE ON books", _book_counts("old", -1) + _book_category("old", -1)),
+    "stats_books_update": ("AFTER UPDATE OF quantity, available_quantity ON books",
+                           _book_counts("old", -1) + _book_counts("new", 1)),
+    "stats_books_recategorize": ("AFTER UPDATE OF category ON books "
+                                 "WHEN COALESCE(NULLIF(old.category, ''), 'Uncategorized') "
+                                 "IS NOT COALESCE(NULLIF(new.category, ''), 'Uncategorized')",
+                                 _book_category("old", -1) + _book_category("new", 1)),
+    "stats_members_insert": ("AFTER INSERT ON members", _member_counts("new", 1)),
+    "stats_members_delete": ("AFTER DELETE ON members", _member_counts("old", -1)),
+    "stats_members_update": ("AFTER UPDATE OF membership_status, outstanding_fine ON members",
+                             _member_counts("old", -1) + _member_counts("new", 1)),
+    "stats_borrowing_insert": ("AFTER INSERT ON borrowing", _loan_counts("new", 1)),
+    "stats_borrowing_delete": ("AFTER DELETE ON borrowing", _loan_counts("old", -1)),
+    "stats_borrowing_update": ("AFTER UPDATE OF status, due_date ON borrowing",
+                               _loan_counts("old", -1) + _loan_counts("new", 1)),
+    "stats_fines_insert": ("AFTER INSERT ON fines", _fine_counts("new", 1)),
+    "stats_fines_delete": ("AFTER DELETE ON fines", _fine_counts("old", -1)),
+    "stats_fines_update": ("AFTER UPDATE OF paid, amount ON fines", _fine_counts("old", -1) + _fine_counts("new", 1)),
+}
+
+def recount_stats(conn):
+    """Compute every counter from scratch: (counters, category counts, active loans per due day)"""
+    counters = {name: conn.execute(sql).fetchone()[0] for name, sql in STATS_RECOUNTS.items()}
+    categories = dict(conn.execute("""
+        SELECT COALESCE(NULLIF(category, ''), 'Uncategorized'), COUNT(*) FROM books
+        GROUP BY COALESCE(NULLIF(category, ''), 'Uncategorized')
+    """).fetchall())
+    due_days = dict(conn.execute("""
+        SELECT date(due_date), COUNT(*) FROM borrowing WHERE status = 'borrowed' GROUP BY date(due_date)
+    """).fetchall())
+    return counters, categories, due_days
+
+def rebuild_stats(conn):
+    """Replace the stored counters with a full recount (caller commits)"""
+    counters, categories, due_days = recount_stats(conn)
+    conn.execute("DELETE FROM stats_counters")
+    conn.execute("DELETE FROM stats_categories")
+    conn.execute("DELETE FROM stats_due_days")
+    conn.executemany("INSERT INTO stats_counters (name, value) VALUES (?, ?)", counters.items())
+    conn.executemany("INSERT INTO stats_categories (category, books) VALUES (?, ?)", categories.items())
+    conn.executemany("INSERT INTO stats_due_days (due_day, loans) VALUES (?, ?)", due_days.items())
+
+def create_stats_counters(conn):
+    """Create the dashboard counter tables, the triggers that maintain them, and fill them"""
+    conn.execute("CREATE TABLE IF NOT EXISTS stats_counters (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS stats_categories (category TEXT PRIMARY KEY, books INTEGER NOT NULL)")
+    # Active loans per due day: overdue = every bucket before today, plus today's loans already past due
+    conn.execute("CREATE TABLE IF NOT EXISTS stats_due_days (due_day TEXT PRIMARY KEY, loans INTEGER NOT NULL)")
+    for name, (event, body) in STATS_TRIGGERS.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body}\nEND")
+    rebuild_stats(conn)
+
+# Tables whose updates are stamped for incremental exports: table -> primary key
+CHANGE_TRACKED = {
+    "books": "book_id",
+    "members": "member_id",
+    "borrowing": "borrow_id",
+    "fines": "fine_id",
+}
+# UTC with milliseconds, so stamps from the trigger and export watermarks compare as text.
+# The circulation updates in db_operations set changed_at = CHANGE_CLOCK themselves, which
+# skips the trigger's second UPDATE of the row; the trigger covers every other writer.
+CHANGE_CLOCK = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+def add_change_tracking(conn):
+    """Add a changed_at column to each tracked table and a trigger that stamps it on every update
+
+    New rows keep changed_at NULL; exports find them by primary key instead.
+    The trigger's own UPDATE only touches changed_at, which no other trigger
+    watches, so it doesn't fire the FTS or counter triggers again.
+    """
+    for table, key in CHANGE_TRACKED.items():
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN changed_at TIMESTAMP")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_changed ON {table}(changed_at) "
+                     f"WHERE changed_at IS NOT NULL")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_changed AFTER UPDATE ON {table}
+            WHEN new.changed_at IS old.changed_at BEGIN
+                UPDATE {table} SET changed_at = {CHANGE_CLOCK} WHERE {key} = new.{key};
+            END
+        """)
+
+def has_books_fts(conn):
+    """Check whether the FTS5 catalog index exists in this database"""
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'").fetchone()
+    return row is not None
+
+def fts5_available():
+    """Check whether this SQLite build has the FTS5 extension"""
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+# Decided once per process: every database it opens is migrated to have books_fts if this is set
+FTS5_AVAILABLE = fts5_available()
+
+def restore_deferred_objects(conn):
+    """Recreate the triggers and indexes saved in deferred_objects, each in its own transaction
+
+    An object is removed from the table once it exists again. One that can't be
+    created (say a unique index the loaded rows violate) stays saved while the
+    rest are restored; returns the (kind, name, error) of every failure, so the
+    caller can fix the data and call this again.
+    """
+    failures = []
+    saved = conn.execute("SELECT type, name, sql FROM deferred_objects ORDER BY rowid").fetchall()
+    for kind, name, sql in saved:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(sql)
+            conn.execute("DELETE FROM deferred_objects WHERE type = ? AND name = ?", (kind, name))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            failures.append((kind, name, str(e)))
+    return failures
+
+@contextmanager
+def deferred_maintenance(conn, triggers=(), indexes=()):
+    """Bulk-load mode: drop the triggers and secondary indexes on the given tables for the block
+
+    Rows loaded inside the block skip the per-row FTS and counter triggers and
+    index updates. The dropped objects' SQL is saved in the deferred_objects
+    table, in the same transaction that drops them. On the way out, even if the
+    load failed part way, each object is recreated on its own (see
+    restore_deferred_objects), the FTS catalog is reindexed and the dashboard
+    counters are recounted. If any object couldn't be recreated, a
+    sqlite3.DatabaseError names every one of them; they stay in deferred_objects
+    for a later restore_deferred_objects(). Only for loads that nothing else is
+    writing alongside.
+    """
+    tables = {"trigger": set(triggers), "index": set(indexes)}
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS deferred_objects (
+            type TEXT NOT NULL,
+            name TEXT NOT NULL,
+            sql TEXT NOT NULL,
+            dropped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (type, name)
+        )
+    """)
+    saved = [(kind, name, sql) for kind, name, table, sql in conn.execute("""
+        SELECT type, name, tbl_name, sql FROM sqlite_master
+        WHERE type IN ('trigger', 'index') AND sql IS NOT NULL
+    """).fetchall() if table in tables[kind]]
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany("INSERT OR REPLACE INTO deferred_objects (type, name, sql) VALUES (?, ?, ?)", saved)
+    for kind, name, _ in saved:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        failures = restore_deferred_objects(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        if "books" in tables["trigger"] and has_books_fts(conn):
+            conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+        rebuild_stats(conn)
+        conn.commit()
+        if failures:
+            raise sqlite3.DatabaseError(
+                "Could not recreate after bulk load (SQL kept in deferred_objects): "
+                + "; ".join(f"{kind} {name}: {error}" for kind, name, error in failures))
+
+# Schema migrations, applied in order on top of the base tables.
+# Each entry is (version, description, steps); a step is a SQL string or a callable(conn).
+MIGRATIONS = [
+    (1, "Indexes for circulation and fine lookups", [
+        # get_overdue_books / get_all_borrowings: status = 'borrowed' [AND due_date < ?]
+        """CREATE INDEX IF NOT EXISTS idx_borrowing_active_due
+           ON borrowing(due_date) WHERE status = 'borrowed'""",
+        # get_active_borrowings: member_id = ? AND status = 'borrowed', plus member history
+        """CREATE INDEX IF NOT EXISTS idx_borrowing_member_status
+           ON borrowing(member_id, status)""",
+        # get_member_fines: member_id = ? ORDER BY created_date DESC
+        """CREATE INDEX IF NOT EXISTS idx_fines_member_created
+           ON fines(member_id, created_date)""",
+        # Outstanding fine lookups: paid = 0
+        """CREATE INDEX IF NOT EXISTS idx_fines_unpaid_member
+           ON fines(member_id) WHERE paid = 0""",
+    ]),
+    (2, "FTS5 full-text catalog search", [
+        create_books_fts,
+    ]),
+    (3, "Normalized ISBN column with unique index", [
+        add_isbn_normalized,
+    ]),
+    (4, "Covering indexes for dashboard aggregates", [
+        # Totals and per-category counts scan this index instead of the wide books rows
+        """CREATE INDEX IF NOT EXISTS idx_books_category_stock
+           ON books(category, quantity, available_quantity)""",
+        # Member counts by status and the outstanding fine total
+        """CREATE INDEX IF NOT EXISTS idx_members_status_fine
+           ON members(membership_status, outstanding_fine)""",
+    ]),
+    (5, "Unpaid fines in fine_id order", [
+        # get_unpaid_fines keyset pages and running totals read only this index
+        # (paid is listed so the partial index also covers its own WHERE clause)
+        """CREATE INDEX IF NOT EXISTS idx_fines_unpaid
+           ON fines(fine_id, amount, paid) WHERE paid = 0""",
+    ]),
+    (6, "Accrued overdue fines", [
+        # Day the nightly job last recomputed an open loan's fine; NULL for every other fine
+        "ALTER TABLE fines ADD COLUMN accrued_date DATE",
+        # At most one accrued fine per loan: the job's upsert target, and the return-time lookup
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_fines_accrued_loan
+           ON fines(borrow_id) WHERE accrued_date IS NOT NULL""",
+    ]),
+    (7, "Trigger-maintained dashboard counters", [
+        create_stats_counters,
+    ]),
+    (8, "Change tracking for incremental exports", [
+        add_change_tracking,
+    ]),
+    (9, "FTS5 catalog search for databases that recorded migration 2 without it", [
+        # Older builds marked migration 2 applied even when SQLite lacked FTS5
+        create_books_fts,
+    ]),
+]
+
+class MigrationUnavailable(Exception):
+    """Raised by a migration step that can't run here; the migration is left pending for a later run"""
+
+def get_applied_versions(conn):
+    """Return the set of applied migration versions (empty for a fresh or legacy database)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a fresh or legacy database)"""
+    return max(get_applied_versions(conn), default=0)
+
+def apply_migrations(conn):
+    """Apply pending migrations in place, one transaction per migration
+
+    The applied versions are read again once each migration holds the write
+    lock, so processes starting together don't both apply the same one. A
+    migration whose step raises MigrationUnavailable is rolled back and not
+    recorded, so a later run can still apply it.
+    """
+    done = get_applied_versions(conn)
+    applied = []
+    for version, description, steps in MIGRATIONS:
+        if version in done:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = get_applied_versions(conn)
+            if version in done:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                         (version, description))
+            conn.commit()
+        except MigrationUnavailable:
+            conn.rollback()
+            continue
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+def migrate_database():
+    """Bring an existing database file up to the latest schema version"""
+    conn = get_connection()
+    try:
+        applied = apply_migrations(conn)
+    finally:
+        conn.close()
+    if applied:
+        print(f"Database upgraded to schema version {applied[-1]}")
+    return applied
+
 def get_connection():
-    """Get a database connection"""
-    return sqlite3.connect(DATABASE_FILE)
+    """Get a pooled database connection (close() returns it to the pool)"""
+    return get_pool().acquire()
+
+@contextmanager
+def pooled_connection():
+    """Check out a pooled connection and always hand it back, even on error"""
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     init_database()
@@ -1,9 +1,204 @@
 """
 Database operations for Library Management System
 """
-from database import get_connection
-from models import Book, Member, BorrowingRecord, Fine
+from database import pooled_connection, FTS5_AVAILABLE, recount_stats, rebuild_stats, LRUCache, CHANGE_CLOCK
+from database import init_database, current_branch, use_branch, list_branches, attached_branches, attach_limit
+from models import Book, Member, BorrowingRecord, Fine, normalize_isbn
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import functools
+import heapq
+import itertools
+import metrics
+import re
+import sqlite3
+import threading
+import time
+
+# Read-through caches for the by-ID lookups; every writer below invalidates what it changes.
+# Keys are scoped by branch, since each shard numbers its rows from 1.
+book_cache = LRUCache(scope=current_branch)
+member_cache = LRUCache(scope=current_branch)
+
+# Worker threads for cross-branch queries; each runs one shard's part on that shard's pool
+FAN_OUT_WORKERS = 8
+_fan_out_executor = None
+_fan_out_lock = threading.Lock()
+
+def fts_query(search_term):
+    """Turn free text into an FTS5 query where each word matches as a prefix"""
+    words = re.findall(r"\w+", search_term)
+    return " ".join(f'"{word}"*' for word in words)
+
+def run_in_batches(items, to_model, insert_batch, batch_size, progress, summary):
+    """Drive a bulk import on one pooled connection
+    
+    Each item is converted with to_model (a ValueError rejects just that row) and
+    full batches of (row_number, model) go to insert_batch(conn, batch, summary).
+    Timing and throughput are kept in summary and reported to progress(summary).
+    """
+    start = time.perf_counter()
+    
+    def flush(conn, batch):
+        insert_batch(conn, batch, summary)
+        summary["elapsed"] = time.perf_counter() - start
+        written = summary["inserted"] + summary.get("updated", 0)
+        summary["rows_per_sec"] = written / summary["elapsed"] if summary["elapsed"] else 0.0
+        if progress:
+            progress(summary)
+    
+    with pooled_connection() as conn:
+        batch = []
+        for row_number, item in enumerate(items, 1):
+            try:
+                model = to_model(item)
+            except ValueError as e:
+                summary["rejected"].append((row_number, str(e)))
+                continue
+            batch.append((row_number, model))
+            if len(batch) >= batch_size:
+                flush(conn, batch)
+                batch = []
+        if batch:
+            flush(conn, batch)
+    return summary
+
+def select_existing(conn, table, column, values):
+    """Return which of values already appear in table.column, querying in chunks"""
+    values = list(values)
+    existing = set()
+    for i in range(0, len(values), 500):
+        chunk = values[i:i + 500]
+        existing.update(row[0] for row in conn.execute(
+            f"SELECT {column} FROM {table} WHERE {column} IN ({','.join('?' * len(chunk))})", chunk))
+    return existing
+
+def insert_screened(conn, insert_sql, rows, to_params, summary):
+    """Insert a screened batch of (row_number, outcome, item) in its own transaction
+    
+    to_params turns each item into insert_sql's parameters, and each row written
+    is counted in summary[outcome]. The batch goes through executemany; if a
+    constraint still fails, it is redone row by row so only the offending rows
+    are rejected.
+    """
+    params = [to_params(item) for _, _, item in rows]
+    conn.execute("BEGIN")
+    try:
+        conn.executemany(insert_sql, params)
+        conn.commit()
+        for _, outcome, _ in rows:
+            summary[outcome] += 1
+    except sqlite3.IntegrityError:
+        # Something slipped past the screen: redo the batch row by row to find the offenders
+        conn.rollback()
+        conn.execute("BEGIN")
+        for (row_number, outcome, _), row_params in zip(rows, params):
+            try:
+                conn.execute(insert_sql, row_params)
+                summary[outcome] += 1
+            except sqlite3.IntegrityError as e:
+                summary["rejected"].append((row_number, str(e)))
+        conn.commit()
+
+def keyset_page(table, key, after=None, before=None, limit=20, where=None, model=None):
+    """Fetch one page of rows ordered by key, starting after or ending before a key value
+    
+    Seeks straight to the page through the primary key index, so the cost doesn't
+    grow with how deep into the table the page is. Rows are built as model
+    instances when a model class is given.
+    """
+    conditions = [where] if where else []
+    params = []
+    if before is not None:
+        conditions.append(f"{key} < ?")
+        params.append(before)
+        order = "DESC"
+    else:
+        conditions.append(f"{key} > ?")
+        params.append(after or 0)
+        order = "ASC"
+    sql = f"SELECT * FROM {table} WHERE {' AND '.join(conditions)} ORDER BY {key} {order} LIMIT ?"
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        if model is not None:
+            cursor.row_factory = model.row_factory
+        cursor.execute(sql, params + [limit])
+        rows = cursor.fetchmany(limit)
+    return rows[::-1] if before is not None else rows
+
+def iter_keyset(table, key, batch_size=500, start_after=0, where=None, model=None):
+    """Yield every row of table in key order, one keyset page at a time
+    
+    Only one page is held in memory, and no connection or read transaction is
+    kept open between pages.
+    """
+    last = start_after
+    while True:
+        rows = keyset_page(table, key, after=last, limit=batch_size, where=where, model=model)
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = getattr(rows[-1], key) if model is not None else rows[-1][0]
+
+def tracked(operation, outcomes=None):
+    """Count and time a circulation method in the metrics registry
+    
+    outcomes(result) returns one success flag per item the call handled, so a
+    batch checkout counts each book; without it every call counts as one success.
+    The children are looked up once here so each call only adds to its own
+    thread's cells.
+    """
+    latency = metrics.OPERATION_SECONDS.labels(operation)
+    succeeded = metrics.OPERATIONS.labels(operation, "success")
+    failed = metrics.OPERATIONS.labels(operation, "failure")
+    
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                latency.observe(time.perf_counter() - start)
+            if outcomes is None:
+                succeeded.inc()
+            else:
+                flags = outcomes(result)
+                ok = sum(1 for flag in flags if flag)
+                if ok:
+                    succeeded.inc(ok)
+                if len(flags) > ok:
+                    failed.inc(len(flags) - ok)
+            return result
+        return wrapper
+    return decorate
+
+def fan_out(func, branch_ids, *args, **kwargs):
+    """Run func(*args, **kwargs) once per branch, in parallel, each routed to its own shard
+    
+    Returns {branch_id: result} in branch_ids order.
+    """
+    global _fan_out_executor
+    
+    def run(branch_id):
+        with use_branch(branch_id):
+            return func(*args, **kwargs)
+    
+    if len(branch_ids) <= 1:
+        return {branch_id: run(branch_id) for branch_id in branch_ids}
+    with _fan_out_lock:
+        if _fan_out_executor is None:
+            _fan_out_executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="library-fan-out")
+    return dict(zip(branch_ids, _fan_out_executor.map(run, branch_ids)))
+
+def call_succeeded(result):
+    """Outcome of a (success, message) manager call"""
+    return [result[0]]
+
+def items_succeeded(results):
+    """Outcomes of a batch call's (id, success, message) results"""
+    return [success for _, success, _ in results]
+
 
 class BookManager:
     """Manage book operations"""
@@ -12,59 +207,153 @@ class BookManager:
     def add_book(book):
         """Add a new book to the library"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO books (title, author, isbn, publication_year, quantity, available_quantity, category)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (book.title, book.author, book.isbn, book.publication_year, book.quantity, book.available_quantity, book.category))
-            conn.commit()
-            book.book_id = cursor.lastrowid
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO books (title, author, isbn, publication_year, quantity, available_quantity, category, isbn_normalized)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (book.title, book.author, book.isbn, book.publication_year, book.quantity, book.available_quantity, book.category, normalize_isbn(book.isbn)))
+                conn.commit()
+                book.book_id = cursor.lastrowid
             return True
         except Exception as e:
             print(f"Error adding book: {e}")
             return False
     
+    @staticmethod
+    def add_books_bulk(books, batch_size=1000, progress=None):
+        """Add many books in batches of executemany inserts, one transaction per batch
+        
+        books can be any iterable (read lazily) of Book objects or dict records.
+        Rows that fail validation or duplicate an ISBN are rejected without aborting
+        the batch. progress(summary) is called after every committed batch.
+        Returns a summary dict: inserted, rejected [(row_number, reason)], elapsed, rows_per_sec.
+        """
+        summary = {"inserted": 0, "rejected": [], "elapsed": 0.0, "rows_per_sec": 0.0}
+        try:
+            run_in_batches(books, BookManager._book_for_import, BookManager._insert_book_batch,
+                           batch_size, progress, summary)
+        except Exception as e:
+            print(f"Error importing books: {e}")
+        return summary
+    
+    @staticmethod
+    def _book_for_import(item):
+        """Validate one bulk import item as a Book"""
+        book = item if isinstance(item, Book) else Book.from_record(item)
+        if not book.title or not book.author:
+            raise ValueError("Title and author are required")
+        return book
+    
+    @staticmethod
+    def _insert_book_batch(conn, batch, summary):
+        """Insert one batch in its own transaction, rejecting duplicate ISBNs"""
+        insert_sql = """
+            INSERT INTO books (title, author, isbn, publication_year, quantity, available_quantity, category, isbn_normalized)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        
+        # Screen out ISBNs already in the catalog or repeated within the batch up front,
+        # so the executemany fast path doesn't trip over the unique indexes
+        normalized = {row_number: normalize_isbn(book.isbn) for row_number, book in batch}
+        existing = select_existing(conn, "books", "isbn_normalized", (key for key in normalized.values() if key))
+        
+        rows = []
+        for row_number, book in batch:
+            key = normalized[row_number]
+            if key and key in existing:
+                summary["rejected"].append((row_number, f"Duplicate ISBN {book.isbn}"))
+                continue
+            existing.add(key)
+            rows.append((row_number, "inserted", (book, key)))
+        
+        def to_params(entry):
+            book, key = entry
+            return (book.title, book.author, book.isbn, book.publication_year, book.quantity,
+                    book.available_quantity, book.category, key)
+        
+        insert_screened(conn, insert_sql, rows, to_params, summary)
+    
     @staticmethod
     def get_book_by_id(book_id):
-        """Retrieve a book by ID"""
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM books WHERE book_id = ?", (book_id,))
-            row = cursor.fetchone()
-            conn.close()
-            if row:
-                book = Book(row[1], row[2], row[3], row[4], row[5], row[7])
-                book.book_id = row[0]
-                book.available_quantity = row[6]
-                return book
+        """Retrieve a book by ID, from the cache when possible"""
+        book = book_cache.get(book_id)
+        if book is not None:
+            return book.copy()
+        try:
+            token = book_cache.token()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Book.row_factory
+                cursor.execute("SELECT * FROM books WHERE book_id = ?", (book_id,))
+                book = cursor.fetchone()
+            if book is None:
+                return None
+            book_cache.put(book_id, book, token)
+            return book.copy()
+        except Exception as e:
+            print(f"Error retrieving book: {e}")
+            return None
+    
+    @staticmethod
+    def get_book_by_isbn(isbn):
+        """Retrieve a book by ISBN-10 or ISBN-13, with or without hyphens"""
+        normalized = normalize_isbn(isbn)
+        if normalized is None:
             return None
+        try:
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Book.row_factory
+                cursor.execute("SELECT * FROM books WHERE isbn_normalized = ?", (normalized,))
+                row = cursor.fetchone()
+            return row
         except Exception as e:
             print(f"Error retrieving book: {e}")
             return None
     
     @staticmethod
-    def search_books(search_term):
-        """Search books by title, author, or ISBN"""
+    @tracked("search")
+    def search_books(search_term, limit=None):
+        """Search books by title, author, category or ISBN, best matches first"""
+        if normalize_isbn(search_term) is not None:
+            # Scanned or typed ISBN: exact lookup on the normalized ISBN index
+            book = BookManager.get_book_by_isbn(search_term)
+            return [book] if book else []
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM books 
-                WHERE title LIKE ? OR author LIKE ? OR isbn LIKE ?
-            """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
-            rows = cursor.fetchall()
-            conn.close()
-            
-            books = []
-            for row in rows:
-                book = Book(row[1], row[2], row[3], row[4], row[5], row[7])
-                book.book_id = row[0]
-                book.available_quantity = row[6]
-                books.append(book)
-            return books
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Book.row_factory
+                match = fts_query(search_term)
+                if match and FTS5_AVAILABLE:
+                    # ISBN prefix matches ride the isbn UNIQUE index
+                    cursor.execute("""
+                        SELECT * FROM books WHERE isbn >= ? AND isbn < ?
+                        LIMIT ?
+                    """, (search_term, search_term + "\U0010ffff", -1 if limit is None else limit))
+                    rows = cursor.fetchall()
+                    
+                    # Every word must prefix-match title, author or category; rank by BM25
+                    cursor.execute("""
+                        SELECT books.* FROM books_fts
+                        JOIN books ON books.book_id = books_fts.rowid
+                        WHERE books_fts MATCH ?
+                        ORDER BY bm25(books_fts)
+                        LIMIT ?
+                    """, (match, -1 if limit is None else limit))
+                    seen = {book.book_id for book in rows}
+                    rows += [book for book in cursor.fetchall() if book.book_id not in seen]
+                    if limit is not None:
+                        rows = rows[:limit]
+                else:
+                    cursor.execute("""
+                        SELECT * FROM books 
+                        WHERE title LIKE ? OR author LIKE ? OR category LIKE ? OR isbn LIKE ?
+                        LIMIT ?
+                    """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%", f"%{search_term}%",
+                          -1 if limit is None else limit))
+                    rows = cursor.fetchall()
+            return rows
         except Exception as e:
             print(f"Error searching books: {e}")
             return []
@@ -73,19 +362,29 @@ class BookManager:
     def get_all_books():
         """Get all books from the library"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM books")
-            rows = cursor.fetchall()
-            conn.close()
-            
-            books = []
-            for row in rows:
-                book = Book(row[1], row[2], row[3], row[4], row[5], row[7])
-                book.book_id = row[0]
-                book.available_quantity = row[6]
-                books.append(book)
-            return books
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Book.row_factory
+                cursor.execute("SELECT * FROM books")
+                rows = cursor.fetchall()
+            return rows
+        except Exception as e:
+            print(f"Error retrieving books: {e}")
+            return []
+    
+    @staticmethod
+    def iter_books(batch_size=500, start_after=0):
+        """Stream all books in ID order with constant memory"""
+        try:
+            yield from iter_keyset("books", "book_id", batch_size, start_after, model=Book)
+        except Exception as e:
+            print(f"Error retrieving books: {e}")
+    
+    @staticmethod
+    def get_books_page(after_id=None, before_id=None, page_size=20):
+        """Get one page of books by ID: the next page after after_id, or the page ending before before_id"""
+        try:
+            return keyset_page("books", "book_id", after_id, before_id, page_size, model=Book)
         except Exception as e:
             print(f"Error retrieving books: {e}")
             return []
@@ -94,15 +393,15 @@ class BookManager:
     def update_book(book):
         """Update book information"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE books 
-                SET title = ?, author = ?, isbn = ?, publication_year = ?, quantity = ?, category = ?
-                WHERE book_id = ?
-            """, (book.title, book.author, book.isbn, book.publication_year, book.quantity, book.category, book.book_id))
-            conn.commit()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE books 
+                    SET title = ?, author = ?, isbn = ?, publication_year = ?, quantity = ?, category = ?, isbn_normalized = ?
+                    WHERE book_id = ?
+                """, (book.title, book.author, book.isbn, book.publication_year, book.quantity, book.category, normalize_isbn(book.isbn), book.book_id))
+                conn.commit()
+            book_cache.invalidate(book.book_id)
             return True
         except Exception as e:
             print(f"Error updating book: {e}")
@@ -112,11 +411,11 @@ class BookManager:
     def delete_book(book_id):
         """Delete a book from the library"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM books WHERE book_id = ?", (book_id,))
-            conn.commit()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM books WHERE book_id = ?", (book_id,))
+                conn.commit()
+            book_cache.invalidate(book_id)
             return True
         except Exception as e:
             print(f"Error deleting book: {e}")
@@ -130,36 +429,146 @@ class MemberManager:
     def add_member(member):
         """Add a new member to the library"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO members (name, email, phone, address)
-                VALUES (?, ?, ?, ?)
-            """, (member.name, member.email, member.phone, member.address))
-            conn.commit()
-            member.member_id = cursor.lastrowid
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO members (name, email, phone, address)
+                    VALUES (?, ?, ?, ?)
+                """, (member.name, member.email, member.phone, member.address))
+                conn.commit()
+                member.member_id = cursor.lastrowid
             return True
         except Exception as e:
             print(f"Error adding member: {e}")
             return False
     
+    @staticmethod
+    def add_members_bulk(members, batch_size=1000, on_duplicate="update", progress=None):
+        """Register many members in batches of executemany inserts, one transaction per batch
+        
+        members can be any iterable (read lazily) of Member objects or dict records.
+        on_duplicate decides what happens to an email that is already registered:
+        "update" refreshes the name, phone and address, "reject" reports the row.
+        Returns a summary dict: inserted, updated, rejected [(row_number, reason)], elapsed, rows_per_sec.
+        """
+        if on_duplicate not in ("update", "reject"):
+            raise ValueError("on_duplicate must be 'update' or 'reject'")
+        summary = {"inserted": 0, "updated": 0, "rejected": [], "elapsed": 0.0, "rows_per_sec": 0.0}
+        
+        def insert_batch(conn, batch, summary):
+            MemberManager._insert_member_batch(conn, batch, summary, on_duplicate)
+        
+        try:
+            run_in_batches(members, MemberManager._member_for_import, insert_batch, batch_size, progress, summary)
+        except Exception as e:
+            print(f"Error importing members: {e}")
+        return summary
+    
+    @staticmethod
+    def _member_for_import(item):
+        """Validate one bulk import item as a Member"""
+        member = item if isinstance(item, Member) else Member.from_record(item)
+        if not member.name:
+            raise ValueError("Name is required")
+        return member
+    
+    @staticmethod
+    def _insert_member_batch(conn, batch, summary, on_duplicate):
+        """Insert or upsert one batch in its own transaction"""
+        insert_sql = """
+            INSERT INTO members (name, email, phone, address)
+            VALUES (?, ?, ?, ?)
+        """
+        if on_duplicate == "update":
+            insert_sql += """
+                ON CONFLICT (email) DO UPDATE SET
+                    name = excluded.name,
+                    phone = COALESCE(excluded.phone, members.phone),
+                    address = COALESCE(excluded.address, members.address)
+            """
+        
+        # Classify each row up front so the summary can tell inserts from updates
+        existing = select_existing(conn, "members", "email", (member.email for _, member in batch if member.email))
+        rows = []
+        for row_number, member in batch:
+            outcome = "inserted"
+            if member.email and member.email in existing:
+                if on_duplicate == "reject":
+                    summary["rejected"].append((row_number, f"Duplicate email {member.email}"))
+                    continue
+                outcome = "updated"
+            elif member.email:
+                existing.add(member.email)
+            rows.append((row_number, outcome, member))
+        
+        insert_screened(conn, insert_sql, rows,
+                        lambda member: (member.name, member.email, member.phone, member.address), summary)
+        
+        updated = {member.email for _, outcome, member in rows if outcome == "updated"}
+        if updated:
+            member_cache.invalidate_if(lambda member: member.email in updated)
+    
     @staticmethod
     def get_member_by_id(member_id):
-        """Retrieve a member by ID"""
-        try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM members WHERE member_id = ?", (member_id,))
-            row = cursor.fetchone()
-            conn.close()
-            if row:
-                member = Member(row[1], row[2], row[3], row[4])
-                member.member_id = row[0]
-                member.membership_status = row[6]
-                member.outstanding_fine = row[7]
-                return member
+        """Retrieve a member by ID, from the cache when possible"""
+        member = member_cache.get(member_id)
+        if member is not None:
+            return member.copy()
+        try:
+            token = member_cache.token()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Member.row_factory
+                cursor.execute("SELECT * FROM members WHERE member_id = ?", (member_id,))
+                member = cursor.fetchone()
+            if member is None:
+                return None
+            member_cache.put(member_id, member, token)
+            return member.copy()
+        except Exception as e:
+            print(f"Error retrieving member: {e}")
             return None
+    
+    @staticmethod
+    def get_member_dashboard(member_id):
+        """Get a member with their active loans and unpaid fines on one connection
+        
+        Returns None if the member doesn't exist, otherwise a dict with:
+        member, active_loans [(borrow_id, book_id, title, due_date, is_overdue)] ordered by due date,
+        and unpaid_fines [(fine_id, amount, reason, created_date)] newest first.
+        """
+        try:
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Member.row_factory
+                cursor.execute("SELECT * FROM members WHERE member_id = ?", (member_id,))
+                member = cursor.fetchone()
+                if not member:
+                    return None
+                
+                cursor.row_factory = None
+                cursor.execute("""
+                    SELECT b.borrow_id, b.book_id, COALESCE(bk.title, '(deleted book)'), b.due_date, b.due_date < ?
+                    FROM borrowing b
+                    LEFT JOIN books bk ON bk.book_id = b.book_id
+                    WHERE b.member_id = ? AND b.status = 'borrowed'
+                    ORDER BY b.due_date
+                """, (datetime.now(), member_id))
+                active_loans = [loan[:4] + (bool(loan[4]),) for loan in cursor.fetchall()]
+                
+                cursor.execute("""
+                    SELECT fine_id, amount, reason, created_date
+                    FROM fines
+                    WHERE member_id = ? AND paid = 0
+                    ORDER BY created_date DESC
+                """, (member_id,))
+                unpaid_fines = cursor.fetchall()
+            
+            return {
+                "member": member,
+                "active_loans": active_loans,
+                "unpaid_fines": unpaid_fines,
+            }
         except Exception as e:
             print(f"Error retrieving member: {e}")
             return None
@@ -168,23 +577,15 @@ class MemberManager:
     def search_members(search_term):
         """Search members by name or email"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM members 
-                WHERE name LIKE ? OR email LIKE ?
-            """, (f"%{search_term}%", f"%{search_term}%"))
-            rows = cursor.fetchall()
-            conn.close()
-            
-            members = []
-            for row in rows:
-                member = Member(row[1], row[2], row[3], row[4])
-                member.member_id = row[0]
-                member.membership_status = row[6]
-                member.outstanding_fine = row[7]
-                members.append(member)
-            return members
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Member.row_factory
+                cursor.execute("""
+                    SELECT * FROM members 
+                    WHERE name LIKE ? OR email LIKE ?
+                """, (f"%{search_term}%", f"%{search_term}%"))
+                rows = cursor.fetchall()
+            return rows
         except Exception as e:
             print(f"Error searching members: {e}")
             return []
@@ -193,20 +594,29 @@ class MemberManager:
     def get_all_members():
         """Get all members"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM members")
-            rows = cursor.fetchall()
-            conn.close()
-            
-            members = []
-            for row in rows:
-                member = Member(row[1], row[2], row[3], row[4])
-                member.member_id = row[0]
-                member.membership_status = row[6]
-                member.outstanding_fine = row[7]
-                members.append(member)
-            return members
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Member.row_factory
+                cursor.execute("SELECT * FROM members")
+                rows = cursor.fetchall()
+            return rows
+        except Exception as e:
+            print(f"Error retrieving members: {e}")
+            return []
+    
+    @staticmethod
+    def iter_members(batch_size=500, start_after=0):
+        """Stream all members in ID order with constant memory"""
+        try:
+            yield from iter_keyset("members", "member_id", batch_size, start_after, model=Member)
+        except Exception as e:
+            print(f"Error retrieving members: {e}")
+    
+    @staticmethod
+    def get_members_page(after_id=None, before_id=None, page_size=20):
+        """Get one page of members by ID: the next page after after_id, or the page ending before before_id"""
+        try:
+            return keyset_page("members", "member_id", after_id, before_id, page_size, model=Member)
         except Exception as e:
             print(f"Error retrieving members: {e}")
             return []
@@ -215,15 +625,15 @@ class MemberManager:
     def update_member(member):
         """Update member information"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE members 
-                SET name = ?, email = ?, phone = ?, address = ?, membership_status = ?, outstanding_fine = ?
-                WHERE member_id = ?
-            """, (member.name, member.email, member.phone, member.address, member.membership_status, member.outstanding_fine, member.member_id))
-            conn.commit()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE members 
+                    SET name = ?, email = ?, phone = ?, address = ?, membership_status = ?, outstanding_fine = ?
+                    WHERE member_id = ?
+                """, (member.name, member.email, member.phone, member.address, member.membership_status, member.outstanding_fine, member.member_id))
+                conn.commit()
+            member_cache.invalidate(member.member_id)
             return True
         except Exception as e:
             print(f"Error updating member: {e}")
@@ -233,11 +643,11 @@ class MemberManager:
     def delete_member(member_id):
         """Delete a member"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM members WHERE member_id = ?", (member_id,))
-            conn.commit()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM members WHERE member_id = ?", (member_id,))
+                conn.commit()
+            member_cache.invalidate(member_id)
             return True
         except Exception as e:
             print(f"Error deleting member: {e}")
@@ -248,104 +658,214 @@ class BorrowingManager:
     """Manage borrowing operations"""
     
     @staticmethod
+    @tracked("checkout", call_succeeded)
     def borrow_book(member_id, book_id, borrow_duration_days=14):
         """Record a book borrowing"""
         try:
-            # Check if book is available
-            book = BookManager.get_book_by_id(book_id)
-            if not book or book.available_quantity <= 0:
-                return False, "Book not available"
-            
-            # Create borrowing record
             borrowing = BorrowingRecord(member_id, book_id, borrow_duration_days)
             
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO borrowing (member_id, book_id, borrow_date, due_date, status)
-                VALUES (?, ?, ?, ?, ?)
-            """, (borrowing.member_id, borrowing.book_id, borrowing.borrow_date, borrowing.due_date, borrowing.status))
-            conn.commit()
-            borrowing.borrow_id = cursor.lastrowid
-            
-            # Update available quantity
-            cursor.execute("""
-                UPDATE books SET available_quantity = available_quantity - 1 WHERE book_id = ?
-            """, (book_id,))
-            conn.commit()
-            conn.close()
+            with pooled_connection() as conn:
+                # Take the write lock up front so the availability check and the
+                # decrement can't interleave with another desk's checkout
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    UPDATE books SET available_quantity = available_quantity - 1, changed_at = {CHANGE_CLOCK}
+                    WHERE book_id = ? AND available_quantity > 0
+                """, (book_id,))
+                if cursor.rowcount == 0:
+                    conn.rollback()
+                    return False, "Book not available"
+                
+                # Create borrowing record
+                cursor.execute("""
+                    INSERT INTO borrowing (member_id, book_id, borrow_date, due_date, status)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (borrowing.member_id, borrowing.book_id, borrowing.borrow_date, borrowing.due_date, borrowing.status))
+                borrowing.borrow_id = cursor.lastrowid
+                conn.commit()
+            book_cache.invalidate(book_id)
             
             return True, f"Book borrowed successfully. Due date: {borrowing.due_date.strftime('%Y-%m-%d')}"
         except Exception as e:
             return False, f"Error borrowing book: {e}"
     
+    @staticmethod
+    @tracked("checkout", items_succeeded)
+    def borrow_books(member_id, book_ids, borrow_duration_days=14):
+        """Check out several books for one member in a single transaction
+        
+        Returns one (book_id, success, message) tuple per requested book, in order.
+        Books without a free copy fail individually; the rest are still lent.
+        """
+        book_ids = list(book_ids)
+        if not book_ids:
+            return []
+        try:
+            borrowing = BorrowingRecord(member_id, None, borrow_duration_days)
+            due = borrowing.due_date.strftime('%Y-%m-%d')
+            
+            with pooled_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                placeholders = ",".join("?" * len(set(book_ids)))
+                available = dict(conn.execute(f"""
+                    SELECT book_id, available_quantity FROM books WHERE book_id IN ({placeholders})
+                """, list(set(book_ids))).fetchall())
+                
+                # Hand out copies in scan order while the write lock keeps the counts stable
+                results = []
+                taken = {}
+                for book_id in book_ids:
+                    if available.get(book_id, 0) - taken.get(book_id, 0) > 0:
+                        taken[book_id] = taken.get(book_id, 0) + 1
+                        results.append((book_id, True, None))
+                    else:
+                        results.append((book_id, False, "Book not available"))
+                
+                if taken:
+                    conn.executemany(f"""
+                        UPDATE books SET available_quantity = available_quantity - ?, changed_at = {CHANGE_CLOCK}
+                        WHERE book_id = ? AND available_quantity >= ?
+                    """, [(count, book_id, count) for book_id, count in taken.items()])
+                    last_id = conn.execute("SELECT COALESCE(MAX(borrow_id), 0) FROM borrowing").fetchone()[0]
+                    conn.executemany("""
+                        INSERT INTO borrowing (member_id, book_id, borrow_date, due_date, status)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, [(member_id, book_id, borrowing.borrow_date, borrowing.due_date, borrowing.status)
+                          for book_id, success, _ in results if success])
+                    # We hold the write lock, so every row past last_id is ours, in insert order
+                    new_ids = iter(row[0] for row in conn.execute(
+                        "SELECT borrow_id FROM borrowing WHERE borrow_id > ? ORDER BY borrow_id", (last_id,)))
+                    results = [(book_id, True, f"Book borrowed successfully. Borrowing ID: {next(new_ids)}. Due date: {due}")
+                               if success else (book_id, success, message)
+                               for book_id, success, message in results]
+                conn.commit()
+            book_cache.invalidate(*taken)
+            return results
+        except Exception as e:
+            return [(book_id, False, f"Error borrowing book: {e}") for book_id in book_ids]
+    
     @staticmethod
     def return_book(borrow_id, fine_per_day=1.0):
         """Record a book return"""
+        _, success, message = BorrowingManager.return_books([borrow_id], fine_per_day)[0]
+        return success, message
+    
+    @staticmethod
+    @tracked("return", items_succeeded)
+    def return_books(borrow_ids, fine_per_day=1.0):
+        """Check in several loans in a single transaction
+        
+        Late fines are recorded per loan and added to each member's balance with
+        one update per member. A fine already accrued by accrue_overdue_fines is
+        settled in place (or topped up if it was paid) rather than charged twice.
+        Returns one (borrow_id, success, message) tuple per requested loan, in order.
+        """
+        borrow_ids = list(borrow_ids)
+        if not borrow_ids:
+            return []
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM borrowing WHERE borrow_id = ?", (borrow_id,))
-            row = cursor.fetchone()
-            
-            if not row:
-                return False, "Borrowing record not found"
-            
-            # Calculate fine if overdue
-            due_date = datetime.fromisoformat(row[4])
-            fine_amount = 0.0
-            if datetime.now() > due_date:
-                days_overdue = (datetime.now() - due_date).days
-                fine_amount = days_overdue * fine_per_day
-            
-            # Update borrowing record
-            cursor.execute("""
-                UPDATE borrowing 
-                SET return_date = ?, status = 'returned', fine_amount = ?
-                WHERE borrow_id = ?
-            """, (datetime.now(), fine_amount, borrow_id))
-            
-            # Update available quantity
-            cursor.execute("""
-                UPDATE books SET available_quantity = available_quantity + 1 
-                WHERE book_id = ?
-            """, (row[2],))
-            
-            # If there's a fine, add it to member's outstanding fine
-            if fine_amount > 0:
-                cursor.execute("""
-                    UPDATE members SET outstanding_fine = outstanding_fine + ?
-                    WHERE member_id = ?
-                """, (fine_amount, row[1]))
+            now = datetime.now()
+            with pooled_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                placeholders = ",".join("?" * len(set(borrow_ids)))
+                loans = {row[0]: row for row in conn.execute(f"""
+                    SELECT borrow_id, member_id, book_id, due_date, status
+                    FROM borrowing WHERE borrow_id IN ({placeholders})
+                """, list(set(borrow_ids)))}
+                accrued = {row[0]: row[1:] for row in conn.execute(f"""
+                    SELECT borrow_id, fine_id, amount, paid
+                    FROM fines WHERE accrued_date IS NOT NULL AND borrow_id IN ({placeholders})
+                """, list(set(borrow_ids)))}
                 
-                # Create fine record
-                cursor.execute("""
+                results = []
+                returned = []
+                copies = {}
+                member_fines = {}
+                fine_rows = []
+                settled_fines = []
+                for borrow_id in borrow_ids:
+                    loan = loans.get(borrow_id)
+                    if not loan:
+                        results.append((borrow_id, False, "Borrowing record not found"))
+                        continue
+                    _, member_id, book_id, due_date, status = loan
+                    if status != 'borrowed':
+                        results.append((borrow_id, False, "Book already returned"))
+                        continue
+                    # Mark as handled so a repeated scan of the same loan is rejected
+                    loans[borrow_id] = (borrow_id, member_id, book_id, due_date, 'returned')
+                    
+                    # Calculate fine if overdue
+                    due_date = datetime.fromisoformat(due_date)
+                    fine_amount = 0.0
+                    days_overdue = 0
+                    if now > due_date:
+                        days_overdue = (now - due_date).days
+                        fine_amount = days_overdue * fine_per_day
+                    
+                    # Only the part not already charged by the accrual job goes on the balance
+                    charged = 0.0
+                    reason = f"Late return fine - {days_overdue} days overdue"
+                    if borrow_id in accrued:
+                        fine_id, charged, paid = accrued[borrow_id]
+                        fine_amount = max(fine_amount, charged)
+                        if not paid:
+                            settled_fines.append((fine_amount, reason, fine_id))
+                        elif fine_amount > charged:
+                            fine_rows.append((member_id, borrow_id, fine_amount - charged, reason + " (balance)"))
+                    elif fine_amount > 0:
+                        fine_rows.append((member_id, borrow_id, fine_amount, reason))
+                    
+                    returned.append((now, fine_amount, borrow_id))
+                    copies[book_id] = copies.get(book_id, 0) + 1
+                    message = "Book returned successfully"
+                    if fine_amount > charged:
+                        member_fines[member_id] = member_fines.get(member_id, 0.0) + fine_amount - charged
+                    if fine_amount > 0:
+                        message += f". Fine imposed: ${fine_amount:.2f}"
+                    results.append((borrow_id, True, message))
+                
+                conn.executemany(f"""
+                    UPDATE borrowing 
+                    SET return_date = ?, status = 'returned', fine_amount = ?, changed_at = {CHANGE_CLOCK}
+                    WHERE borrow_id = ?
+                """, returned)
+                conn.executemany(f"""
+                    UPDATE books SET available_quantity = available_quantity + ?, changed_at = {CHANGE_CLOCK}
+                    WHERE book_id = ?
+                """, [(count, book_id) for book_id, count in copies.items()])
+                conn.executemany(f"""
+                    UPDATE members SET outstanding_fine = outstanding_fine + ?, changed_at = {CHANGE_CLOCK}
+                    WHERE member_id = ?
+                """, [(amount, member_id) for member_id, amount in member_fines.items()])
+                conn.executemany("""
                     INSERT INTO fines (member_id, borrow_id, amount, reason)
                     VALUES (?, ?, ?, ?)
-                """, (row[1], borrow_id, fine_amount, f"Late return fine - {days_overdue} days overdue"))
-            
-            conn.commit()
-            conn.close()
-            
-            message = f"Book returned successfully"
-            if fine_amount > 0:
-                message += f". Fine imposed: ${fine_amount:.2f}"
-            return True, message
+                """, fine_rows)
+                conn.executemany(f"""
+                    UPDATE fines SET amount = ?, reason = ?, accrued_date = NULL, changed_at = {CHANGE_CLOCK}
+                    WHERE fine_id = ?
+                """, settled_fines)
+                conn.commit()
+            book_cache.invalidate(*copies)
+            member_cache.invalidate(*member_fines)
+            return results
         except Exception as e:
-            return False, f"Error returning book: {e}"
+            return [(borrow_id, False, f"Error returning book: {e}") for borrow_id in borrow_ids]
     
     @staticmethod
     def get_active_borrowings(member_id):
         """Get active borrowings for a member"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM borrowing 
-                WHERE member_id = ? AND status = 'borrowed'
-            """, (member_id,))
-            rows = cursor.fetchall()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = BorrowingRecord.row_factory
+                cursor.execute("""
+                    SELECT * FROM borrowing 
+                    WHERE member_id = ? AND status = 'borrowed'
+                """, (member_id,))
+                rows = cursor.fetchall()
             return rows
         except Exception as e:
             print(f"Error retrieving borrowings: {e}")
@@ -355,30 +875,51 @@ class BorrowingManager:
     def get_all_borrowings():
         """Get all borrowing records"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM borrowing WHERE status = 'borrowed'")
-            rows = cursor.fetchall()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = BorrowingRecord.row_factory
+                cursor.execute("SELECT * FROM borrowing WHERE status = 'borrowed'")
+                rows = cursor.fetchall()
             return rows
         except Exception as e:
             print(f"Error retrieving borrowings: {e}")
             return []
     
     @staticmethod
-    def get_overdue_books():
-        """Get all overdue books"""
+    def get_borrowings_page(after_id=None, before_id=None, page_size=20):
+        """Get one page of active borrowings by ID: the next page after after_id, or the page ending before before_id"""
+        try:
+            return keyset_page("borrowing", "borrow_id", after_id, before_id, page_size,
+                               where="status = 'borrowed'", model=BorrowingRecord)
+        except Exception as e:
+            print(f"Error retrieving borrowings: {e}")
+            return []
+    
+    @staticmethod
+    def iter_borrowings(batch_size=500, start_after=0):
+        """Stream active borrowings in ID order with constant memory"""
+        try:
+            yield from iter_keyset("borrowing", "borrow_id", batch_size, start_after,
+                                   where="status = 'borrowed'", model=BorrowingRecord)
+        except Exception as e:
+            print(f"Error retrieving borrowings: {e}")
+    
+    @staticmethod
+    def get_overdue_books(after_id=None, limit=None):
+        """Get overdue books as (BorrowingRecord, member_name) pairs in borrow ID order, optionally one page at a time"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT b.*, m.name 
-                FROM borrowing b
-                JOIN members m ON b.member_id = m.member_id
-                WHERE b.status = 'borrowed' AND b.due_date < ?
-            """, (datetime.now(),))
-            rows = cursor.fetchall()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = lambda cursor, row: (BorrowingRecord.row_factory(cursor, row), row[-1])
+                cursor.execute("""
+                    SELECT b.*, m.name 
+                    FROM borrowing b
+                    JOIN members m ON b.member_id = m.member_id
+                    WHERE b.status = 'borrowed' AND b.due_date < ? AND b.borrow_id > ?
+                    ORDER BY b.borrow_id
+                    LIMIT ?
+                """, (datetime.now(), after_id or 0, -1 if limit is None else limit))
+                rows = cursor.fetchall()
             return rows
         except Exception as e:
             print(f"Error retrieving overdue books: {e}")
@@ -389,48 +930,382 @@ class FineManager:
     """Manage fine operations"""
     
     @staticmethod
+    @tracked("fine_payment", call_succeeded)
     def pay_fine(fine_id):
         """Mark a fine as paid"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            
-            # Get fine details
-            cursor.execute("SELECT * FROM fines WHERE fine_id = ?", (fine_id,))
-            row = cursor.fetchone()
-            if not row:
-                return False, "Fine not found"
-            
-            # Update fine as paid
-            cursor.execute("""
-                UPDATE fines SET paid = 1 WHERE fine_id = ?
-            """, (fine_id,))
-            
-            # Update member's outstanding fine
-            cursor.execute("""
-                UPDATE members SET outstanding_fine = outstanding_fine - ?
-                WHERE member_id = ?
-            """, (row[3], row[1]))
-            
-            conn.commit()
-            conn.close()
-            return True, f"Fine paid successfully. Amount: ${row[3]:.2f}"
+            with pooled_connection() as conn:
+                # Under the write lock a retried or concurrent payment sees paid = 1
+                # and changes nothing, so the balance is only reduced once
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+                
+                # Get fine details
+                cursor.row_factory = Fine.row_factory
+                cursor.execute("SELECT * FROM fines WHERE fine_id = ?", (fine_id,))
+                fine = cursor.fetchone()
+                if not fine:
+                    conn.rollback()
+                    return False, "Fine not found"
+                
+                # Update fine as paid
+                cursor.execute(f"""
+                    UPDATE fines SET paid = 1, changed_at = {CHANGE_CLOCK} WHERE fine_id = ? AND paid = 0
+                """, (fine_id,))
+                if cursor.rowcount != 1:
+                    conn.rollback()
+                    return False, "Fine already paid"
+                
+                # Update member's outstanding fine
+                cursor.execute(f"""
+                    UPDATE members SET outstanding_fine = outstanding_fine - ?, changed_at = {CHANGE_CLOCK}
+                    WHERE member_id = ?
+                """, (fine.amount, fine.member_id))
+                
+                conn.commit()
+            member_cache.invalidate(fine.member_id)
+            return True, f"Fine paid successfully. Amount: ${fine.amount:.2f}"
         except Exception as e:
             return False, f"Error paying fine: {e}"
     
+    @staticmethod
+    @tracked("fine_accrual")
+    def accrue_overdue_fines(as_of=None, fine_per_day=1.0):
+        """Bring the fine on every overdue open loan up to date, in one set-based transaction
+        
+        Each overdue loan carries one accrued fine row, recomputed as whole days
+        overdue at the start of as_of (a date, default today) times fine_per_day.
+        Member balances move by the difference from the previous run, so running
+        the job again for the same day changes nothing. Accrued fines that were
+        already paid are left alone; return_books settles the rest at check-in.
+        Returns a summary dict: as_of, overdue_loans, created, updated, amount_added, elapsed.
+        """
+        as_of = as_of or datetime.now().date()
+        start = time.perf_counter()
+        summary = {"as_of": as_of, "overdue_loans": 0, "created": 0, "updated": 0, "amount_added": 0.0, "elapsed": 0.0}
+        try:
+            with pooled_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DROP TABLE IF EXISTS temp.accrual")
+                conn.execute("""
+                    CREATE TEMP TABLE accrual AS
+                    SELECT b.borrow_id, b.member_id, b.days, b.days * ? AS amount, f.amount AS old_amount
+                    FROM (
+                        SELECT borrow_id, member_id, CAST(julianday(?) - julianday(due_date) AS INTEGER) AS days
+                        FROM borrowing
+                        WHERE status = 'borrowed' AND due_date < ?
+                    ) b
+                    LEFT JOIN fines f ON f.borrow_id = b.borrow_id AND f.accrued_date IS NOT NULL
+                    WHERE b.days >= 1 AND COALESCE(f.paid, 0) = 0
+                """, (fine_per_day, str(as_of), f"{as_of} 00:00:00"))
+                
+                (summary["overdue_loans"], summary["created"], summary["updated"],
+                 summary["amount_added"]) = conn.execute("""
+                    SELECT COUNT(*),
+                           COUNT(*) FILTER (WHERE old_amount IS NULL),
+                           COUNT(*) FILTER (WHERE old_amount != amount),
+                           COALESCE(SUM(amount - COALESCE(old_amount, 0)), 0)
+                    FROM accrual
+                """).fetchone()
+                
+                conn.execute(f"""
+                    UPDATE members SET outstanding_fine = outstanding_fine + d.delta, changed_at = {CHANGE_CLOCK}
+                    FROM (
+                        SELECT member_id, SUM(amount - COALESCE(old_amount, 0)) AS delta
+                        FROM accrual GROUP BY member_id
+                    ) AS d
+                    WHERE members.member_id = d.member_id AND d.delta != 0
+                """)
+                conn.execute(f"""
+                    INSERT INTO fines (member_id, borrow_id, amount, reason, accrued_date)
+                    SELECT member_id, borrow_id, amount, 'Overdue fine - ' || days || ' days overdue (accrued)', ?
+                    FROM accrual
+                    WHERE old_amount IS NULL OR old_amount != amount
+                    ON CONFLICT (borrow_id) WHERE accrued_date IS NOT NULL DO UPDATE SET
+                        amount = excluded.amount,
+                        reason = excluded.reason,
+                        accrued_date = excluded.accrued_date,
+                        changed_at = {CHANGE_CLOCK}
+                """, (str(as_of),))
+                conn.execute("DROP TABLE temp.accrual")
+                conn.commit()
+            # Balances can change for any number of members
+            member_cache.clear()
+        except Exception as e:
+            print(f"Error accruing fines: {e}")
+        summary["elapsed"] = time.perf_counter() - start
+        return summary
+    
     @staticmethod
     def get_member_fines(member_id):
         """Get all fines for a member"""
         try:
-            conn = get_connection()
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM fines 
-                WHERE member_id = ? ORDER BY created_date DESC
-            """, (member_id,))
-            rows = cursor.fetchall()
-            conn.close()
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = Fine.row_factory
+                cursor.execute("""
+                    SELECT * FROM fines 
+                    WHERE member_id = ? ORDER BY created_date DESC
+                """, (member_id,))
+                rows = cursor.fetchall()
             return rows
         except Exception as e:
             print(f"Error retrieving fines: {e}")
             return []
+
+    
+    @staticmethod
+    def get_unpaid_fines(after_id=None, before_id=None, limit=None):
+        """Get unpaid fines with member names in fine ID order, optionally one keyset page at a time
+        
+        Each row is (fine_id, member_id, member_name, amount, reason, created_date, running_total),
+        where running_total includes every unpaid fine up to and including that row.
+        """
+        try:
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                if before_id is not None:
+                    condition, params, order = "f.fine_id < ?", [before_id], "DESC"
+                else:
+                    condition, params, order = "f.fine_id > ?", [after_id or 0], "ASC"
+                cursor.execute(f"""
+                    SELECT f.fine_id, f.member_id, COALESCE(m.name, '(deleted member)'), f.amount, f.reason, f.created_date
+                    FROM fines f
+                    LEFT JOIN members m ON m.member_id = f.member_id
+                    WHERE f.paid = 0 AND {condition}
+                    ORDER BY f.fine_id {order}
+                    LIMIT ?
+                """, params + [-1 if limit is None else limit])
+                rows = cursor.fetchall()
+                if order == "DESC":
+                    rows.reverse()
+                if not rows:
+                    return []
+                
+                cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM fines WHERE paid = 0 AND fine_id < ?", (rows[0][0],))
+                running_total = cursor.fetchone()[0]
+            
+            fines = []
+            for row in rows:
+                running_total += row[3]
+                fines.append(row + (running_total,))
+            return fines
+        except Exception as e:
+            print(f"Error retrieving fines: {e}")
+            return []
+    
+    @staticmethod
+    def get_unpaid_fines_summary():
+        """Get the number and total amount of unpaid fines"""
+        try:
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT COALESCE(SUM(value) FILTER (WHERE name = 'unpaid_fines'), 0),
+                           COALESCE(SUM(value) FILTER (WHERE name = 'unpaid_fine_amount'), 0)
+                    FROM stats_counters
+                """)
+                count, total = cursor.fetchone()
+                return int(count), round(total, 2)
+        except Exception as e:
+            print(f"Error retrieving fines: {e}")
+            return (0, 0.0)
+
+
+class ReportManager:
+    """Compute library statistics with SQL aggregates"""
+    
+    @staticmethod
+    def get_dashboard_stats(top_categories=5):
+        """Get every dashboard figure from the trigger-maintained counters
+        
+        Reads a handful of small rows regardless of catalog size. Only the
+        overdue count touches borrowing, and only for loans due earlier today.
+        """
+        try:
+            now = datetime.now()
+            midnight = datetime.combine(now.date(), datetime.min.time())
+            with pooled_connection() as conn:
+                cursor = conn.cursor()
+                counters = dict(cursor.execute("SELECT name, value FROM stats_counters").fetchall())
+                cursor.execute("""
+                    SELECT
+                        (SELECT COALESCE(SUM(loans), 0) FROM stats_due_days WHERE due_day < ?),
+                        (SELECT COUNT(*) FROM borrowing WHERE status = 'borrowed' AND due_date >= ? AND due_date < ?)
+                """, (str(now.date()), midnight, now))
+                overdue_before_today, overdue_today = cursor.fetchone()
+                cursor.execute("SELECT category, books FROM stats_categories ORDER BY books DESC LIMIT ?",
+                               (top_categories,))
+                categories = cursor.fetchall()
+            
+            return {
+                "total_books": int(counters["total_books"]),
+                "available_books": int(counters["available_books"]),
+                "borrowed_books": int(counters["borrowed_books"]),
+                "total_members": int(counters["total_members"]),
+                "active_members": int(counters["active_members"]),
+                "outstanding_fines": round(counters["outstanding_fines"], 2),
+                "active_borrowings": int(counters["active_borrowings"]),
+                "overdue_books": overdue_before_today + overdue_today,
+                "top_categories": categories,
+            }
+        except Exception as e:
+            print(f"Error computing statistics: {e}")
+            return None
+    
+    @staticmethod
+    def check_stats():
+        """Compare the stored counters with a full recount
+        
+        Returns a list of (counter, stored, recounted) mismatches; empty means consistent.
+        Category and due-day counters are reported as "category:<name>" and "due:<day>".
+        """
+        try:
+            with pooled_connection() as conn:
+                # One read transaction so the recount and the counters see the same snapshot
+                conn.execute("BEGIN")
+                counters, categories, due_days = recount_stats(conn)
+                stored = dict(conn.execute("SELECT name, value FROM stats_counters").fetchall())
+                stored_categories = dict(conn.execute("SELECT category, books FROM stats_categories").fetchall())
+                stored_due_days = dict(conn.execute("SELECT due_day, loans FROM stats_due_days").fetchall())
+                conn.rollback()
+            
+            mismatches = [(name, stored.get(name), value) for name, value in counters.items()
+                          if stored.get(name) is None or abs(stored[name] - value) > 0.005]
+            for prefix, expected, actual in (("category", categories, stored_categories),
+                                             ("due", due_days, stored_due_days)):
+                for key in sorted(set(expected) | set(actual), key=str):
+                    if expected.get(key, 0) != actual.get(key, 0):
+                        mismatches.append((f"{prefix}:{key}", actual.get(key), expected.get(key)))
+            return mismatches
+        except Exception as e:
+            print(f"Error checking statistics: {e}")
+            return None
+    
+    @staticmethod
+    def rebuild_stats():
+        """Reset every counter from a full recount"""
+        try:
+            with pooled_connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rebuild_stats(conn)
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"Error rebuilding statistics: {e}")
+            return False
+
+
+
+class BranchManager:
+    """Manage branch shards and queries that span every branch
+    
+    Each branch keeps its catalog, members, loans and fines in its own database
+    file. Run the other managers inside database.use_branch(branch_id) to work
+    on one branch; the methods here fan out across several.
+    """
+    
+    @staticmethod
+    def create_branch(branch_id):
+        """Create (or migrate) a branch's shard"""
+        try:
+            with use_branch(branch_id):
+                init_database()
+            return True, f"Branch {branch_id} ready"
+        except Exception as e:
+            return False, f"Error creating branch: {e}"
+    
+    @staticmethod
+    def get_branches():
+        """Every branch with a shard, sorted by ID"""
+        return list_branches()
+    
+    @staticmethod
+    def search_catalog(search_term, limit=20, branch_ids=None):
+        """Search every branch's catalog in parallel
+        
+        Returns (branch_id, Book) pairs, taking each branch's best match in turn,
+        then each branch's second best, and so on. BM25 scores come from each
+        shard's own index, so they aren't compared across branches.
+        """
+        try:
+            branch_ids = list_branches() if branch_ids is None else list(branch_ids)
+            results = fan_out(BookManager.search_books, branch_ids, search_term, limit=limit)
+            ranked = itertools.zip_longest(*([(branch_id, book) for book in books]
+                                             for branch_id, books in results.items()))
+            merged = [match for rank in ranked for match in rank if match is not None]
+            return merged if limit is None else merged[:limit]
+        except Exception as e:
+            print(f"Error searching branches: {e}")
+            return []
+    
+    @staticmethod
+    def get_dashboard_stats(branch_ids=None, top_categories=5):
+        """Dashboard figures summed over branches, read from each shard's counters in parallel
+        
+        Returns the same keys as ReportManager.get_dashboard_stats, plus
+        "branches" with each branch's own figures.
+        """
+        try:
+            branch_ids = list_branches() if branch_ids is None else list(branch_ids)
+            per_branch = fan_out(ReportManager.get_dashboard_stats, branch_ids, top_categories=top_categories)
+            totals = dict.fromkeys(("total_books", "available_books", "borrowed_books", "total_members",
+                                    "active_members", "outstanding_fines", "active_borrowings", "overdue_books"), 0)
+            categories = {}
+            for branch_id, stats in per_branch.items():
+                if stats is None:
+                    raise RuntimeError(f"no statistics for branch {branch_id}")
+                for key in totals:
+                    totals[key] += stats[key]
+                for category, books in stats["top_categories"]:
+                    categories[category] = categories.get(category, 0) + books
+            totals["outstanding_fines"] = round(totals["outstanding_fines"], 2)
+            # Summed per-branch top lists: a category just outside every branch's top N can be missed
+            totals["top_categories"] = sorted(categories.items(), key=lambda item: -item[1])[:top_categories]
+            totals["branches"] = per_branch
+            return totals
+        except Exception as e:
+            print(f"Error computing branch statistics: {e}")
+            return None
+    
+    @staticmethod
+    def get_overdue_books(limit=None, branch_ids=None):
+        """Overdue loans across branches, longest overdue first, as (branch_id, BorrowingRecord, member_name)
+        
+        The shards are ATTACHed to one read-only connection so SQLite orders and
+        limits the UNION of every branch's overdue loans itself. Beyond the
+        attach limit, branches go in chunks whose sorted results are merged.
+        """
+        try:
+            branch_ids = list_branches() if branch_ids is None else list(branch_ids)
+            now = datetime.now()
+            chunk_size = attach_limit()
+            chunks = []
+            for start in range(0, len(branch_ids), chunk_size):
+                chunk = branch_ids[start:start + chunk_size]
+                with attached_branches(chunk) as (conn, schemas):
+                    cursor = conn.cursor()
+                    cursor.row_factory = lambda cursor, row: (row[-1], BorrowingRecord.row_factory(cursor, row), row[-2])
+                    cursor.execute(" UNION ALL ".join(f"""
+                        SELECT b.*, COALESCE(m.name, '(deleted member)') AS member_name, ? AS branch_id
+                        FROM {schema}.borrowing b
+                        LEFT JOIN {schema}.members m ON b.member_id = m.member_id
+                        WHERE b.status = 'borrowed' AND b.due_date < ?
+                    """ for schema in schemas) + " ORDER BY due_date, branch_id, borrow_id LIMIT ?",
+                        [value for branch_id in chunk for value in (branch_id, now)] + [-1 if limit is None else limit])
+                    chunks.append(cursor.fetchall())
+            merged = heapq.merge(*chunks, key=lambda row: (row[1].due_date, row[0], row[1].borrow_id))
+            return list(itertools.islice(merged, limit))
+        except Exception as e:
+            print(f"Error retrieving overdue books across branches: {e}")
+            return []
+
+
+@metrics.REGISTRY.on_collect
+def refresh_circulation_gauges():
+    """Set the loan and fine gauges from the dashboard counters before each metrics render"""
+    stats = ReportManager.get_dashboard_stats(top_categories=0)
+    if stats:
+        metrics.ACTIVE_LOANS.set(stats["active_borrowings"])
+        metrics.OVERDUE_LOANS.set(stats["overdue_books"])
+        metrics.OUTSTANDING_FINES.set(stats["outstanding_fines"])
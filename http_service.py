@@ -0,0 +1,399 @@
+"""
+HTTP/JSON service for Library Management System
+Serves the managers to kiosks and the web catalog over keep-alive HTTP/1.1
+connections, one thread per client connection, sharing the connection pool.
+
+Usage:
+    python http_service.py [--host 127.0.0.1] [--port 8080]
+
+Endpoints (list endpoints take limit, up to MAX_PAGE_SIZE, and after_id for the next page):
+    GET  /books?q=term            search (best matches first), or page through the catalog without q
+    GET  /books/<id>              one book
+    GET  /books/isbn/<isbn>       lookup by ISBN-10 or ISBN-13
+    GET  /members?after_id=       page through members
+    GET  /members/<id>            member with active loans and unpaid fines
+    GET  /members/<id>/fines      every fine for a member
+    POST /borrowings              {"member_id": 1, "book_ids": [2, 3], "days": 14}
+    POST /returns                 {"borrow_ids": [4, 5]}
+    GET  /overdue                 overdue loans with member names
+    GET  /fines/unpaid            unpaid fines with member names and running totals
+    POST /fines/<id>/pay          mark a fine paid
+    GET  /stats                   dashboard statistics
+    GET  /metrics                 circulation metrics in the Prometheus text format
+    GET  /branches                branch IDs
+    GET  /branches/search?q=term  search every branch's catalog
+    GET  /branches/stats          dashboard statistics summed over branches, with each branch's own
+    GET  /branches/overdue        overdue loans across branches, longest overdue first
+
+Send X-Branch: <id> (or ?branch=<id>) to run any other endpoint against that branch's shard.
+"""
+import argparse
+import json
+import os
+import re
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from database import init_database, migrate_database, use_branch, branch_database_file, DATABASE_FILE
+from db_operations import BookManager, MemberManager, BorrowingManager, FineManager, ReportManager, BranchManager
+from models import RowModel
+import metrics
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_BODY_SIZE = 1 << 20
+
+
+class TextBody(str):
+    """A handler payload sent as-is with its own content type instead of as JSON"""
+
+    def __new__(cls, text, content_type="text/plain; charset=utf-8"):
+        body = super().__new__(cls, text)
+        body.content_type = content_type
+        return body
+
+
+class HTTPError(Exception):
+    """An error response: status code and message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def to_json(value):
+    """json.dumps default: models as dicts, dates as ISO strings"""
+    if isinstance(value, RowModel):
+        return value.to_dict()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Can't serialize {type(value).__name__}")
+
+
+def int_param(params, name, default=None):
+    """Read an integer query parameter"""
+    values = params.get(name)
+    if not values:
+        return default
+    try:
+        return int(values[0])
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+
+
+def page_params(params):
+    """Read after_id and a clamped limit"""
+    limit = int_param(params, "limit", DEFAULT_PAGE_SIZE)
+    if limit < 1:
+        raise HTTPError(400, "limit must be positive")
+    return int_param(params, "after_id"), min(limit, MAX_PAGE_SIZE)
+
+
+def page(items, limit, key):
+    """Wrap one page of items with the after_id of the next page (None on the last page)"""
+    return {"items": items, "next_after_id": key(items[-1]) if len(items) == limit else None}
+
+
+def is_int(value):
+    """True for a JSON integer; JSON true/false decode to bool, which is an int subclass"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def body_ids(body, plural, singular):
+    """Read a list of integer IDs given as body[plural] or a single body[singular]"""
+    ids = body.get(plural, [body[singular]] if singular in body else None)
+    if not isinstance(ids, list) or not ids or not all(is_int(i) for i in ids):
+        raise HTTPError(400, f"{plural} must be a non-empty list of integers")
+    return ids
+
+
+def found(value, what):
+    """Return value, or raise a 404 if the lookup came back empty"""
+    if value is None:
+        raise HTTPError(404, f"{what} not found")
+    return value
+
+
+def list_books(match, params, body):
+    """Search the catalog, or page through it in ID order"""
+    after_id, limit = page_params(params)
+    term = params.get("q", [""])[0].strip()
+    if term:
+        return {"items": BookManager.search_books(term, limit=limit), "next_after_id": None}
+    return page(BookManager.get_books_page(after_id, page_size=limit), limit, lambda book: book.book_id)
+
+
+def get_book(match, params, body):
+    """One book by ID"""
+    return found(BookManager.get_book_by_id(int(match["id"])), "Book")
+
+
+def get_book_by_isbn(match, params, body):
+    """One book by ISBN"""
+    return found(BookManager.get_book_by_isbn(match["isbn"]), "Book")
+
+
+def list_members(match, params, body):
+    """Page through members in ID order"""
+    after_id, limit = page_params(params)
+    return page(MemberManager.get_members_page(after_id, page_size=limit), limit, lambda member: member.member_id)
+
+
+def get_member(match, params, body):
+    """Member details with active loans and unpaid fines"""
+    dashboard = found(MemberManager.get_member_dashboard(int(match["id"])), "Member")
+    return {
+        "member": dashboard["member"],
+        "active_loans": [dict(zip(("borrow_id", "book_id", "title", "due_date", "is_overdue"), loan))
+                         for loan in dashboard["active_loans"]],
+        "unpaid_fines": [dict(zip(("fine_id", "amount", "reason", "created_date"), fine))
+                         for fine in dashboard["unpaid_fines"]],
+    }
+
+
+def get_member_fines(match, params, body):
+    """Every fine for a member, newest first"""
+    return {"items": FineManager.get_member_fines(int(match["id"]))}
+
+
+def borrow(match, params, body):
+    """Check out one or more books for a member"""
+    if not is_int(body.get("member_id")):
+        raise HTTPError(400, "member_id must be an integer")
+    found(MemberManager.get_member_by_id(body["member_id"]), "Member")
+    days = body.get("days", 14)
+    if not is_int(days) or days < 1:
+        raise HTTPError(400, "days must be a positive integer")
+    results = BorrowingManager.borrow_books(body["member_id"], body_ids(body, "book_ids", "book_id"), days)
+    return {"results": [{"book_id": book_id, "success": success, "message": message}
+                        for book_id, success, message in results]}
+
+
+def return_loans(match, params, body):
+    """Check in one or more loans"""
+    results = BorrowingManager.return_books(body_ids(body, "borrow_ids", "borrow_id"))
+    return {"results": [{"borrow_id": borrow_id, "success": success, "message": message}
+                        for borrow_id, success, message in results]}
+
+
+def list_overdue(match, params, body):
+    """Overdue loans with member names"""
+    after_id, limit = page_params(params)
+    overdue = BorrowingManager.get_overdue_books(after_id, limit)
+    items = [dict(borrow.to_dict(), member_name=member_name) for borrow, member_name in overdue]
+    return page(items, limit, lambda item: item["borrow_id"])
+
+
+def list_unpaid_fines(match, params, body):
+    """Unpaid fines with member names and running totals"""
+    after_id, limit = page_params(params)
+    fines = FineManager.get_unpaid_fines(after_id, limit=limit)
+    columns = ("fine_id", "member_id", "member_name", "amount", "reason", "created_date", "running_total")
+    return page([dict(zip(columns, fine)) for fine in fines], limit, lambda item: item["fine_id"])
+
+
+def pay_fine(match, params, body):
+    """Mark a fine paid"""
+    success, message = FineManager.pay_fine(int(match["id"]))
+    if not success:
+        status = {"Fine not found": 404, "Fine already paid": 409}.get(message, 500)
+        raise HTTPError(status, message)
+    return {"success": success, "message": message}
+
+
+def get_stats(match, params, body):
+    """Dashboard statistics"""
+    return found(ReportManager.get_dashboard_stats(), "Statistics")
+
+
+def get_metrics(match, params, body):
+    """Circulation counters, latency histograms and loan/fine gauges for Prometheus to scrape"""
+    return TextBody(metrics.REGISTRY.render(), metrics.CONTENT_TYPE)
+
+
+def list_branches(match, params, body):
+    """Every branch with a shard"""
+    return {"items": BranchManager.get_branches()}
+
+
+def search_branches(match, params, body):
+    """Search every branch's catalog; each item carries its branch_id"""
+    _, limit = page_params(params)
+    term = params.get("q", [""])[0].strip()
+    if not term:
+        raise HTTPError(400, "q is required")
+    return {"items": [dict(book.to_dict(), branch_id=branch_id)
+                      for branch_id, book in BranchManager.search_catalog(term, limit=limit)]}
+
+
+def get_branch_stats(match, params, body):
+    """Dashboard statistics over every branch"""
+    return found(BranchManager.get_dashboard_stats(), "Statistics")
+
+
+def list_branch_overdue(match, params, body):
+    """Overdue loans across every branch, longest overdue first"""
+    _, limit = page_params(params)
+    return {"items": [dict(borrow.to_dict(), branch_id=branch_id, member_name=member_name)
+                      for branch_id, borrow, member_name in BranchManager.get_overdue_books(limit)]}
+
+
+def request_branch(headers, params):
+    """The branch a request is for (X-Branch header or branch parameter), or None for the main database"""
+    branch_id = params.get("branch", [None])[0] or headers.get("X-Branch")
+    if branch_id is None:
+        return None
+    try:
+        path = branch_database_file(branch_id)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+    if not os.path.exists(path):
+        raise HTTPError(404, f"No such branch: {branch_id}")
+    return branch_id
+
+
+# (method, path pattern, handler); handlers take (match, query params, JSON body) and return the payload
+ROUTES = [
+    ("GET", r"/books", list_books),
+    ("GET", r"/books/(?P<id>\d+)", get_book),
+    ("GET", r"/books/isbn/(?P<isbn>[\dXx-]+)", get_book_by_isbn),
+    ("GET", r"/members", list_members),
+    ("GET", r"/members/(?P<id>\d+)", get_member),
+    ("GET", r"/members/(?P<id>\d+)/fines", get_member_fines),
+    ("POST", r"/borrowings", borrow),
+    ("POST", r"/returns", return_loans),
+    ("GET", r"/overdue", list_overdue),
+    ("GET", r"/fines/unpaid", list_unpaid_fines),
+    ("POST", r"/fines/(?P<id>\d+)/pay", pay_fine),
+    ("GET", r"/stats", get_stats),
+    ("GET", r"/metrics", get_metrics),
+    ("GET", r"/branches", list_branches),
+    ("GET", r"/branches/search", search_branches),
+    ("GET", r"/branches/stats", get_branch_stats),
+    ("GET", r"/branches/overdue", list_branch_overdue),
+]
+ROUTES = [(method, re.compile(pattern + r"/?"), handler) for method, pattern, handler in ROUTES]
+
+
+class LibraryRequestHandler(BaseHTTPRequestHandler):
+    """Route JSON requests to the managers over persistent HTTP/1.1 connections"""
+    protocol_version = "HTTP/1.1"
+    server_version = "LibraryService/1.0"
+    # Headers and body go out as two writes; with Nagle on, the body waits ~40 ms for the client's delayed ACK
+    disable_nagle_algorithm = True
+    quiet = False
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method):
+        """Find the route, run it (on the requested branch) and send the JSON response with timing headers"""
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        try:
+            body = self.read_body()
+            allowed = None  # The method of a route whose path matched, for the 405 message
+            for route_method, pattern, handler in ROUTES:
+                match = pattern.fullmatch(url.path)
+                if match:
+                    if route_method == method:
+                        break
+                    allowed = route_method
+            else:
+                if allowed is not None:
+                    raise HTTPError(405, f"Use {allowed} for {url.path}")
+                raise HTTPError(404, f"No such endpoint: {url.path}")
+            params = parse_qs(url.query)
+            with use_branch(request_branch(self.headers, params)):
+                status, payload = 200, handler(match, params, body)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": f"Internal error: {e}"}
+        self.send_json(status, payload, time.perf_counter() - start)
+
+    def read_body(self):
+        """Read and decode the JSON request body (empty dict when there is none)"""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = None
+        if length is None or length < 0:
+            # The body's extent is unknown, so the rest of the stream can't be trusted
+            self.close_connection = True
+            raise HTTPError(400, "Content-Length must be a non-negative integer")
+        if length > MAX_BODY_SIZE:
+            self.close_connection = True
+            raise HTTPError(413, "Request body too large")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+        return body
+
+    def send_json(self, status, payload, elapsed):
+        """Send a JSON (or TextBody) response; Content-Length keeps the connection reusable"""
+        if isinstance(payload, TextBody):
+            data, content_type = payload.encode("utf-8"), payload.content_type
+        else:
+            data, content_type = json.dumps(payload, default=to_json).encode("utf-8"), "application/json; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Server-Timing", f"app;dur={elapsed * 1000:.2f}")
+        self.send_header("X-Response-Time-Ms", f"{elapsed * 1000:.2f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class LibraryHTTPServer(ThreadingHTTPServer):
+    """Thread-per-connection server with a listen backlog sized for bursts of kiosks"""
+    daemon_threads = True
+    # The default backlog of 5 drops connection bursts into 1 s SYN retries
+    request_queue_size = 128
+
+
+def make_server(host="127.0.0.1", port=8080, quiet=False):
+    """Create (but don't start) the service; port 0 picks a free port"""
+    handler = type("Handler", (LibraryRequestHandler,), {"quiet": quiet})
+    return LibraryHTTPServer((host, port), handler)
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Serve the library over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("--quiet", action="store_true", help="don't log each request")
+    args = parser.parse_args()
+
+    if not os.path.exists(DATABASE_FILE):
+        init_database()
+    else:
+        migrate_database()
+
+    server = make_server(args.host, args.port, args.quiet)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,40 @@
 """
 Sample data initialization script for Library Management System
-Run this to populate the database with sample data for testing
+Run this to populate the database with sample data for testing, or with a
+seeded synthetic library at production scale for performance work.
+
+Usage:
+    python init_sample_data.py                       # 15 hand-picked books and 8 members
+    python init_sample_data.py --books 1000000 --members 500000 --loans 20000000 --seed 42
 """
-from database import init_database, DATABASE_FILE
+from database import init_database, close_pool, pooled_connection, deferred_maintenance, DATABASE_FILE
 from db_operations import BookManager, MemberManager
 from models import Book, Member
+from array import array
+from heapq import heappush, heappop
+from itertools import accumulate
+import argparse
 import os
+import random
+import time
 
-def init_sample_data():
-    """Initialize database with sample data"""
-    
-    # Initialize database
+def reset_database():
+    """Back up any existing database file and create a fresh one"""
     if os.path.exists(DATABASE_FILE):
         print("Database already exists. Backing up and creating new one...")
-        os.rename(DATABASE_FILE, f"{DATABASE_FILE}.backup")
+        close_pool()
+        os.replace(DATABASE_FILE, f"{DATABASE_FILE}.backup")
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(DATABASE_FILE + suffix):
+                os.remove(DATABASE_FILE + suffix)
     
     init_database()
+
+def init_sample_data():
+    """Initialize database with sample data"""
+    
+    # Initialize database
+    reset_database()
     
     # Sample Books
     sample_books = [
@@ -37,11 +56,10 @@ def init_sample_data():
     ]
     
     print("Adding sample books...")
-    for book in sample_books:
-        if BookManager.add_book(book):
-            print(f"✓ Added: {book.title}")
-        else:
-            print(f"✗ Error adding: {book.title}")
+    summary = BookManager.add_books_bulk(sample_books)
+    print(f"✓ Added {summary['inserted']} books")
+    for row_number, reason in summary["rejected"]:
+        print(f"✗ Error adding: {sample_books[row_number - 1].title} ({reason})")
     
     # Sample Members
     sample_members = [
@@ -65,5 +83,212 @@ def init_sample_data():
     print("\n✓ Sample data initialized successfully!")
     print("\nYou can now run 'python main.py' to start the application.")
 
+# Vocabulary for synthetic catalog and member records
+TITLE_WORDS = ["Shadow", "River", "Empire", "Garden", "Winter", "Stone", "Ocean", "Machine", "Silver", "Kingdom",
+               "Letters", "Journey", "Island", "Mirror", "Forest", "Crown", "Night", "Secret", "Harbor", "Fire",
+               "Glass", "Memory", "Storm", "Atlas", "Orchard", "Signal", "Lantern", "Desert", "Wolf", "Tide"]
+TITLE_PATTERNS = ["The {0} of the {1}", "{0} and {1}", "A {0} in {1}", "The Last {0}", "{0}: A History", "Beyond the {0}"]
+FIRST_NAMES = ["James", "Maria", "Wei", "Aisha", "Olga", "Kenji", "Fatima", "Lucas", "Priya", "Noah", "Sofia",
+               "Mateo", "Amara", "Ivan", "Chloe", "Omar", "Hana", "Diego", "Elena", "Samuel"]
+LAST_NAMES = ["Smith", "Garcia", "Okafor", "Tanaka", "Muller", "Rossi", "Novak", "Silva", "Kowalski", "Ivanova",
+              "Nguyen", "Haddad", "Jensen", "Kim", "Moreau", "Patel", "Cohen", "Murphy", "Santos", "Berg"]
+STREETS = ["Main St", "Oak Ave", "Pine Rd", "Elm St", "Maple Dr", "Cedar Ln", "Birch Ct", "Spruce Way", "Lake Rd"]
+# Category mix of a general public library, as relative weights
+CATEGORY_WEIGHTS = {"Fiction": 30, "Mystery": 12, "Romance": 10, "Science Fiction": 8, "Fantasy": 8, "Biography": 7,
+                    "History": 7, "Science": 6, "Self-Help": 5, "Children": 7}
+
+LOAN_DAYS = 14
+DAY = 86400
+POPULARITY_SKEW = 0.8      # Zipf exponent: the top title of 1M gets about 1% of loans
+HISTORY_BATCH = 50000
+
+def synthetic_isbn(n):
+    """The n-th valid ISBN-13 in the 978 range"""
+    digits = f"978{n:09d}"
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+def synthetic_books(count, rng, copies):
+    """Yield count catalog books; copies[i] is the shelf quantity of the i-th book"""
+    authors = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(max(1, count // 8))]
+    # A few prolific authors write most of the catalog
+    author_weights = list(accumulate(1 / (rank + 1) for rank in range(len(authors))))
+    categories = list(CATEGORY_WEIGHTS)
+    category_weights = list(accumulate(CATEGORY_WEIGHTS.values()))
+    for i in range(count):
+        title = rng.choice(TITLE_PATTERNS).format(rng.choice(TITLE_WORDS), rng.choice(TITLE_WORDS))
+        author = rng.choices(authors, cum_weights=author_weights)[0]
+        year = max(1800, 2024 - int(rng.expovariate(1 / 15)))
+        yield Book(f"{title} {i + 1}", author, synthetic_isbn(i + 1), year, copies[i],
+                   rng.choices(categories, cum_weights=category_weights)[0])
+
+def synthetic_members(count, rng):
+    """Yield count members with unique emails"""
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield Member(f"{first} {last}", f"{first}.{last}.{i + 1}@example.org".lower(),
+                     f"555-{rng.randint(0, 9999):04d}", f"{rng.randint(1, 9999)} {rng.choice(STREETS)}")
+
+def generate_library(books=10000, members=5000, loans=100000, seed=42, history_days=730,
+                     overdue_rate=0.02, late_rate=0.1, unpaid_rate=0.15, fine_per_day=1.0, progress=print):
+    """Fill the current (empty) database with a deterministic synthetic library
+    
+    The same arguments always produce the same rows. Popularity is skewed the way
+    circulation is: loans pick titles by a Zipf law over a shuffled popularity rank,
+    popular titles get more copies, and members borrow in proportion to Pareto
+    weights so a fifth of them account for most loans. Loans are spread evenly over
+    the last history_days: ones still inside their loan period are open (while
+    copies last), overdue_rate of the older ones were never returned, late_rate of
+    the rest came back late with a fine, and unpaid_rate of those fines are unpaid.
+    Member balances and shelf counts agree with the generated history.
+    
+    Books and members go through the bulk import paths; the history is written with
+    executemany. Triggers and history indexes are deferred for the whole load.
+    Returns a report dict with row counts, per-phase seconds and rows_per_sec.
+    """
+    rng = random.Random(seed)
+    report = {"books": 0, "members": 0, "loans": 0, "open_loans": 0, "overdue_loans": 0, "fines": 0}
+    timings = {}
+    start = time.perf_counter()
+    
+    # Popularity rank r (1 = most borrowed) per book, shuffled so it doesn't follow book_id
+    ranks = list(range(1, books + 1))
+    rng.shuffle(ranks)
+    copies = array("H", (max(1, min(20, int(20 / rank ** 0.3))) for rank in ranks))
+    book_ids = sorted(range(1, books + 1), key=lambda book_id: ranks[book_id - 1])
+    book_weights = list(accumulate(rank ** -POPULARITY_SKEW for rank in range(1, books + 1)))
+    member_ids = range(1, members + 1)
+    member_weights = list(accumulate(rng.paretovariate(1.16) for _ in member_ids))
+    
+    with pooled_connection() as conn, deferred_maintenance(conn, triggers=("books", "members", "borrowing", "fines"),
+                                                           indexes=("borrowing", "fines")):
+        phase = time.perf_counter()
+        summary = BookManager.add_books_bulk(synthetic_books(books, rng, copies), batch_size=5000)
+        report["books"] = summary["inserted"]
+        timings["books"] = time.perf_counter() - phase
+        progress(f"  Books: {report['books']:,} in {timings['books']:.1f}s")
+        
+        phase = time.perf_counter()
+        summary = MemberManager.add_members_bulk(synthetic_members(members, rng), batch_size=5000, on_duplicate="reject")
+        report["members"] = summary["inserted"]
+        # Spread join dates over ten years and lapse a few memberships
+        conn.execute("""
+            UPDATE members SET
+                membership_date = datetime('now', '-' || ((member_id * 7919) % 3650) || ' days'),
+                membership_status = CASE WHEN (member_id * 2654435761) % 100 < 3 THEN 'suspended' ELSE 'active' END
+        """)
+        conn.commit()
+        timings["members"] = time.perf_counter() - phase
+        progress(f"  Members: {report['members']:,} in {timings['members']:.1f}s")
+        
+        phase = time.perf_counter()
+        # Times are whole epoch seconds; SQLite formats them as local TIMESTAMPs on insert
+        now = int(time.time())
+        first = now - history_days * DAY
+        step = history_days * DAY / max(1, loans)
+        on_loan = array("H", bytes(2 * (books + 1)))
+        borrow_id = conn.execute("SELECT COALESCE(MAX(borrow_id), 0) FROM borrowing").fetchone()[0]
+        random_ = rng.random
+        # Fines are written once their return time has passed, so fine IDs follow created_date as they do live
+        pending_fines = []
+        for batch_start in range(0, loans, HISTORY_BATCH):
+            size = min(HISTORY_BATCH, loans - batch_start)
+            picked_books = rng.choices(book_ids, cum_weights=book_weights, k=size)
+            picked_members = rng.choices(member_ids, cum_weights=member_weights, k=size)
+            loan_rows, fine_rows = [], []
+            for i in range(size):
+                borrow_id += 1
+                member_id, book_id = picked_members[i], picked_books[i]
+                borrowed = first + int((batch_start + i) * step)
+                due = borrowed + LOAN_DAYS * DAY
+                if on_loan[book_id] < copies[book_id - 1] and (due > now or random_() < overdue_rate):
+                    on_loan[book_id] += 1
+                    report["open_loans"] += 1
+                    report["overdue_loans"] += due <= now
+                    loan_rows.append((borrow_id, member_id, book_id, borrowed, due, None, "borrowed", 0.0))
+                    continue
+                fine_amount = 0.0
+                if due < now and random_() < late_rate:
+                    days_late = 1 + int(rng.expovariate(1 / 7))
+                    returned = due + days_late * DAY + int(random_() * DAY)
+                    if returned < now:
+                        fine_amount = days_late * fine_per_day
+                        heappush(pending_fines, (returned, member_id, borrow_id, fine_amount,
+                                                 f"Late return fine - {days_late} days overdue",
+                                                 int(random_() >= unpaid_rate)))
+                if not fine_amount:
+                    returned = borrowed + int(random_() * (min(due, now) - borrowed))
+                loan_rows.append((borrow_id, member_id, book_id, borrowed, due, returned, "returned", fine_amount))
+            last_batch = batch_start + size >= loans
+            while pending_fines and (last_batch or pending_fines[0][0] <= borrowed):
+                returned, *fine = heappop(pending_fines)
+                fine_rows.append((*fine, returned))
+            conn.execute("BEGIN")
+            conn.executemany("""
+                INSERT INTO borrowing (borrow_id, member_id, book_id, borrow_date, due_date, return_date, status, fine_amount)
+                VALUES (?, ?, ?, datetime(?, 'unixepoch', 'localtime'), datetime(?, 'unixepoch', 'localtime'),
+                        datetime(?, 'unixepoch', 'localtime'), ?, ?)
+            """, loan_rows)
+            conn.executemany("""
+                INSERT INTO fines (member_id, borrow_id, amount, reason, paid, created_date)
+                VALUES (?, ?, ?, ?, ?, datetime(?, 'unixepoch', 'localtime'))
+            """, fine_rows)
+            conn.commit()
+            report["loans"] += len(loan_rows)
+            report["fines"] += len(fine_rows)
+            progress(f"  Loans: {report['loans']:,} / {loans:,}, fines: {report['fines']:,}")
+        
+        # Shelf counts and balances follow from the history
+        conn.execute("BEGIN")
+        conn.executemany("UPDATE books SET available_quantity = quantity - ? WHERE book_id = ?",
+                         ((count, book_id) for book_id, count in enumerate(on_loan) if count))
+        conn.execute("""
+            UPDATE members SET outstanding_fine = unpaid.total
+            FROM (SELECT member_id, SUM(amount) AS total FROM fines WHERE paid = 0 GROUP BY member_id) AS unpaid
+            WHERE members.member_id = unpaid.member_id
+        """)
+        conn.commit()
+        timings["history"] = time.perf_counter() - phase
+        phase = time.perf_counter()
+    timings["indexes"] = time.perf_counter() - phase
+    progress(f"  Indexes, catalog search and counters rebuilt in {timings['indexes']:.1f}s")
+    
+    report["timings"] = timings
+    report["elapsed"] = time.perf_counter() - start
+    rows = report["books"] + report["members"] + report["loans"] + report["fines"]
+    report["rows_per_sec"] = rows / report["elapsed"] if report["elapsed"] else 0.0
+    return report
+
+def print_load_report(report):
+    """Print the synthetic load report"""
+    print(f"\n✓ Loaded {report['books']:,} books, {report['members']:,} members, "
+          f"{report['loans']:,} loans and {report['fines']:,} fines in {report['elapsed']:.1f}s "
+          f"({report['rows_per_sec']:,.0f} rows/sec)")
+    print(f"  Open loans: {report['open_loans']:,} ({report['overdue_loans']:,} overdue)")
+    print("  Phases: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in report["timings"].items()))
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Load sample data, or a seeded synthetic library with --books/--members/--loans")
+    parser.add_argument("--books", type=int, help="synthetic catalog size")
+    parser.add_argument("--members", type=int, help="synthetic member count")
+    parser.add_argument("--loans", type=int, help="synthetic borrowing history rows (fines come on top)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed; the same seed gives the same library")
+    parser.add_argument("--history-days", type=int, default=730, help="days of borrowing history")
+    parser.add_argument("--overdue-rate", type=float, default=0.02, help="share of past-due loans never returned")
+    parser.add_argument("--late-rate", type=float, default=0.1, help="share of returns that came back late")
+    args = parser.parse_args()
+    
+    if args.books is None and args.members is None and args.loans is None:
+        init_sample_data()
+        return
+    
+    reset_database()
+    print(f"Generating synthetic library (seed {args.seed})...")
+    report = generate_library(args.books or 10000, args.members or 5000, 100000 if args.loans is None else args.loans,
+                              seed=args.seed, history_days=args.history_days,
+                              overdue_rate=args.overdue_rate, late_rate=args.late_rate)
+    print_load_report(report)
+
 if __name__ == "__main__":
-    init_sample_data()
+    main()
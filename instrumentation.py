@@ -0,0 +1,366 @@
+"""
+Query instrumentation for Library Management System
+Times every SQL statement run on a pooled connection, tags it with the manager
+method that issued it, and keeps latency histograms, row counts and a slow-query
+log with EXPLAIN QUERY PLAN output. Off by default; when off, each statement
+pays for one flag check.
+
+Usage:
+    import instrumentation
+    instrumentation.enable(slow_ms=50, log_path="slow_queries.log")
+    ...
+    instrumentation.print_report()
+    instrumentation.disable()
+
+Set LIBRARY_QUERY_STATS=1 (and optionally LIBRARY_SLOW_QUERY_MS / LIBRARY_SLOW_QUERY_LOG)
+to switch it on at startup.
+"""
+import inspect
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Histogram bucket upper bounds in milliseconds (the last bucket takes everything slower)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+SLOW_QUERY_MS = 100.0      # Default slow-query threshold
+SLOW_LOG_KEEP = 100        # Slow queries kept in memory for slow_queries()
+UNTAGGED = "(other)"       # Statements not issued from a manager method
+
+# Read on every statement; everything else is only touched while enabled
+enabled = False
+
+_lock = threading.Lock()
+_statements = {}           # (tag, sql) -> StatementStats
+_slow = deque(maxlen=SLOW_LOG_KEEP)
+_settings = {"slow_ms": SLOW_QUERY_MS, "log_path": None}
+_manager_code = {}         # code object of each manager method -> "Manager.method"
+_manager_globals = [None]  # db_operations' module globals, where the stack walk can stop
+
+
+class StatementStats:
+    """Latency histogram, row and error counts for one SQL statement from one manager method"""
+
+    __slots__ = ("tag", "sql", "calls", "errors", "rows", "total_ms", "max_ms", "buckets")
+
+    def __init__(self, tag, sql):
+        self.tag = tag
+        self.sql = sql
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, elapsed_ms, rows, failed):
+        """Count one execution"""
+        self.calls += 1
+        self.errors += failed
+        self.rows += rows
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+
+def merge_buckets(stats):
+    """Sum the histograms of several StatementStats"""
+    return [sum(counts) for counts in zip(*(s.buckets for s in stats))] if stats else [0] * len(BUCKETS_MS)
+
+
+def bucket_percentile(buckets, q, max_ms):
+    """Estimate a percentile as the upper bound of the bucket it falls in (capped at the slowest call)"""
+    target = q * sum(buckets)
+    seen = 0
+    for bound, count in zip(BUCKETS_MS, buckets):
+        seen += count
+        if count and seen >= target:
+            return min(bound, max_ms)
+    return max_ms
+
+
+def _manager_methods():
+    """Map the code object of every manager method in db_operations to its "Manager.method" tag"""
+    db_operations = sys.modules.get("db_operations")
+    if db_operations is None:
+        return {}
+    codes = {}
+    for class_name, cls in vars(db_operations).items():
+        if not (isinstance(cls, type) and class_name.endswith("Manager")):
+            continue
+        for name, member in vars(cls).items():
+            if isinstance(member, staticmethod):
+                # Unwrap decorated methods (db_operations.tracked) to the code that actually runs
+                codes[inspect.unwrap(member.__func__).__code__] = f"{class_name}.{name}"
+    _manager_globals[:] = [vars(db_operations)]
+    return codes
+
+
+def current_tag():
+    """The outermost manager method on the calling stack, so helpers and nested calls roll up to it"""
+    if not _manager_code:
+        _manager_code.update(_manager_methods())
+    tag = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        found = _manager_code.get(frame.f_code)
+        if found is not None:
+            tag = found
+        elif tag is not None and frame.f_globals is not _manager_globals[0]:
+            # Left db_operations above the outermost manager frame
+            break
+        frame = frame.f_back
+    return tag or UNTAGGED
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so the same statement groups together however it was indented"""
+    return " ".join(sql.split())
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times its statements, including the time spent fetching their rows
+
+    A query's record stays open while its rows are fetched and is finished when
+    the rows run out, the cursor runs another statement, or it is closed or dropped.
+    """
+
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        """Run a statement; queries stay open until their rows are fetched"""
+        self._finish()
+        tag = current_tag()
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except Exception:
+            record(tag, sql, (time.perf_counter() - start) * 1000, 0, True, parameters, self.connection)
+            raise
+        elapsed = (time.perf_counter() - start) * 1000
+        if self.description is None:
+            record(tag, sql, elapsed, max(self.rowcount, 0), False, parameters, self.connection)
+        else:
+            self._pending = [tag, sql, parameters, elapsed, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        """Run a statement for every parameter set, recorded as one execution"""
+        self._finish()
+        tag = current_tag()
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except Exception:
+            record(tag, sql, (time.perf_counter() - start) * 1000, 0, True, None, self.connection)
+            raise
+        record(tag, sql, (time.perf_counter() - start) * 1000, max(self.rowcount, 0), False, None, self.connection)
+        return self
+
+    def fetchone(self):
+        """Fetch the next row, timed"""
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        """Fetch up to size rows, timed"""
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows), len(rows) < (self.arraysize if size is None else size))
+        return rows
+
+    def fetchall(self):
+        """Fetch the remaining rows, timed"""
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        """Fetch the next row while iterating, timed"""
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        """Record the open query and close the cursor"""
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        """Record a query whose rows were never fully fetched"""
+        self._finish()
+
+    def _fetched(self, start, rows, done):
+        """Add one fetch call to the open query record"""
+        pending = self._pending
+        if pending is not None:
+            pending[3] += (time.perf_counter() - start) * 1000
+            pending[4] += rows
+            if done:
+                self._finish()
+
+    def _finish(self):
+        """Record the open query, if any"""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            tag, sql, parameters, elapsed, rows = pending
+            record(tag, sql, elapsed, rows, False, parameters, self.connection)
+
+
+def record(tag, sql, elapsed_ms, rows, failed, parameters=None, conn=None):
+    """Count one finished statement, logging it with its query plan if it was slow"""
+    key = (tag, sql)
+    with _lock:
+        stats = _statements.get(key)
+        if stats is None:
+            stats = _statements[key] = StatementStats(tag, normalize_sql(sql))
+        stats.add(elapsed_ms, rows, failed)
+    if elapsed_ms >= _settings["slow_ms"] and not failed:
+        log_slow_query(tag, sql, elapsed_ms, rows, parameters, conn)
+
+
+def explain(conn, sql, parameters=None):
+    """EXPLAIN QUERY PLAN as indented text lines, or [] for statements that have no plan"""
+    if conn is None or not re.match(r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", sql, re.IGNORECASE):
+        return []
+    if parameters is None:
+        # executemany: plan with NULLs in place of the per-row values
+        parameters = [None] * sql.count("?")
+    try:
+        # A plain cursor, so explaining doesn't time itself
+        plan = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    except sqlite3.Error as e:
+        return [f"(no plan: {e})"]
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in plan:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+def log_slow_query(tag, sql, elapsed_ms, rows, parameters, conn):
+    """Keep a slow statement with its query plan, and append it to the log file if one is set"""
+    entry = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "tag": tag,
+        "elapsed_ms": elapsed_ms,
+        "rows": rows,
+        "sql": normalize_sql(sql),
+        "plan": explain(conn, sql, parameters),
+    }
+    with _lock:
+        _slow.append(entry)
+        log_path = _settings["log_path"]
+        if log_path:
+            with open(log_path, "a", encoding="utf-8") as log:
+                log.write(f"{entry['time']} {elapsed_ms:.2f} ms {tag} rows={rows}\n    {entry['sql']}\n")
+                for line in entry["plan"]:
+                    log.write(f"      {line}\n")
+
+
+def enable(slow_ms=SLOW_QUERY_MS, log_path=None):
+    """Start timing statements; ones at or above slow_ms go to the slow-query log"""
+    global enabled
+    _settings.update(slow_ms=slow_ms, log_path=log_path)
+    _manager_code.clear()
+    enabled = True
+
+
+def disable():
+    """Stop timing statements; collected stats are kept until reset()"""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Forget every collected statement and slow query"""
+    with _lock:
+        _statements.clear()
+        _slow.clear()
+
+
+def slow_queries():
+    """The most recent slow queries, oldest first"""
+    with _lock:
+        return list(_slow)
+
+
+def statement_stats():
+    """Per-statement summaries, slowest total time first"""
+    with _lock:
+        stats = list(_statements.values())
+    return sorted((summarize(s.tag, s.sql, [s]) for s in stats), key=lambda row: -row["total_ms"])
+
+
+def report():
+    """Per-manager-method summaries over all their statements, slowest total time first"""
+    with _lock:
+        by_tag = {}
+        for stats in _statements.values():
+            by_tag.setdefault(stats.tag, []).append(stats)
+    return sorted((summarize(tag, None, stats) for tag, stats in by_tag.items()), key=lambda row: -row["total_ms"])
+
+
+def summarize(tag, sql, stats):
+    """One summary row: calls, errors, rows, total/mean/max and estimated percentiles in ms"""
+    buckets = merge_buckets(stats)
+    calls = sum(s.calls for s in stats)
+    total_ms = sum(s.total_ms for s in stats)
+    max_ms = max(s.max_ms for s in stats)
+    summary = {
+        "tag": tag,
+        "statements": len(stats),
+        "calls": calls,
+        "errors": sum(s.errors for s in stats),
+        "rows": sum(s.rows for s in stats),
+        "total_ms": total_ms,
+        "mean_ms": total_ms / calls if calls else 0.0,
+        "p50_ms": bucket_percentile(buckets, 0.50, max_ms),
+        "p95_ms": bucket_percentile(buckets, 0.95, max_ms),
+        "p99_ms": bucket_percentile(buckets, 0.99, max_ms),
+        "max_ms": max_ms,
+        "histogram": dict(zip((str(bound) for bound in BUCKETS_MS), buckets)),
+    }
+    if sql is not None:
+        summary["sql"] = sql
+    return summary
+
+
+def print_report(top=15):
+    """Print the busiest manager methods and the most recent slow queries"""
+    rows = report()[:top]
+    if not rows:
+        print("No statements recorded" + ("" if enabled else " (instrumentation is off)"))
+        return
+    print(f"{'Method':<40} {'Stmts':>7} {'Rows':>9} {'Total ms':>10} {'p50':>7} {'p95':>7} {'p99':>7} {'Max':>8}")
+    print("-" * 101)
+    for row in rows:
+        print(f"{row['tag'][:39]:<40} {row['calls']:>7} {row['rows']:>9} {row['total_ms']:>10.1f} "
+              f"{row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f} {row['p99_ms']:>7.2f} {row['max_ms']:>8.2f}")
+    slow = slow_queries()
+    if slow:
+        print(f"\nSlow queries (>= {_settings['slow_ms']:g} ms), most recent last:")
+        for entry in slow[-5:]:
+            print(f"  {entry['elapsed_ms']:.1f} ms {entry['tag']}: {entry['sql'][:80]}")
+            for line in entry["plan"]:
+                print(f"      {line}")
+
+
+if os.environ.get("LIBRARY_QUERY_STATS"):
+    enable(float(os.environ.get("LIBRARY_SLOW_QUERY_MS", SLOW_QUERY_MS)), os.environ.get("LIBRARY_SLOW_QUERY_LOG"))
@@ -3,9 +3,11 @@ Main application for Library Management System
 """
 import os
 from datetime import datetime
-from database import init_database, DATABASE_FILE
-from db_operations import BookManager, MemberManager, BorrowingManager, FineManager
-from models import Book, Member
+from database import init_database, migrate_database, DATABASE_FILE
+from db_operations import BookManager, MemberManager, BorrowingManager, FineManager, ReportManager, book_cache, member_cache
+from models import Book, Member, normalize_isbn
+
+PAGE_SIZE = 20  # Rows per page in the list views
 
 def clear_screen():
     """Clear the console screen"""
@@ -23,6 +25,49 @@ def print_menu(options):
         print(f"{key}. {value}")
     print()
 
+def page_through(title, page, fetch_page, print_columns, print_row, key):
+    """Interactive pager over keyset pages: next, previous and jump to ID"""
+    notice = ""
+    while True:
+        clear_screen()
+        print_header(title)
+        print_columns()
+        for item in page:
+            print_row(item)
+        print(f"\nShowing IDs {key(page[0])}-{key(page[-1])}")
+        if notice:
+            print(notice)
+            notice = ""
+        
+        choice = input("\n[N]ext page, [P]revious page, [J]ump to ID, [Q]uit: ").strip().lower()
+        if choice in ("", "n"):
+            next_page = fetch_page(after_id=key(page[-1]), page_size=PAGE_SIZE)
+            if next_page:
+                page = next_page
+            else:
+                notice = "End of list."
+        elif choice == "p":
+            previous_page = fetch_page(before_id=key(page[0]), page_size=PAGE_SIZE)
+            if previous_page:
+                page = previous_page
+            else:
+                notice = "Already at the first page."
+        elif choice == "j":
+            try:
+                target = int(input("Jump to ID: ").strip())
+            except ValueError:
+                notice = "Invalid ID!"
+                continue
+            jumped = fetch_page(after_id=target - 1, page_size=PAGE_SIZE)
+            if jumped:
+                page = jumped
+            else:
+                notice = f"No records at or after ID {target}."
+        elif choice == "q":
+            break
+        else:
+            notice = "Invalid choice. Please try again."
+
 def manage_books():
     """Book management menu"""
     while True:
@@ -97,22 +142,24 @@ def add_book():
     input("Press Enter to continue...")
 
 def view_all_books():
-    """View all books in the library"""
-    clear_screen()
-    print_header("📖 ALL BOOKS IN LIBRARY")
-    
-    books = BookManager.get_all_books()
-    
-    if not books:
+    """View all books in the library, one page at a time"""
+    first_page = BookManager.get_books_page(page_size=PAGE_SIZE)
+    if not first_page:
+        clear_screen()
+        print_header("📖 ALL BOOKS IN LIBRARY")
         print("No books in the library yet.")
-    else:
+        input("\nPress Enter to continue...")
+        return
+    
+    def print_columns():
         print(f"{'ID':<5} {'Title':<30} {'Author':<20} {'Available':<10} {'Category':<15}")
         print("-"*80)
-        for book in books:
-            print(f"{book.book_id:<5} {book.title[:29]:<30} {book.author[:19]:<20} {book.available_quantity}/{book.quantity:<8} {(book.category or 'N/A')[:14]:<15}")
-        print(f"\nTotal Books: {len(books)}")
     
-    input("\nPress Enter to continue...")
+    def print_row(book):
+        print(f"{book.book_id:<5} {book.title[:29]:<30} {book.author[:19]:<20} {book.available_quantity}/{book.quantity:<8} {(book.category or 'N/A')[:14]:<15}")
+    
+    page_through("📖 ALL BOOKS IN LIBRARY", first_page, BookManager.get_books_page,
+                 print_columns, print_row, lambda book: book.book_id)
 
 def search_books():
     """Search for books"""
@@ -281,22 +328,24 @@ def register_member():
     input("Press Enter to continue...")
 
 def view_all_members():
-    """View all members"""
-    clear_screen()
-    print_header("👥 ALL MEMBERS")
-    
-    members = MemberManager.get_all_members()
-    
-    if not members:
+    """View all members, one page at a time"""
+    first_page = MemberManager.get_members_page(page_size=PAGE_SIZE)
+    if not first_page:
+        clear_screen()
+        print_header("👥 ALL MEMBERS")
         print("No members registered yet.")
-    else:
+        input("\nPress Enter to continue...")
+        return
+    
+    def print_columns():
         print(f"{'ID':<5} {'Name':<25} {'Email':<25} {'Status':<10} {'Fine':<10}")
         print("-"*75)
-        for member in members:
-            print(f"{member.member_id:<5} {member.name[:24]:<25} {(member.email or 'N/A')[:24]:<25} {member.membership_status:<10} ${member.outstanding_fine:<9.2f}")
-        print(f"\nTotal Members: {len(members)}")
     
-    input("\nPress Enter to continue...")
+    def print_row(member):
+        print(f"{member.member_id:<5} {member.name[:24]:<25} {(member.email or 'N/A')[:24]:<25} {member.membership_status:<10} ${member.outstanding_fine:<9.2f}")
+    
+    page_through("👥 ALL MEMBERS", first_page, MemberManager.get_members_page,
+                 print_columns, print_row, lambda member: member.member_id)
 
 def search_members():
     """Search for members"""
@@ -334,11 +383,12 @@ def view_member_details():
         input("Press Enter to continue...")
         return
     
-    member = MemberManager.get_member_by_id(member_id)
-    if not member:
+    dashboard = MemberManager.get_member_dashboard(member_id)
+    if not dashboard:
         print("Member not found!")
         input("Press Enter to continue...")
         return
+    member = dashboard["member"]
     
     print(f"\nName: {member.name}")
     print(f"Member ID: {member.member_id}")
@@ -349,20 +399,18 @@ def view_member_details():
     print(f"Outstanding Fine: ${member.outstanding_fine:.2f}")
     
     # Show active borrowings
-    borrowings = BorrowingManager.get_active_borrowings(member_id)
+    borrowings = dashboard["active_loans"]
     print(f"\n📚 Active Borrowings: {len(borrowings)}")
-    for borrow in borrowings:
-        book = BookManager.get_book_by_id(borrow[2])
-        due_date = datetime.fromisoformat(borrow[4])
-        status_icon = "⚠️" if datetime.now() > due_date else "✓"
-        print(f"  {status_icon} Book ID: {borrow[2]}, Due: {due_date.strftime('%Y-%m-%d')}")
+    for borrow_id, book_id, title, due_date, is_overdue in borrowings:
+        due_date = datetime.fromisoformat(due_date)
+        status_icon = "⚠️" if is_overdue else "✓"
+        print(f"  {status_icon} Book ID: {book_id} ({title[:30]}), Borrowing ID: {borrow_id}, Due: {due_date.strftime('%Y-%m-%d')}")
     
     # Show unpaid fines
-    fines = FineManager.get_member_fines(member_id)
-    unpaid_fines = [f for f in fines if f[5] == 0]
+    unpaid_fines = dashboard["unpaid_fines"]
     print(f"\n💰 Unpaid Fines: {len(unpaid_fines)}")
-    for fine in unpaid_fines:
-        print(f"  Fine ID: {fine[0]}, Amount: ${fine[3]:.2f}, Reason: {fine[4]}")
+    for fine_id, amount, reason, _ in unpaid_fines:
+        print(f"  Fine ID: {fine_id}, Amount: ${amount:.2f}, Reason: {reason}")
     
     input("\nPress Enter to continue...")
 
@@ -445,6 +493,8 @@ def manage_borrowing():
             "2": "Return a Book",
             "3": "View Active Borrowings",
             "4": "View Overdue Books",
+            "5": "Batch Checkout (Scan Items)",
+            "6": "Batch Return (Scan Items)",
             "0": "Back to Main Menu"
         }
         print_menu(options)
@@ -458,6 +508,10 @@ def manage_borrowing():
             view_active_borrowings()
         elif choice == "4":
             view_overdue_books()
+        elif choice == "5":
+            batch_checkout()
+        elif choice == "6":
+            batch_return()
         elif choice == "0":
             break
         else:
@@ -550,27 +604,125 @@ def return_book():
     
     input("Press Enter to continue...")
 
-def view_active_borrowings():
-    """View all active borrowings"""
+def scan_items(prompt):
+    """Collect scanned or typed entries until a blank line; commas also separate entries"""
+    print(f"{prompt} (one per line or comma-separated, blank line to finish):")
+    items = []
+    while True:
+        line = input("> ").strip()
+        if not line:
+            return items
+        items.extend(part.strip() for part in line.split(",") if part.strip())
+
+def batch_checkout():
+    """Check out several books for one member in one transaction"""
     clear_screen()
-    print_header("📚 ACTIVE BORROWINGS")
+    print_header("📤 BATCH CHECKOUT")
     
-    borrowings = BorrowingManager.get_all_borrowings()
+    try:
+        member_id = int(input("Enter Member ID: ").strip())
+    except ValueError:
+        print("Invalid Member ID!")
+        input("Press Enter to continue...")
+        return
+    
+    member = MemberManager.get_member_by_id(member_id)
+    if not member:
+        print("Member not found!")
+        input("Press Enter to continue...")
+        return
     
-    if not borrowings:
+    if member.outstanding_fine > 0:
+        print(f"\n⚠️ Warning! Member has outstanding fine: ${member.outstanding_fine:.2f}")
+        proceed = input("Continue? (yes/no): ").strip().lower()
+        if proceed != 'yes':
+            input("Press Enter to continue...")
+            return
+    
+    book_ids = []
+    for item in scan_items("\nScan Book IDs or ISBNs"):
+        if item.isdigit() and normalize_isbn(item) is None:
+            book_ids.append(int(item))
+            continue
+        book = BookManager.get_book_by_isbn(item)
+        if book:
+            book_ids.append(book.book_id)
+        else:
+            print(f"✗ Unknown item '{item}' skipped")
+    
+    if not book_ids:
+        print("No items scanned.")
+        input("Press Enter to continue...")
+        return
+    
+    try:
+        days = int(input("Borrow duration (days) [14]: ").strip() or "14")
+    except ValueError:
+        days = 14
+    
+    results = BorrowingManager.borrow_books(member_id, book_ids, days)
+    print()
+    for book_id, success, message in results:
+        print(f"{'✓' if success else '✗'} Book ID {book_id}: {message}")
+    print(f"\n{sum(1 for _, success, _ in results if success)} of {len(results)} item(s) checked out")
+    
+    input("Press Enter to continue...")
+
+def batch_return():
+    """Check in several loans in one transaction"""
+    clear_screen()
+    print_header("📥 BATCH RETURN")
+    
+    borrow_ids = []
+    for item in scan_items("Scan Borrowing IDs"):
+        try:
+            borrow_ids.append(int(item))
+        except ValueError:
+            print(f"✗ Invalid Borrowing ID '{item}' skipped")
+    
+    if not borrow_ids:
+        print("No items scanned.")
+        input("Press Enter to continue...")
+        return
+    
+    try:
+        fine_per_day = float(input("Fine per day [1.0]: ").strip() or "1.0")
+    except ValueError:
+        fine_per_day = 1.0
+    
+    results = BorrowingManager.return_books(borrow_ids, fine_per_day)
+    print()
+    for borrow_id, success, message in results:
+        print(f"{'✓' if success else '✗'} Borrowing ID {borrow_id}: {message}")
+    print(f"\n{sum(1 for _, success, _ in results if success)} of {len(results)} item(s) returned")
+    
+    input("Press Enter to continue...")
+
+def view_active_borrowings():
+    """View all active borrowings, one page at a time"""
+    first_page = BorrowingManager.get_borrowings_page(page_size=PAGE_SIZE)
+    if not first_page:
+        clear_screen()
+        print_header("📚 ACTIVE BORROWINGS")
         print("No active borrowings.")
-    else:
+        input("\nPress Enter to continue...")
+        return
+    stats = ReportManager.get_dashboard_stats()
+    total = stats["active_borrowings"] if stats else len(first_page)
+    
+    def print_columns():
+        print(f"Total Active Borrowings: {total}\n")
         print(f"{'Borrow ID':<12} {'Member ID':<12} {'Book ID':<10} {'Due Date':<15} {'Days Left':<12}")
         print("-"*60)
-        for borrow in borrowings:
-            due_date = datetime.fromisoformat(borrow[4])
-            days_left = (due_date - datetime.now()).days
-            status = "⚠️" if days_left < 0 else "✓"
-            days_display = f"{status} {days_left}"
-            print(f"{borrow[0]:<12} {borrow[1]:<12} {borrow[2]:<10} {due_date.strftime('%Y-%m-%d'):<15} {days_display:<12}")
-        print(f"\nTotal Active Borrowings: {len(borrowings)}")
     
-    input("\nPress Enter to continue...")
+    def print_row(borrow):
+        days_left = (borrow.due_date - datetime.now()).days
+        status = "⚠️" if days_left < 0 else "✓"
+        days_display = f"{status} {days_left}"
+        print(f"{borrow.borrow_id:<12} {borrow.member_id:<12} {borrow.book_id:<10} {borrow.due_date.strftime('%Y-%m-%d'):<15} {days_display:<12}")
+    
+    page_through("📚 ACTIVE BORROWINGS", first_page, BorrowingManager.get_borrowings_page,
+                 print_columns, print_row, lambda borrow: borrow.borrow_id)
 
 def view_overdue_books():
     """View all overdue books"""
@@ -584,10 +736,9 @@ def view_overdue_books():
     else:
         print(f"{'Borrow ID':<12} {'Member':<20} {'Book ID':<10} {'Due Date':<15} {'Days Overdue':<15}")
         print("-"*72)
-        for borrow in overdue:
-            due_date = datetime.fromisoformat(borrow[4])
-            days_overdue = (datetime.now() - due_date).days
-            print(f"{borrow[0]:<12} {borrow[9][:19]:<20} {borrow[2]:<10} {due_date.strftime('%Y-%m-%d'):<15} {days_overdue:<15}")
+        for borrow, member_name in overdue:
+            days_overdue = (datetime.now() - borrow.due_date).days
+            print(f"{borrow.borrow_id:<12} {member_name[:19]:<20} {borrow.book_id:<10} {borrow.due_date.strftime('%Y-%m-%d'):<15} {days_overdue:<15}")
         print(f"\nTotal Overdue Books: {len(overdue)}")
     
     input("\nPress Enter to continue...")
@@ -647,8 +798,8 @@ def view_member_fines():
         print(f"{'Fine ID':<10} {'Amount':<12} {'Reason':<35} {'Paid':<6}")
         print("-"*63)
         for fine in fines:
-            paid_status = "Yes" if fine[5] == 1 else "No"
-            print(f"{fine[0]:<10} ${fine[3]:<11.2f} {(fine[4] or 'N/A')[:34]:<35} {paid_status:<6}")
+            paid_status = "Yes" if fine.paid else "No"
+            print(f"{fine.fine_id:<10} ${fine.amount:<11.2f} {(fine.reason or 'N/A')[:34]:<35} {paid_status:<6}")
     
     input("\nPress Enter to continue...")
 
@@ -675,32 +826,29 @@ def pay_fine():
 
 def view_all_unpaid_fines():
     """View all unpaid fines in the library"""
-    clear_screen()
-    print_header("💰 ALL UNPAID FINES")
+    count, total_amount = FineManager.get_unpaid_fines_summary()
+    first_page = FineManager.get_unpaid_fines(limit=PAGE_SIZE)
+    if not first_page:
+        clear_screen()
+        print_header("💰 ALL UNPAID FINES")
+        print("No unpaid fines.")
+        input("\nPress Enter to continue...")
+        return
     
-    # This would require a query that gets all unpaid fines
-    # For now, we'll implement a simple version
-    members = MemberManager.get_all_members()
-    all_fines = []
+    def print_columns():
+        print(f"{'Total Unpaid Fines:':<40} ${total_amount:.2f}")
+        print(f"Number of Unpaid Fines: {count}\n")
+        print(f"{'Fine ID':<10} {'Member':<20} {'Amount':<12} {'Reason':<30} {'Running Total':<12}")
+        print("-"*86)
     
-    for member in members:
-        fines = FineManager.get_member_fines(member.member_id)
-        for fine in fines:
-            if fine[5] == 0:  # Not paid
-                all_fines.append((fine, member.name))
+    def print_row(fine):
+        fine_id, _, member_name, amount, reason, _, running_total = fine
+        print(f"{fine_id:<10} {member_name[:19]:<20} ${amount:<11.2f} {(reason or 'N/A')[:29]:<30} ${running_total:.2f}")
     
-    if not all_fines:
-        print("No unpaid fines.")
-    else:
-        total_amount = sum(fine[0][3] for fine in all_fines)
-        print(f"{'Fine ID':<10} {'Member':<20} {'Amount':<12} {'Reason':<30}")
-        print("-"*72)
-        for fine, member_name in all_fines:
-            print(f"{fine[0]:<10} {member_name[:19]:<20} ${fine[3]:<11.2f} {(fine[4] or 'N/A')[:29]:<30}")
-        print(f"\n{'Total Unpaid Fines:':<40} ${total_amount:.2f}")
-        print(f"Number of Unpaid Fines: {len(all_fines)}")
+    def fetch_page(after_id=None, before_id=None, page_size=PAGE_SIZE):
+        return FineManager.get_unpaid_fines(after_id, before_id, page_size)
     
-    input("\nPress Enter to continue...")
+    page_through("💰 ALL UNPAID FINES", first_page, fetch_page, print_columns, print_row, lambda fine: fine[0])
 
 def main():
     """Main application"""
@@ -708,6 +856,8 @@ def main():
     if not os.path.exists(DATABASE_FILE):
         print("Initializing database...")
         init_database()
+    else:
+        migrate_database()
     
     while True:
         clear_screen()
@@ -750,44 +900,38 @@ def show_reports():
     print_header("📊 REPORTS & STATISTICS")
     
     # Get statistics
-    books = BookManager.get_all_books()
-    members = MemberManager.get_all_members()
-    active_borrowings = BorrowingManager.get_all_borrowings()
-    overdue = BorrowingManager.get_overdue_books()
-    
-    total_books = len(books)
-    total_available = sum(b.available_quantity for b in books)
-    total_borrowed = sum(b.quantity - b.available_quantity for b in books)
-    
-    total_members = len(members)
-    active_members = len([m for m in members if m.membership_status == 'active'])
-    total_fines = sum(m.outstanding_fine for m in members)
+    stats = ReportManager.get_dashboard_stats()
+    if stats is None:
+        print("Statistics are unavailable right now.")
+        input("\nPress Enter to continue...")
+        return
     
     print("📚 BOOK STATISTICS")
-    print(f"  Total Books: {total_books}")
-    print(f"  Available Books: {total_available}")
-    print(f"  Borrowed Books: {total_borrowed}")
+    print(f"  Total Books: {stats['total_books']}")
+    print(f"  Available Books: {stats['available_books']}")
+    print(f"  Borrowed Books: {stats['borrowed_books']}")
     
     print("\n👥 MEMBER STATISTICS")
-    print(f"  Total Members: {total_members}")
-    print(f"  Active Members: {active_members}")
-    print(f"  Total Outstanding Fines: ${total_fines:.2f}")
+    print(f"  Total Members: {stats['total_members']}")
+    print(f"  Active Members: {stats['active_members']}")
+    print(f"  Total Outstanding Fines: ${stats['outstanding_fines']:.2f}")
     
     print("\n📤 BORROWING STATISTICS")
-    print(f"  Active Borrowings: {len(active_borrowings)}")
-    print(f"  Overdue Books: {len(overdue)}")
+    print(f"  Active Borrowings: {stats['active_borrowings']}")
+    print(f"  Overdue Books: {stats['overdue_books']}")
     
     # Top categories
-    if books:
-        categories = {}
-        for book in books:
-            cat = book.category or "Uncategorized"
-            categories[cat] = categories.get(cat, 0) + 1
-        
+    if stats['top_categories']:
         print("\n📖 TOP CATEGORIES")
-        for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5]:
+        for cat, count in stats['top_categories']:
             print(f"  {cat}: {count} books")
     
+    print("\n⚡ LOOKUP CACHE")
+    for label, cache in (("Books", book_cache), ("Members", member_cache)):
+        status = cache.status()
+        print(f"  {label}: {status['size']}/{status['max_size']} cached, {status['hits']} hits, "
+              f"{status['misses']} misses ({status['hit_rate']:.0%}), {status['evictions']} evictions, {status['expirations']} expired")
+    
     input("\nPress Enter to continue...")
 
 if __name__ == "__main__":
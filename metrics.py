@@ -0,0 +1,317 @@
+"""
+Operational metrics for Library Management System
+Counters, gauges and fixed-bucket histograms rendered in the Prometheus text
+exposition format. The circulation metrics below are updated by the managers
+in db_operations; http_service serves them at GET /metrics, and batch jobs can
+dump them with write_textfile() for a node_exporter textfile collector.
+
+Updates take no lock: every thread adds into its own cell of each metric, and
+the cells are only summed when the registry is rendered.
+
+Usage:
+    import metrics
+    print(metrics.REGISTRY.render())
+    metrics.write_textfile("/var/lib/node_exporter/library.prom")
+"""
+import abc
+import bisect
+import math
+import os
+import threading
+
+# Latency bucket upper bounds in seconds (a +Inf bucket is always added)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class ThreadCells:
+    """One list of numbers per writing thread, summed element-wise on read
+
+    A thread only ever writes its own cell, so updates need no lock. Cells of
+    threads that have exited are folded into a retired cell, so a thread per
+    HTTP connection doesn't grow the list without bound.
+    """
+
+    __slots__ = ("size", "_local", "_lock", "_cells", "_retired")
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cells = []           # (thread, cell)
+        self._retired = [0] * size
+
+    def cell(self):
+        """This thread's cell, created on its first update"""
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = [0] * self.size
+            with self._lock:
+                self._retire()
+                self._cells.append((threading.current_thread(), cell))
+            return cell
+
+    def totals(self):
+        """Element-wise sum over every thread's cell"""
+        with self._lock:
+            self._retire()
+            totals = list(self._retired)
+            for _, cell in self._cells:
+                for i, value in enumerate(cell):
+                    totals[i] += value
+        return totals
+
+    def _retire(self):
+        """Fold the cells of finished threads into the retired cell (lock held)"""
+        live = []
+        for thread, cell in self._cells:
+            if thread.is_alive():
+                live.append((thread, cell))
+            else:
+                for i, value in enumerate(cell):
+                    self._retired[i] += value
+        self._cells = live
+
+
+class Metric(abc.ABC):
+    """A named metric family with optional labels; labels(...) returns the child to update"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values):
+        """The child for one combination of label values (look it up once and keep it on hot paths)"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """A fresh child for one combination of label values"""
+
+    def samples(self):
+        """(suffix, labels dict, value) for every child"""
+        for values, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            for suffix, extra, value in child.samples():
+                yield suffix, dict(labels, **extra), value
+
+
+class Counter(Metric):
+    """Monotonically increasing count; name it with a _total suffix"""
+
+    kind = "counter"
+
+    class Child:
+        """One labelled counter"""
+
+        __slots__ = ("_cells",)
+
+        def __init__(self):
+            self._cells = ThreadCells(1)
+
+        def inc(self, amount=1):
+            """Add amount (which must not be negative)"""
+            self._cells.cell()[0] += amount
+
+        def value(self):
+            """Current total"""
+            return self._cells.totals()[0]
+
+        def samples(self):
+            yield "", {}, self.value()
+
+    def _new_child(self):
+        return Counter.Child()
+
+    def inc(self, amount=1):
+        """Add amount to an unlabelled counter"""
+        self._unlabelled.inc(amount)
+
+    def value(self):
+        """Current total of an unlabelled counter"""
+        return self._unlabelled.value()
+
+
+class Gauge(Metric):
+    """A value that goes up and down, usually set just before each render"""
+
+    kind = "gauge"
+
+    class Child:
+        """One labelled gauge"""
+
+        __slots__ = ("current",)
+
+        def __init__(self):
+            self.current = 0
+
+        def set(self, value):
+            """Replace the value"""
+            self.current = value
+
+        def value(self):
+            """Current value"""
+            return self.current
+
+        def samples(self):
+            yield "", {}, self.current
+
+    def _new_child(self):
+        return Gauge.Child()
+
+    def set(self, value):
+        """Set an unlabelled gauge"""
+        self._unlabelled.set(value)
+
+    def value(self):
+        """Current value of an unlabelled gauge"""
+        return self._unlabelled.value()
+
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, with their count and sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    class Child:
+        """One labelled histogram: a cell holds each bucket's count, then the sum"""
+
+        __slots__ = ("buckets", "_cells")
+
+        def __init__(self, buckets):
+            self.buckets = buckets
+            self._cells = ThreadCells(len(buckets) + 2)
+
+        def observe(self, value):
+            """Count one observation"""
+            cell = self._cells.cell()
+            cell[bisect.bisect_left(self.buckets, value)] += 1
+            cell[-1] += value
+
+        def snapshot(self):
+            """(cumulative bucket counts including +Inf, count, sum)"""
+            totals = self._cells.totals()
+            cumulative = []
+            running = 0
+            for count in totals[:-1]:
+                running += count
+                cumulative.append(running)
+            return cumulative, running, totals[-1]
+
+        def samples(self):
+            cumulative, count, total = self.snapshot()
+            for bound, running in zip(self.buckets + (math.inf,), cumulative):
+                yield "_bucket", {"le": format_value(bound)}, running
+            yield "_count", {}, count
+            yield "_sum", {}, total
+
+    def _new_child(self):
+        return Histogram.Child(self.buckets)
+
+    def observe(self, value):
+        """Count one observation in an unlabelled histogram"""
+        self._unlabelled.observe(value)
+
+
+class Registry:
+    """The metrics to render, plus callbacks that refresh gauges just before rendering"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric; names must be unique"""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def on_collect(self, callback):
+        """Call callback() before every render, e.g. to set gauges from the database"""
+        self._collectors.append(callback)
+        return callback
+
+    def get(self, name):
+        """A registered metric by name"""
+        return self._metrics[name]
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        for callback in self._collectors:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {escape(metric.documentation, quote=False)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                label_text = ",".join(f'{key}="{escape(text)}"' for key, text in labels.items())
+                lines.append(f"{metric.name}{suffix}{{{label_text}}} {format_value(value)}" if label_text
+                             else f"{metric.name}{suffix} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def escape(text, quote=True):
+    """Escape a label value (or HELP text, with quote=False)"""
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quote else text
+
+
+def format_value(value):
+    """Sample values: whole numbers without a fraction, +Inf/-Inf/NaN spelled the Prometheus way"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def write_textfile(path, registry=None):
+    """Write the rendered metrics to path atomically (write a temp file, then rename)"""
+    text = (REGISTRY if registry is None else registry).render()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as output:
+        output.write(text)
+    os.replace(temp_path, path)
+
+
+REGISTRY = Registry()
+
+# Circulation metrics, updated by the managers in db_operations
+OPERATIONS = Counter(
+    "library_operations_total",
+    "Circulation operations by result; batch checkouts and returns count each item",
+    ("operation", "result"))
+OPERATION_SECONDS = Histogram(
+    "library_operation_duration_seconds",
+    "Latency of circulation manager calls in seconds",
+    ("operation",))
+ACTIVE_LOANS = Gauge("library_active_loans", "Books currently on loan")
+OVERDUE_LOANS = Gauge("library_overdue_loans", "Loans past their due date")
+OUTSTANDING_FINES = Gauge("library_outstanding_fines", "Unpaid fines owed by members")
@@ -1,10 +1,122 @@
 """
 Data models for Library Management System
 """
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import re
 
-class Book:
+def isbn13_check_digit(first12):
+    """The ISBN-13 (EAN-13) check digit for 12 digits"""
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+def normalize_isbn(isbn):
+    """Canonicalize a valid ISBN-10 or ISBN-13 to 13 bare digits, or return None if it isn't one
+    
+    Both check digits are verified (mod 11 for ISBN-10, mod 10 for ISBN-13), so a
+    mistyped ISBN or any other 10 or 13 digit number is not taken for an ISBN.
+    """
+    if not isbn:
+        return None
+    compact = re.sub(r"[\s-]", "", str(isbn)).upper()
+    if compact.startswith("ISBN"):
+        compact = compact[4:].lstrip(":")
+    if re.fullmatch(r"\d{13}", compact):
+        return compact if isbn13_check_digit(compact[:12]) == compact[12] else None
+    if re.fullmatch(r"\d{9}[\dX]", compact):
+        weighted = sum((10 - i) * (10 if d == "X" else int(d)) for i, d in enumerate(compact))
+        if weighted % 11:
+            return None
+        # ISBN-10 -> ISBN-13: prefix 978 and recompute the check digit
+        digits = "978" + compact[:9]
+        return digits + isbn13_check_digit(digits)
+    return None
+
+def parse_timestamp(value):
+    """Turn a stored TIMESTAMP string back into a datetime (None and datetimes pass through)"""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def parse_date(value):
+    """Turn a stored DATE string back into a date (None and dates pass through)"""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+# Compiled row builders by (model, column names), plus the last cursor.description each model saw
+_builders = {}
+_last_builders = {}
+
+class RowModel:
+    """Base for slot-based models that can be built straight from database rows
+    
+    Subclasses list their attributes in __slots__ and any per-column conversions
+    in _converters. Rows are mapped to attributes by column name, so column order
+    and extra joined columns don't matter; slots with no matching column are None.
+    """
+    __slots__ = ()
+    _converters = {}
+    
+    @classmethod
+    def _builder(cls, columns):
+        """Get a function that builds an instance from a row with these columns, without running __init__
+        
+        Like dataclasses, the function is generated once per layout so each row
+        costs plain attribute stores rather than a loop of setattr calls.
+        """
+        key = (cls, tuple(columns))
+        build = _builders.get(key)
+        if build is None:
+            index = {column: i for i, column in enumerate(columns)}
+            lines = ["def build(row):", "    obj = new(cls)"]
+            for slot in cls.__slots__:
+                if slot not in index:
+                    lines.append(f"    obj.{slot} = None")
+                elif slot in cls._converters:
+                    lines.append(f"    value = row[{index[slot]}]")
+                    lines.append(f"    obj.{slot} = convert_{slot}(value) if value is not None else None")
+                else:
+                    lines.append(f"    obj.{slot} = row[{index[slot]}]")
+            lines.append("    return obj")
+            namespace = {"new": object.__new__, "cls": cls}
+            namespace.update((f"convert_{slot}", convert) for slot, convert in cls._converters.items())
+            exec("\n".join(lines), namespace)
+            build = _builders[key] = namespace["build"]
+        return build
+    
+    @classmethod
+    def from_row(cls, row):
+        """Build an instance from a sqlite3.Row or dict, mapping columns by name"""
+        columns = list(row.keys())
+        return cls._builder(columns)([row[column] for column in columns])
+    
+    def to_dict(self):
+        """Return the attributes as a plain dict, e.g. for JSON"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+    
+    def copy(self):
+        """Return a shallow copy with the same attribute values
+        
+        The values are already converted, so they are copied as they are rather
+        than passed through the row builder's _converters again.
+        """
+        clone = object.__new__(type(self))
+        for slot in self.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        return clone
+    
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """sqlite3 row_factory that returns model instances, e.g. cursor.row_factory = Book.row_factory"""
+        description = cursor.description
+        cached = _last_builders.get(cls)
+        if cached is None or cached[0] is not description:
+            cached = (description, cls._builder([column[0] for column in description]))
+            _last_builders[cls] = cached
+        return cached[1](row)
+
+class Book(RowModel):
     """Represents a book in the library"""
+    __slots__ = ("book_id", "title", "author", "isbn", "publication_year", "quantity",
+                 "available_quantity", "category", "created_at")
+    _converters = {"created_at": parse_timestamp}
+    
     def __init__(self, title, author, isbn=None, publication_year=None, quantity=1, category=None):
         self.book_id = None
         self.title = title
@@ -18,9 +130,28 @@ class Book:
     
     def __repr__(self):
         return f"Book(ID:{self.book_id}, Title:'{self.title}', Author:'{self.author}', Available:{self.available_quantity}/{self.quantity})"
+    
+    @classmethod
+    def from_record(cls, record):
+        """Build a Book from a dict such as a CSV or JSON row (raises ValueError on bad data)"""
+        if not isinstance(record, dict):
+            raise ValueError("Malformed record")
+        fields = {key: (str(value).strip() or None) if value is not None else None for key, value in record.items()}
+        if not fields.get("title") or not fields.get("author"):
+            raise ValueError("Title and author are required")
+        try:
+            publication_year = int(fields["publication_year"]) if fields.get("publication_year") else None
+            quantity = int(fields["quantity"]) if fields.get("quantity") else 1
+        except ValueError:
+            raise ValueError("Publication year and quantity must be whole numbers")
+        return cls(fields["title"], fields["author"], fields.get("isbn"), publication_year, quantity, fields.get("category"))
 
-class Member:
+class Member(RowModel):
     """Represents a library member"""
+    __slots__ = ("member_id", "name", "email", "phone", "address", "membership_date",
+                 "membership_status", "outstanding_fine")
+    _converters = {"membership_date": parse_timestamp}
+    
     def __init__(self, name, email=None, phone=None, address=None):
         self.member_id = None
         self.name = name
@@ -33,9 +164,23 @@ class Member:
     
     def __repr__(self):
         return f"Member(ID:{self.member_id}, Name:'{self.name}', Status:'{self.membership_status}', Fine:${self.outstanding_fine:.2f})"
+    
+    @classmethod
+    def from_record(cls, record):
+        """Build a Member from a dict such as a CSV or JSON row (raises ValueError on bad data)"""
+        if not isinstance(record, dict):
+            raise ValueError("Malformed record")
+        fields = {key: (str(value).strip() or None) if value is not None else None for key, value in record.items()}
+        if not fields.get("name"):
+            raise ValueError("Name is required")
+        return cls(fields["name"], fields.get("email"), fields.get("phone"), fields.get("address"))
 
-class BorrowingRecord:
+class BorrowingRecord(RowModel):
     """Represents a borrowing transaction"""
+    __slots__ = ("borrow_id", "member_id", "book_id", "borrow_date", "due_date", "return_date",
+                 "status", "fine_amount")
+    _converters = {"borrow_date": parse_timestamp, "due_date": parse_timestamp, "return_date": parse_timestamp}
+    
     def __init__(self, member_id, book_id, borrow_duration_days=14):
         self.borrow_id = None
         self.member_id = member_id
@@ -65,8 +210,11 @@ class BorrowingRecord:
             return days_overdue * fine_per_day
         return 0.0
 
-class Fine:
+class Fine(RowModel):
     """Represents a fine/penalty"""
+    __slots__ = ("fine_id", "member_id", "borrow_id", "amount", "reason", "paid", "created_date", "accrued_date")
+    _converters = {"paid": bool, "created_date": parse_timestamp, "accrued_date": parse_date}
+    
     def __init__(self, member_id, amount, reason, borrow_id=None):
         self.fine_id = None
         self.member_id = member_id
@@ -75,6 +223,7 @@ class Fine:
         self.reason = reason
         self.paid = False
         self.created_date = datetime.now()
+        self.accrued_date = None
     
     def __repr__(self):
         return f"Fine(ID:{self.fine_id}, Member:{self.member_id}, Amount:${self.amount:.2f}, Paid:{self.paid})"
@@ -2,11 +2,31 @@
 Test and demonstration script for Library Management System
 This script demonstrates the functionality of the system programmatically
 """
-from datetime import datetime, timedelta
-from database import init_database, DATABASE_FILE
-from db_operations import BookManager, MemberManager, BorrowingManager, FineManager
-from models import Book, Member
+from datetime import date, datetime, timedelta
+from database import init_database, close_pool, apply_migrations, ConnectionPool, LRUCache, DATABASE_FILE, use_branch
+from db_operations import BookManager, MemberManager, BorrowingManager, FineManager, ReportManager, BranchManager, book_cache, member_cache
+from bulk_import import import_books
+from async_operations import AsyncBookManager, AsyncMemberManager, AsyncBorrowingManager, run_in_db_thread
+from http_service import make_server
+from init_sample_data import generate_library
+from parallel_reports import circulation_report
+from export import export_tables
+import benchmark_suite
+import instrumentation
+import metrics
+from models import Book, Member, Fine, normalize_isbn
+import asyncio
+import csv
+import gzip
+import http.client
+import json
 import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+import database
 
 def print_test_header(test_name):
     """Print a formatted test header"""
@@ -14,6 +34,19 @@ def print_test_header(test_name):
     print(f"TEST: {test_name}".center(60))
     print(f"{'='*60}\n")
 
+@contextmanager
+def temporary_database():
+    """Run the managers against a fresh database file"""
+    original = database.DATABASE_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_FILE = os.path.join(tmp, "test.db")
+        init_database()
+        try:
+            yield database.DATABASE_FILE
+        finally:
+            close_pool()
+            database.DATABASE_FILE = original
+
 def test_book_operations():
     """Test book management operations"""
     print_test_header("Book Management Operations")
@@ -100,15 +133,14 @@ def test_borrowing_operations(member_id, book_id):
     borrowings = BorrowingManager.get_active_borrowings(member_id)
     print(f"   Active borrowings for member {member_id}: {len(borrowings)}")
     for borrow in borrowings:
-        due_date = datetime.fromisoformat(borrow[4])
-        print(f"   - Book ID: {borrow[2]}, Due: {due_date.strftime('%Y-%m-%d')}")
+        print(f"   - Book ID: {borrow.book_id}, Due: {borrow.due_date.strftime('%Y-%m-%d')}")
     
     # Return the book
     print("\n3. Returning a book:")
-    success, message = BorrowingManager.return_book(borrowings[0][0])
+    success, message = BorrowingManager.return_book(borrowings[0].borrow_id)
     print(f"   ✓ {message}")
     
-    return borrowings[0][0]
+    return borrowings[0].borrow_id
 
 def test_overdue_scenario(member_id, book_id):
     """Test overdue book scenario"""
@@ -122,7 +154,7 @@ def test_overdue_scenario(member_id, book_id):
     # Get the borrowing record
     borrowings = BorrowingManager.get_active_borrowings(member_id)
     if borrowings:
-        due_date = datetime.fromisoformat(borrowings[0][4])
+        due_date = borrowings[0].due_date
         print(f"\n2. Due date: {due_date.strftime('%Y-%m-%d %H:%M:%S')}")
         
         # Simulate return after due date
@@ -145,16 +177,1224 @@ def test_fine_operations(member_id):
     else:
         print(f"   Total fines: {len(fines)}")
         for fine in fines:
-            paid_status = "Paid" if fine[5] == 1 else "Unpaid"
-            print(f"   - Fine ID: {fine[0]}, Amount: ${fine[3]:.2f}, Status: {paid_status}")
+            paid_status = "Paid" if fine.paid else "Unpaid"
+            print(f"   - Fine ID: {fine.fine_id}, Amount: ${fine.amount:.2f}, Status: {paid_status}")
         
         # Pay a fine if there are unpaid ones
-        unpaid_fines = [f for f in fines if f[5] == 0]
+        unpaid_fines = [f for f in fines if not f.paid]
         if unpaid_fines:
             print(f"\n2. Paying a fine:")
-            success, message = FineManager.pay_fine(unpaid_fines[0][0])
+            success, message = FineManager.pay_fine(unpaid_fines[0].fine_id)
             print(f"   ✓ {message}")
 
+def test_connection_pool():
+    """Test pooled connection reuse and storage profile"""
+    print_test_header("Connection Pool")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "pool.db"), max_size=2)
+        
+        print("1. Checking out and returning a connection twice:")
+        conn = pool.acquire()
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+        conn = pool.acquire()
+        conn.close()
+        status = pool.status()
+        print(f"   ✓ Journal mode: {journal_mode}")
+        print(f"   ✓ Created: {status['created']}, Reused: {status['reused']}")
+        assert journal_mode == "wal"
+        assert status["created"] == 1 and status["reused"] == 1
+        
+        print("\n2. Uncommitted work is rolled back on return:")
+        conn = pool.acquire()
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.close()
+        conn = pool.acquire()
+        count = conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+        conn.close()
+        print(f"   ✓ Rows after rollback: {count}")
+        assert count == 0
+        
+        pool.close()
+
+def test_schema_migrations():
+    """Test in-place upgrade of a legacy database"""
+    print_test_header("Schema Migrations")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_schema = """
+            CREATE TABLE books (book_id INTEGER PRIMARY KEY, title TEXT, author TEXT, isbn TEXT UNIQUE,
+                                publication_year INTEGER, quantity INTEGER, available_quantity INTEGER,
+                                category TEXT, created_at TIMESTAMP);
+            CREATE TABLE members (member_id INTEGER PRIMARY KEY, name TEXT, email TEXT UNIQUE, phone TEXT,
+                                  address TEXT, membership_date TIMESTAMP, membership_status TEXT,
+                                  outstanding_fine REAL);
+            CREATE TABLE borrowing (borrow_id INTEGER PRIMARY KEY, member_id INTEGER, book_id INTEGER,
+                                    borrow_date TIMESTAMP, due_date TIMESTAMP, return_date TIMESTAMP,
+                                    status TEXT, fine_amount REAL);
+            CREATE TABLE fines (fine_id INTEGER PRIMARY KEY, member_id INTEGER, borrow_id INTEGER,
+                                amount REAL, reason TEXT, paid BOOLEAN, created_date TIMESTAMP);
+            INSERT INTO borrowing (member_id, book_id, due_date, status) VALUES (1, 1, '2020-01-01', 'borrowed');
+            INSERT INTO books (title, author, isbn) VALUES ('Dune', 'Frank Herbert', '0-441-17271-7');
+        """
+        conn = sqlite3.connect(os.path.join(tmp, "legacy.db"))
+        conn.executescript(legacy_schema)
+        
+        print("1. Upgrading legacy database:")
+        applied = apply_migrations(conn)
+        print(f"   ✓ Applied migrations: {applied}")
+        assert applied
+        
+        print("\n2. Re-running is a no-op:")
+        again = apply_migrations(conn)
+        print(f"   ✓ Applied migrations: {again}")
+        assert again == []
+        
+        print("\n3. Query plans use the new indexes:")
+        for sql in ["SELECT * FROM borrowing WHERE member_id = 1 AND status = 'borrowed'",
+                    "SELECT * FROM borrowing WHERE status = 'borrowed' AND due_date < '2024-01-01'",
+                    "SELECT * FROM fines WHERE member_id = 1 ORDER BY created_date DESC"]:
+            plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+            print(f"   ✓ {plan}")
+            assert "INDEX" in plan
+        
+        print(f"\n4. Existing data kept: {conn.execute('SELECT COUNT(*) FROM borrowing').fetchone()[0]} borrowing row(s)")
+        normalized = conn.execute("SELECT isbn_normalized FROM books").fetchone()[0]
+        print(f"   ✓ Backfilled ISBN: {normalized}")
+        assert normalized == "9780441172719"
+        conn.close()
+        
+        print("\n5. Processes starting together apply each migration once:")
+        path = os.path.join(tmp, "racing.db")
+        racing = sqlite3.connect(path)
+        racing.executescript(legacy_schema)
+        racing.close()
+        results, errors = [], []
+        
+        def migrate():
+            racer = sqlite3.connect(path, timeout=30)
+            try:
+                results.append(apply_migrations(racer))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                racer.close()
+        racers = [threading.Thread(target=migrate) for _ in range(4)]
+        for racer in racers:
+            racer.start()
+        for racer in racers:
+            racer.join()
+        versions = sorted(version for result in results for version in result)
+        print(f"   ✓ Applied across 4 migrators: {versions}, errors: {errors}")
+        assert errors == [] and versions == [version for version, _, _ in database.MIGRATIONS]
+
+def test_full_text_search():
+    """Test ranked full-text catalog search"""
+    print_test_header("Full-Text Search")
+    
+    with temporary_database():
+        BookManager.add_book(Book("The Hobbit", "J.R.R. Tolkien", "978-0547928227", 1937, 5, "Fantasy"))
+        BookManager.add_book(Book("The Lord of the Rings", "J.R.R. Tolkien", "978-0544003415", 1954, 3, "Fantasy"))
+        BookManager.add_book(Book("Dune", "Frank Herbert", "978-0441172719", 1965, 2, "Science Fiction"))
+        
+        print("1. Prefix search on author:")
+        results = BookManager.search_books("tolk")
+        print(f"   ✓ 'tolk' -> {[b.title for b in results]}")
+        assert len(results) == 2
+        
+        print("\n2. Multi-word search across fields:")
+        results = BookManager.search_books("herbert science")
+        print(f"   ✓ 'herbert science' -> {[b.title for b in results]}")
+        assert [b.title for b in results] == ["Dune"]
+        
+        print("\n3. Limit and ISBN prefix:")
+        assert len(BookManager.search_books("tolkien", limit=1)) == 1
+        results = BookManager.search_books("978-0441")
+        print(f"   ✓ '978-0441' -> {[b.title for b in results]}")
+        assert results[0].title == "Dune"
+        
+        print("\n4. Index follows updates and deletes:")
+        dune = results[0]
+        dune.title = "Dune Messiah"
+        BookManager.update_book(dune)
+        assert [b.title for b in BookManager.search_books("messiah")] == ["Dune Messiah"]
+        BookManager.delete_book(dune.book_id)
+        assert BookManager.search_books("messiah") == []
+        print("   ✓ Search results stay in sync")
+    
+    print("\n5. A build without FTS5 leaves migration 2 pending for one with it:")
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "no_fts.db"))
+        conn.execute("CREATE TABLE books (book_id INTEGER PRIMARY KEY, title TEXT, author TEXT, category TEXT)")
+        conn.execute("INSERT INTO books (title, author, category) VALUES ('Dune', 'Frank Herbert', 'Science Fiction')")
+        conn.commit()
+        # Only the FTS migrations: the rest need the full schema
+        migrations = database.MIGRATIONS
+        database.MIGRATIONS = [migration for migration in migrations if database.create_books_fts in migration[2]]
+        try:
+            database.FTS5_AVAILABLE = False
+            assert apply_migrations(conn) == [] and not database.has_books_fts(conn)
+            database.FTS5_AVAILABLE = True
+            applied = apply_migrations(conn)
+            assert applied == [2, 9] and database.has_books_fts(conn)
+        finally:
+            database.MIGRATIONS = migrations
+            database.FTS5_AVAILABLE = database.fts5_available()
+        found = conn.execute("SELECT rowid FROM books_fts WHERE books_fts MATCH 'dune'").fetchall()
+        print(f"   ✓ Applied {applied} once FTS5 was there, search finds {found}")
+        assert found == [(1,)]
+        conn.close()
+
+def test_isbn_lookup():
+    """Test exact ISBN lookups regardless of formatting"""
+    print_test_header("ISBN Lookup")
+    
+    with temporary_database():
+        book = Book("The Great Gatsby", "F. Scott Fitzgerald", "978-0743273565", 1925, 3, "Fiction")
+        BookManager.add_book(book)
+        
+        print("1. Looking up by different spellings of the same ISBN:")
+        for isbn in ["9780743273565", "978-0743273565", "0743273567", "0-7432-7356-7"]:
+            found = BookManager.get_book_by_isbn(isbn)
+            print(f"   ✓ {isbn:<16} -> {found.title if found else None}")
+            assert found and found.book_id == book.book_id
+        
+        print("\n2. Scanner input short-circuits search:")
+        results = BookManager.search_books("9780743273565")
+        print(f"   ✓ {[b.title for b in results]}")
+        assert len(results) == 1
+        
+        print("\n3. The same ISBN in another format is rejected:")
+        duplicate = Book("Gatsby (copy)", "F. Scott Fitzgerald", "0743273567", 1925, 1, "Fiction")
+        assert not BookManager.add_book(duplicate)
+        
+        print("\n4. Bad check digits and other numbers are not ISBNs:")
+        for text in ["0743273568", "074327356X", "9780743273566", "5551234567"]:
+            print(f"   ✓ {text:<16} -> {normalize_isbn(text)}")
+            assert normalize_isbn(text) is None
+            assert BookManager.get_book_by_isbn(text) is None
+        typo = Book("Gatsby (typo)", "F. Scott Fitzgerald", "0743273568", 1925, 1, "Fiction")
+        assert BookManager.add_book(typo)
+        assert [b.title for b in BookManager.search_books("Gatsby typo")] == ["Gatsby (typo)"]
+
+def test_bulk_import():
+    """Test batched catalog import with per-row rejects"""
+    print_test_header("Bulk Catalog Import")
+    
+    with temporary_database() as path:
+        feed = os.path.join(os.path.dirname(path), "feed.csv")
+        with open(feed, "w", newline="") as f:
+            f.write("title,author,isbn,publication_year,quantity,category\n")
+            f.write("Dune,Frank Herbert,978-0441172719,1965,2,Science Fiction\n")
+            f.write("Emma,Jane Austen,978-0141439587,1815,1,Romance\n")
+            f.write("Dune (again),Frank Herbert,0441172717,1965,1,Science Fiction\n")
+            f.write(",No Title,,,,\n")
+            f.write("Persuasion,Jane Austen,,1817,abc,Romance\n")
+            f.write("Hamlet,William Shakespeare,,1603,4,Drama\n")
+        
+        print("1. Importing a feed with bad rows (batch size 2):")
+        summary = import_books(feed, batch_size=2, progress=None)
+        print(f"   ✓ Inserted: {summary['inserted']}, Rejected: {summary['rejected']}")
+        assert summary["inserted"] == 3
+        assert sorted(row for row, _ in summary["rejected"]) == [3, 4, 5]
+        
+        print("\n2. Imported books are searchable:")
+        results = BookManager.search_books("austen")
+        print(f"   ✓ 'austen' -> {[b.title for b in results]}")
+        assert [b.title for b in results] == ["Emma"]
+        
+        print("\n3. A clash the screen can't see falls back to row-by-row inserts:")
+        summary = BookManager.add_books_bulk([Book("Kit A", "Author", "KIT-1"), Book("Kit B", "Author", "KIT-1"),
+                                              Book("Kit C", "Author", "KIT-2")])
+        print(f"   ✓ Inserted: {summary['inserted']}, Rejected: {summary['rejected']}")
+        assert summary["inserted"] == 2 and summary["rejected"] == [(2, "UNIQUE constraint failed: books.isbn")]
+
+def test_bulk_member_enrollment():
+    """Test batched member registration with the email upsert policy"""
+    print_test_header("Bulk Member Enrollment")
+    
+    with temporary_database():
+        MemberManager.add_member(Member("Alice Johnson", "alice@email.com", "555-0001", "100 Main St"))
+        enrollments = (
+            {"name": f"Student {i}", "email": f"student{i}@uni.edu", "phone": None, "address": None}
+            for i in range(5)
+        )
+        
+        print("1. Enrolling 5 new members (batch size 2):")
+        summary = MemberManager.add_members_bulk(enrollments, batch_size=2)
+        print(f"   ✓ Inserted: {summary['inserted']}, Updated: {summary['updated']}, Rejected: {len(summary['rejected'])}")
+        assert summary["inserted"] == 5
+        
+        print("\n2. Re-enrolling with an existing email and a missing name:")
+        records = [{"name": "Alice J. Johnson", "email": "alice@email.com", "phone": "555-9999"},
+                   {"name": "", "email": "nobody@email.com"},
+                   {"name": "New Student", "email": "new@uni.edu"}]
+        summary = MemberManager.add_members_bulk(records)
+        print(f"   ✓ Inserted: {summary['inserted']}, Updated: {summary['updated']}, Rejected: {summary['rejected']}")
+        assert (summary["inserted"], summary["updated"], len(summary["rejected"])) == (1, 1, 1)
+        alice = MemberManager.search_members("alice@email.com")[0]
+        print(f"   ✓ {alice.name}, {alice.phone}, {alice.address}")
+        assert (alice.name, alice.phone, alice.address) == ("Alice J. Johnson", "555-9999", "100 Main St")
+        
+        print("\n3. Reject policy leaves existing members alone:")
+        summary = MemberManager.add_members_bulk(records[:1], on_duplicate="reject")
+        print(f"   ✓ Rejected: {summary['rejected']}")
+        assert summary["inserted"] == summary["updated"] == 0 and len(summary["rejected"]) == 1
+
+def test_concurrent_borrowing():
+    """Stress test: concurrent checkouts never oversell a book"""
+    print_test_header("Concurrent Borrowing")
+    
+    with temporary_database():
+        book = Book("Atomic Habits", "James Clear", "978-0735211292", 2018, 5, "Self-Help")
+        BookManager.add_book(book)
+        member = Member("Desk Tester", "desk@email.com")
+        MemberManager.add_member(member)
+        
+        results = []
+        def desk():
+            for _ in range(10):
+                success, _ = BorrowingManager.borrow_book(member.member_id, book.book_id)
+                results.append(success)
+        
+        print("1. 8 desks try to borrow 5 copies, 10 times each:")
+        threads = [threading.Thread(target=desk) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stored = BookManager.get_book_by_id(book.book_id)
+        loans = len(BorrowingManager.get_active_borrowings(member.member_id))
+        print(f"   ✓ Successful checkouts: {results.count(True)} of {len(results)}")
+        print(f"   ✓ Available copies: {stored.available_quantity}, Active loans: {loans}")
+        assert results.count(True) == 5
+        assert stored.available_quantity == 0 and loans == 5
+
+def test_batch_circulation():
+    """Test multi-item checkout and return in one transaction each"""
+    print_test_header("Batch Checkout and Return")
+    
+    with temporary_database():
+        book1 = Book("Sapiens", "Yuval Noah Harari", "978-0062316097", 2011, 5, "Non-Fiction")
+        book2 = Book("Educated", "Tara Westover", "978-0399590504", 2018, 1, "Biography")
+        BookManager.add_book(book1)
+        BookManager.add_book(book2)
+        member = Member("Scanner User", "scan@email.com")
+        MemberManager.add_member(member)
+        
+        print("1. Checking out four scanned items:")
+        results = BorrowingManager.borrow_books(member.member_id, [book1.book_id, book2.book_id, book2.book_id, 999])
+        for book_id, success, message in results:
+            print(f"   {'✓' if success else '✗'} Book {book_id}: {message}")
+        assert [success for _, success, _ in results] == [True, True, False, False]
+        assert BookManager.get_book_by_id(book2.book_id).available_quantity == 0
+        
+        print("\n2. Returning both loans three days late, plus a repeat and an unknown ID:")
+        borrow_ids = [borrow.borrow_id for borrow in BorrowingManager.get_active_borrowings(member.member_id)]
+        with database.pooled_connection() as conn:
+            conn.execute("UPDATE borrowing SET due_date = ?", (datetime.now() - timedelta(days=3, hours=1),))
+            conn.commit()
+        results = BorrowingManager.return_books(borrow_ids + [borrow_ids[0], 12345])
+        for borrow_id, success, message in results:
+            print(f"   {'✓' if success else '✗'} Borrowing {borrow_id}: {message}")
+        assert [success for _, success, _ in results] == [True, True, False, False]
+        
+        fined = MemberManager.get_member_by_id(member.member_id)
+        fines = FineManager.get_member_fines(member.member_id)
+        print(f"   ✓ Outstanding fine: ${fined.outstanding_fine:.2f} across {len(fines)} fine(s)")
+        assert fined.outstanding_fine == 6.0 and len(fines) == 2
+        assert BookManager.get_book_by_id(book2.book_id).available_quantity == 1
+
+def test_paginated_iteration():
+    """Test keyset-paginated streaming and paging"""
+    print_test_header("Paginated Iteration")
+    
+    with temporary_database():
+        BookManager.add_books_bulk(Book(f"Book {i}", "Author", None, 2000, 1, "Fiction") for i in range(1050))
+        MemberManager.add_members_bulk(Member(f"Member {i}") for i in range(30))
+        
+        print("1. Streaming all books in pages of 100:")
+        ids = [book.book_id for book in BookManager.iter_books(batch_size=100)]
+        print(f"   ✓ Streamed {len(ids)} books, IDs {ids[0]}..{ids[-1]}")
+        assert ids == list(range(1, 1051))
+        
+        print("\n2. Paging forward, backward and jumping:")
+        page = BookManager.get_books_page(after_id=20, page_size=10)
+        previous = BookManager.get_books_page(before_id=page[0].book_id, page_size=10)
+        jumped = BookManager.get_books_page(after_id=1045, page_size=10)
+        print(f"   ✓ Next: {page[0].book_id}-{page[-1].book_id}, Previous: {previous[0].book_id}-{previous[-1].book_id}, "
+              f"Jump: {jumped[0].book_id}-{jumped[-1].book_id}")
+        assert [b.book_id for b in previous] == list(range(11, 21))
+        assert len(jumped) == 5
+        
+        print("\n3. Streaming members:")
+        count = sum(1 for _ in MemberManager.iter_members(batch_size=7))
+        print(f"   ✓ Streamed {count} members")
+        assert count == 30
+        
+        print("\n4. Paging active borrowings skips returned loans:")
+        results = BorrowingManager.borrow_books(1, range(1, 13))
+        assert all(success for _, success, _ in results)
+        BorrowingManager.return_books([2, 3, 11])
+        first = BorrowingManager.get_borrowings_page(page_size=5)
+        second = BorrowingManager.get_borrowings_page(after_id=first[-1].borrow_id, page_size=5)
+        back = BorrowingManager.get_borrowings_page(before_id=second[0].borrow_id, page_size=5)
+        print(f"   ✓ {[b.borrow_id for b in first]} {[b.borrow_id for b in second]}")
+        assert [b.borrow_id for b in first] == [1, 4, 5, 6, 7]
+        assert [b.borrow_id for b in second] == [8, 9, 10, 12]
+        assert [b.borrow_id for b in back] == [1, 4, 5, 6, 7]
+
+def test_dashboard_stats():
+    """Test SQL-computed dashboard statistics"""
+    print_test_header("Dashboard Statistics")
+    
+    with temporary_database():
+        BookManager.add_book(Book("Dune", "Frank Herbert", None, 1965, 3, "Science Fiction"))
+        BookManager.add_book(Book("Emma", "Jane Austen", None, 1815, 2, "Romance"))
+        BookManager.add_book(Book("Untitled Notes", "Anonymous", None, 2000, 1, ""))
+        reader = Member("Stats Reader", "stats@email.com")
+        MemberManager.add_member(reader)
+        MemberManager.add_member(Member("Former Reader", "former@email.com"))
+        former = MemberManager.search_members("former@email.com")[0]
+        former.membership_status = "inactive"
+        former.outstanding_fine = 2.5
+        MemberManager.update_member(former)
+        BorrowingManager.borrow_books(reader.member_id, [1, 1, 2])
+        with database.pooled_connection() as conn:
+            conn.execute("UPDATE borrowing SET due_date = ? WHERE book_id = 2", (datetime.now() - timedelta(days=1),))
+            conn.commit()
+        
+        stats = ReportManager.get_dashboard_stats()
+        print(f"   ✓ {stats}")
+        assert (stats["total_books"], stats["available_books"], stats["borrowed_books"]) == (3, 3, 3)
+        assert (stats["total_members"], stats["active_members"], stats["outstanding_fines"]) == (2, 1, 2.5)
+        assert (stats["active_borrowings"], stats["overdue_books"]) == (3, 1)
+        assert ("Uncategorized", 1) in stats["top_categories"]
+
+def test_unpaid_fines_listing():
+    """Test the joined, paginated unpaid fines query"""
+    print_test_header("Unpaid Fines Listing")
+    
+    with temporary_database():
+        members = [Member(f"Fined Member {i}", f"fined{i}@email.com") for i in range(3)]
+        for member in members:
+            MemberManager.add_member(member)
+        with database.pooled_connection() as conn:
+            conn.executemany("INSERT INTO fines (member_id, amount, reason, paid) VALUES (?, ?, ?, ?)",
+                             [(members[i % 3].member_id, float(i + 1), f"Fine {i}", 1 if i == 2 else 0) for i in range(6)])
+            conn.commit()
+        
+        print("1. All unpaid fines with member names:")
+        fines = FineManager.get_unpaid_fines()
+        for fine in fines:
+            print(f"   ✓ Fine {fine[0]}: {fine[2]} ${fine[3]:.2f} (running ${fine[6]:.2f})")
+        assert [fine[0] for fine in fines] == [1, 2, 4, 5, 6]
+        assert fines[-1][6] == FineManager.get_unpaid_fines_summary()[1] == 18.0
+        
+        print("\n2. Second page keeps the running total:")
+        page = FineManager.get_unpaid_fines(after_id=2, limit=2)
+        previous = FineManager.get_unpaid_fines(before_id=page[0][0], limit=2)
+        print(f"   ✓ Page: {[(f[0], f[6]) for f in page]}, Previous: {[(f[0], f[6]) for f in previous]}")
+        assert [(f[0], f[6]) for f in page] == [(4, 7.0), (5, 12.0)]
+        assert [f[0] for f in previous] == [1, 2]
+
+def test_member_dashboard():
+    """Test the one-shot member dashboard query"""
+    print_test_header("Member Dashboard")
+    
+    with temporary_database():
+        member = Member("Dashboard Reader", "dashboard@email.com")
+        MemberManager.add_member(member)
+        books = [Book(f"Dashboard Book {i}", "Author", f"DASH-{i}", 2020, 1) for i in range(3)]
+        for book in books:
+            BookManager.add_book(book)
+        for book in books:
+            BorrowingManager.borrow_book(member.member_id, book.book_id)
+        with database.pooled_connection() as conn:
+            conn.execute("UPDATE borrowing SET due_date = ? WHERE book_id = ?",
+                         (datetime.now() - timedelta(days=3), books[1].book_id))
+            conn.execute("INSERT INTO fines (member_id, amount, reason) VALUES (?, 2.5, 'Late')", (member.member_id,))
+            conn.execute("INSERT INTO fines (member_id, amount, reason, paid) VALUES (?, 1.0, 'Paid', 1)", (member.member_id,))
+            conn.commit()
+        
+        print("1. Member, loans and fines in one call:")
+        dashboard = MemberManager.get_member_dashboard(member.member_id)
+        assert dashboard["member"].name == "Dashboard Reader"
+        for borrow_id, book_id, title, due_date, is_overdue in dashboard["active_loans"]:
+            print(f"   ✓ {title} due {due_date[:10]}{' (overdue)' if is_overdue else ''}")
+        assert dashboard["active_loans"][0][2] == "Dashboard Book 1"
+        assert [loan[4] for loan in dashboard["active_loans"]] == [True, False, False]
+        assert [(fine[1], fine[2]) for fine in dashboard["unpaid_fines"]] == [(2.5, "Late")]
+        
+        print("\n2. Unknown member:")
+        assert MemberManager.get_member_dashboard(9999) is None
+        print("   ✓ Returns None")
+
+def test_row_models():
+    """Test slot-based models built from rows by column name"""
+    print_test_header("Row Models")
+    
+    with temporary_database():
+        book = Book("Slotted", "Author", "SLOT-1", 2001, 2, "Reference")
+        BookManager.add_book(book)
+        
+        print("1. Row factory maps columns by name:")
+        loaded = BookManager.get_book_by_id(book.book_id)
+        print(f"   ✓ {loaded} created {loaded.created_at:%Y-%m-%d}")
+        assert (loaded.title, loaded.category, loaded.available_quantity) == ("Slotted", "Reference", 2)
+        assert isinstance(loaded.created_at, datetime)
+        assert not hasattr(loaded, "__dict__")
+        
+        print("\n2. Column order and missing columns don't matter:")
+        with database.pooled_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = Book.row_factory
+            partial = cursor.execute("SELECT category, book_id, title FROM books").fetchone()
+        print(f"   ✓ {partial.book_id}: {partial.title} / {partial.category}, author={partial.author}")
+        assert (partial.book_id, partial.title, partial.author) == (book.book_id, "Slotted", None)
+        
+        print("\n3. Borrowings and fines come back as models:")
+        member = Member("Slot Reader", "slots@email.com")
+        MemberManager.add_member(member)
+        BorrowingManager.borrow_book(member.member_id, book.book_id, 7)
+        borrow = BorrowingManager.get_active_borrowings(member.member_id)[0]
+        print(f"   ✓ {borrow}, overdue: {borrow.is_overdue()}")
+        assert borrow.book_id == book.book_id and not borrow.is_overdue()
+        from_dict = Fine.from_row({"fine_id": 1, "member_id": member.member_id, "amount": 2.0, "paid": 0})
+        print(f"   ✓ {from_dict}")
+        assert from_dict.paid is False and from_dict.reason is None
+        
+        print("\n4. Copies keep converted values:")
+        accrued = Fine.from_row({"fine_id": 2, "member_id": member.member_id, "amount": 3.0, "paid": 0,
+                                 "created_date": "2026-01-01 09:00:00", "accrued_date": "2026-01-02"})
+        clone = accrued.copy()
+        print(f"   ✓ {clone}, accrued {clone.accrued_date}")
+        assert clone is not accrued and clone.to_dict() == accrued.to_dict()
+        assert clone.accrued_date == date(2026, 1, 2) and clone.created_date == datetime(2026, 1, 1, 9)
+        rebuilt = Fine.from_row(accrued.to_dict())
+        assert rebuilt.to_dict() == accrued.to_dict()
+
+def test_lookup_cache():
+    """Test the read-through ID lookup caches and their invalidation"""
+    print_test_header("Lookup Cache")
+    
+    with temporary_database() as path:
+        book = Book("Cached", "Author", "CACHE-1", 2010, 2)
+        BookManager.add_book(book)
+        member = Member("Cached Reader", "cached@email.com")
+        MemberManager.add_member(member)
+        book_cache.reset_stats()
+        
+        print("1. Repeat lookups are served from the cache:")
+        first = BookManager.get_book_by_id(book.book_id)
+        first.title = "Edited but not saved"
+        again = BookManager.get_book_by_id(book.book_id)
+        print(f"   ✓ {again.title}: {book_cache.status()}")
+        assert again.title == "Cached"
+        assert (book_cache.stats["hits"], book_cache.stats["misses"]) == (1, 1)
+        
+        print("\n2. Writers invalidate what they change:")
+        BorrowingManager.borrow_book(member.member_id, book.book_id)
+        assert BookManager.get_book_by_id(book.book_id).available_quantity == 1
+        again.title = "Renamed"
+        BookManager.update_book(again)
+        assert BookManager.get_book_by_id(book.book_id).title == "Renamed"
+        borrow = BorrowingManager.get_active_borrowings(member.member_id)[0]
+        with database.pooled_connection() as conn:
+            conn.execute("UPDATE borrowing SET due_date = ?", (datetime.now() - timedelta(days=2, hours=1),))
+            conn.commit()
+        assert MemberManager.get_member_by_id(member.member_id).outstanding_fine == 0.0
+        BorrowingManager.return_book(borrow.borrow_id)
+        fined = MemberManager.get_member_by_id(member.member_id)
+        print(f"   ✓ After return: {BookManager.get_book_by_id(book.book_id)}, {fined}")
+        assert fined.outstanding_fine == 2.0
+        assert BookManager.get_book_by_id(book.book_id).available_quantity == 2
+        FineManager.pay_fine(FineManager.get_member_fines(member.member_id)[0].fine_id)
+        assert MemberManager.get_member_by_id(member.member_id).outstanding_fine == 0.0
+        BookManager.delete_book(book.book_id)
+        assert BookManager.get_book_by_id(book.book_id) is None
+        
+        print("\n3. Least recently used entries are evicted:")
+        cache = LRUCache(max_size=2)
+        for key in (1, 2, 1, 3):
+            cache.put(key, str(key), cache.token())
+        print(f"   ✓ {cache.status()}")
+        assert cache.get(2) is None and cache.get(1) == "1" and cache.stats["evictions"] == 1
+        
+        print("\n4. A value read before an invalidation is not cached:")
+        token = cache.token()
+        cache.invalidate(4)
+        cache.put(4, "stale", token)
+        assert cache.get(4) is None
+        print("   ✓ Stale put ignored")
+        
+        print("\n5. Writes from other processes show up once entries expire:")
+        original_ttl = member_cache.ttl
+        member_cache.ttl = 0.05
+        member_cache.clear()
+        member_cache.reset_stats()
+        try:
+            assert MemberManager.get_member_by_id(member.member_id).outstanding_fine == 0.0
+            outside = sqlite3.connect(path)
+            outside.execute("UPDATE members SET outstanding_fine = 7.5 WHERE member_id = ?", (member.member_id,))
+            outside.commit()
+            outside.close()
+            assert MemberManager.get_member_by_id(member.member_id).outstanding_fine == 0.0
+            time.sleep(0.06)
+            refreshed = MemberManager.get_member_by_id(member.member_id)
+            print(f"   ✓ {refreshed.outstanding_fine} after {member_cache.ttl}s, {member_cache.stats['expirations']} expired")
+            assert refreshed.outstanding_fine == 7.5 and member_cache.stats["expirations"] == 1
+        finally:
+            member_cache.ttl = original_ttl
+
+def test_fine_accrual():
+    """Test the set-based overdue fine accrual job"""
+    print_test_header("Overdue Fine Accrual")
+    
+    with temporary_database():
+        members = [Member(f"Late Reader {i}", f"late{i}@email.com") for i in range(2)]
+        for member in members:
+            MemberManager.add_member(member)
+        books = [Book(f"Late Book {i}", "Author", f"LATE-{i}", 2000, 1) for i in range(3)]
+        for book in books:
+            BookManager.add_book(book)
+        BorrowingManager.borrow_books(members[0].member_id, [books[0].book_id, books[1].book_id])
+        BorrowingManager.borrow_book(members[1].member_id, books[2].book_id)
+        today = datetime.now().date()
+        with database.pooled_connection() as conn:
+            # Three and five whole days overdue as of midnight, plus one loan not yet due
+            conn.execute("UPDATE borrowing SET due_date = ? WHERE book_id = ?",
+                         (datetime.combine(today, datetime.min.time()) - timedelta(days=3, hours=6), books[0].book_id))
+            conn.execute("UPDATE borrowing SET due_date = ? WHERE book_id = ?",
+                         (datetime.combine(today, datetime.min.time()) - timedelta(days=5), books[1].book_id))
+            conn.commit()
+        
+        print("1. First run charges every overdue loan:")
+        summary = FineManager.accrue_overdue_fines(today)
+        print(f"   ✓ {summary}")
+        assert (summary["overdue_loans"], summary["created"], summary["amount_added"]) == (2, 2, 8.0)
+        assert MemberManager.get_member_by_id(members[0].member_id).outstanding_fine == 8.0
+        assert MemberManager.get_member_by_id(members[1].member_id).outstanding_fine == 0.0
+        
+        print("\n2. Rerunning the same day changes nothing:")
+        summary = FineManager.accrue_overdue_fines(today)
+        print(f"   ✓ {summary}")
+        assert (summary["created"], summary["updated"], summary["amount_added"]) == (0, 0, 0.0)
+        assert MemberManager.get_member_by_id(members[0].member_id).outstanding_fine == 8.0
+        
+        print("\n3. The next day adds one more day per loan:")
+        summary = FineManager.accrue_overdue_fines(today + timedelta(days=1))
+        print(f"   ✓ {summary}")
+        assert (summary["updated"], summary["amount_added"]) == (2, 2.0)
+        assert len(FineManager.get_member_fines(members[0].member_id)) == 2
+        
+        print("\n4. Returning settles the accrued fine instead of charging again:")
+        borrow = next(b for b in BorrowingManager.get_active_borrowings(members[0].member_id) if b.book_id == books[1].book_id)
+        success, message = BorrowingManager.return_book(borrow.borrow_id)
+        fines = FineManager.get_member_fines(members[0].member_id)
+        balance = MemberManager.get_member_by_id(members[0].member_id).outstanding_fine
+        print(f"   ✓ {message}; balance ${balance:.2f}, {len(fines)} fine(s)")
+        assert len(fines) == 2 and balance == 10.0
+        assert sorted(f.amount for f in fines) == [4.0, 6.0]
+        assert [f.accrued_date for f in fines if f.borrow_id == borrow.borrow_id] == [None]
+
+def test_stats_counters():
+    """Test that trigger-maintained counters track every write path"""
+    print_test_header("Statistics Counters")
+    
+    with temporary_database():
+        members = [Member(f"Counter Reader {i}", f"counter{i}@email.com") for i in range(3)]
+        for member in members:
+            MemberManager.add_member(member)
+        books = [Book(f"Counter Book {i}", "Author", f"COUNT-{i}", 2000, 2, ["Poetry", "Drama", None][i % 3])
+                 for i in range(6)]
+        BookManager.add_books_bulk(books)
+        
+        print("1. Circulation, fines and edits keep the counters exact:")
+        BorrowingManager.borrow_books(members[0].member_id, [1, 1, 2, 3])
+        BorrowingManager.borrow_book(members[1].member_id, 4)
+        with database.pooled_connection() as conn:
+            conn.execute("UPDATE borrowing SET due_date = ? WHERE book_id IN (1, 4)", (datetime.now() - timedelta(days=3),))
+            conn.execute("UPDATE borrowing SET due_date = ? WHERE book_id = 2", (datetime.now() - timedelta(minutes=5),))
+            conn.commit()
+        FineManager.accrue_overdue_fines()
+        loans = BorrowingManager.get_active_borrowings(members[0].member_id)
+        BorrowingManager.return_books([loan.borrow_id for loan in loans[:2]])
+        FineManager.pay_fine(FineManager.get_member_fines(members[0].member_id)[0].fine_id)
+        renamed = BookManager.get_book_by_id(5)
+        renamed.category = "Poetry"
+        BookManager.update_book(renamed)
+        BookManager.delete_book(6)
+        members[2].membership_status = "suspended"
+        MemberManager.update_member(members[2])
+        MemberManager.delete_member(members[1].member_id)
+        
+        mismatches = ReportManager.check_stats()
+        stats = ReportManager.get_dashboard_stats()
+        print(f"   ✓ {stats}")
+        print(f"   ✓ Consistency check: {mismatches}")
+        assert mismatches == []
+        assert (stats["total_books"], stats["total_members"], stats["active_members"]) == (5, 2, 1)
+        assert (stats["active_borrowings"], stats["overdue_books"]) == (3, 2)
+        assert stats["top_categories"][0] == ("Poetry", 3)
+        assert FineManager.get_unpaid_fines_summary()[0] == len([f for m in members for f in FineManager.get_member_fines(m.member_id) if not f.paid])
+        
+        print("\n2. Drift is reported and repaired by a rebuild:")
+        with database.pooled_connection() as conn:
+            conn.execute("UPDATE stats_counters SET value = value + 7 WHERE name = 'total_books'")
+            conn.commit()
+        mismatches = ReportManager.check_stats()
+        print(f"   ✓ Found: {mismatches}")
+        assert mismatches == [("total_books", 12.0, 5)]
+        assert ReportManager.rebuild_stats() and ReportManager.check_stats() == []
+        print("   ✓ Rebuilt")
+
+def test_async_managers():
+    """Test the asyncio facade: concurrent awaits and cancellation"""
+    print_test_header("Async Managers")
+    
+    async def scenario():
+        member = Member("Async Reader", "async@email.com")
+        await AsyncMemberManager.add_member(member)
+        book = Book("Awaited", "Author", "ASYNC-1", 2020, 5)
+        await AsyncBookManager.add_book(book)
+        
+        print("1. Twenty concurrent checkouts of five copies:")
+        results = await asyncio.gather(*(AsyncBorrowingManager.borrow_book(member.member_id, book.book_id)
+                                         for _ in range(20)))
+        successes = sum(1 for success, _ in results if success)
+        print(f"   ✓ {successes} succeeded, {len(results) - successes} refused")
+        assert successes == 5
+        assert (await AsyncBookManager.get_book_by_id(book.book_id)).available_quantity == 0
+        
+        print("\n2. A cancelled call that hasn't started never runs:")
+        release = threading.Event()
+        busy = [run_in_db_thread(release.wait) for _ in range(database.POOL_MAX_SIZE)]
+        delete = asyncio.ensure_future(AsyncBookManager.delete_book(book.book_id))
+        await asyncio.sleep(0.05)
+        delete.cancel()
+        try:
+            await delete
+        except asyncio.CancelledError:
+            print("   ✓ Await raised CancelledError")
+        release.set()
+        await asyncio.gather(*busy)
+        assert delete.cancelled()
+        assert await AsyncBookManager.get_book_by_id(book.book_id) is not None
+        
+        print("\n3. Async iteration streams in chunks:")
+        ids = [b.book_id async for b in AsyncBookManager.iter_books(chunk_size=1)]
+        print(f"   ✓ Streamed book IDs {ids}")
+        assert ids == [book.book_id]
+    
+    with temporary_database():
+        asyncio.run(scenario())
+
+def test_http_service():
+    """Test the HTTP/JSON service over one keep-alive connection"""
+    print_test_header("HTTP Service")
+    
+    with temporary_database():
+        member = Member("Web Reader", "web@email.com")
+        MemberManager.add_member(member)
+        book = Book("Served Hot", "Author", "HTTP-1", 2020, 2)
+        BookManager.add_book(book)
+        
+        server = make_server(port=0, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        client = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        
+        def call(method, path, body=None):
+            client.request(method, path, body=json.dumps(body) if body is not None else None,
+                           headers={"Content-Type": "application/json"})
+            response = client.getresponse()
+            return response.status, json.loads(response.read()), response
+        
+        try:
+            print("1. Book lookup and search:")
+            status, payload, response = call("GET", f"/books/{book.book_id}")
+            print(f"   ✓ {status} {payload['title']} in {response.getheader('X-Response-Time-Ms')}ms")
+            assert status == 200 and payload["title"] == "Served Hot"
+            assert response.getheader("Server-Timing").startswith("app;dur=")
+            status, payload, _ = call("GET", "/books?q=served")
+            assert [item["book_id"] for item in payload["items"]] == [book.book_id]
+            
+            print("\n2. Checkout and return on the same connection:")
+            status, payload, _ = call("POST", "/borrowings", {"member_id": member.member_id, "book_id": book.book_id})
+            print(f"   ✓ {status} {payload['results'][0]['message']}")
+            assert payload["results"][0]["success"]
+            status, payload, _ = call("GET", f"/members/{member.member_id}")
+            assert len(payload["active_loans"]) == 1
+            borrow_id = payload["active_loans"][0]["borrow_id"]
+            status, payload, _ = call("POST", "/returns", {"borrow_ids": [borrow_id]})
+            print(f"   ✓ {status} {payload['results'][0]['message']}")
+            assert payload["results"][0]["success"]
+            
+            print("\n3. Paging and errors:")
+            status, payload, _ = call("GET", "/members?limit=1")
+            assert status == 200 and payload["next_after_id"] == member.member_id
+            status, payload, _ = call("GET", f"/members?limit=1&after_id={member.member_id}")
+            assert payload == {"items": [], "next_after_id": None}
+            for method, path, expected in [("GET", "/books/999999", 404), ("GET", "/nowhere", 404),
+                                           ("POST", "/stats", 405), ("GET", "/members?limit=x", 400)]:
+                status, payload, _ = call(method, path)
+                print(f"   ✓ {method} {path}: {status} {payload['error']}")
+                assert status == expected
+            for body in [{"member_id": True, "book_ids": [book.book_id]},
+                         {"member_id": member.member_id, "book_ids": [True]},
+                         {"member_id": member.member_id, "book_id": book.book_id, "days": True}]:
+                status, payload, _ = call("POST", "/borrowings", body)
+                print(f"   ✓ POST /borrowings {body}: {status} {payload['error']}")
+                assert status == 400
+            for length in ["abc", "-5"]:
+                raw = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+                raw.putrequest("POST", "/returns")
+                raw.putheader("Content-Length", length)
+                raw.endheaders()
+                response = raw.getresponse()
+                payload = json.loads(response.read())
+                raw.close()
+                print(f"   ✓ Content-Length {length}: {response.status} {payload['error']}")
+                assert response.status == 400
+            
+            print("\n4. A fine is only paid once, however often it is posted:")
+            with database.pooled_connection() as conn:
+                fine_ids = [conn.execute("INSERT INTO fines (member_id, amount, reason) VALUES (?, 3.0, 'Late')",
+                                         (member.member_id,)).lastrowid for _ in range(2)]
+                conn.execute("UPDATE members SET outstanding_fine = 6.0 WHERE member_id = ?", (member.member_id,))
+                conn.commit()
+            member_cache.invalidate(member.member_id)
+            statuses = [call("POST", f"/fines/{fine_ids[0]}/pay")[0] for _ in range(2)]
+            print(f"   ✓ Payment and retry: {statuses}")
+            assert statuses == [200, 409]
+            results = []
+            payers = [threading.Thread(target=lambda: results.append(FineManager.pay_fine(fine_ids[1])[0]))
+                      for _ in range(4)]
+            for payer in payers:
+                payer.start()
+            for payer in payers:
+                payer.join()
+            balance = MemberManager.get_member_by_id(member.member_id).outstanding_fine
+            print(f"   ✓ 4 concurrent payments: {sorted(results)}, balance ${balance:.2f}")
+            assert sorted(results) == [False, False, False, True] and balance == 0
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+
+def test_synthetic_data():
+    """Test the seeded synthetic library generator"""
+    print_test_header("Synthetic Data")
+    
+    def load(seed):
+        with temporary_database():
+            report = generate_library(books=300, members=100, loans=5000, seed=seed, progress=lambda message: None)
+            with database.pooled_connection() as conn:
+                rows = conn.execute("""
+                    SELECT b.member_id, b.book_id, b.status, b.fine_amount, k.isbn, m.email
+                    FROM borrowing b JOIN books k USING (book_id) JOIN members m USING (member_id)
+                    ORDER BY b.borrow_id
+                """).fetchall()
+                triggers = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0]
+            mismatches = ReportManager.check_stats()
+            stats = ReportManager.get_dashboard_stats()
+            BookManager.add_book(Book("Freshly Shelved", "Author", "SYN-1", 2024, 1))
+            found = [book.title for book in BookManager.search_books("freshly")]
+        return report, rows, triggers, mismatches, stats, found
+    
+    report, rows, triggers, mismatches, stats, found = load(7)
+    print(f"1. Loaded {report['books']} books, {report['members']} members, {report['loans']} loans, "
+          f"{report['fines']} fines in {report['elapsed']:.2f}s")
+    assert (report["books"], report["members"], report["loans"]) == (300, 100, 5000)
+    assert report["fines"] > 0 and report["overdue_loans"] > 0
+    
+    print("\n2. Counters, triggers and search index survive the deferred load:")
+    print(f"   ✓ {triggers} triggers, counter mismatches: {mismatches}, search finds {found}")
+    assert mismatches == [] and found == ["Freshly Shelved"]
+    assert stats["active_borrowings"] == report["open_loans"]
+    assert stats["overdue_books"] == report["overdue_loans"]
+    
+    print("\n3. Same seed, same library; another seed, another one:")
+    assert load(7)[1] == rows
+    assert load(8)[1] != rows
+    print("   ✓ Deterministic")
+    
+    print("\n4. Popular titles and heavy borrowers dominate:")
+    books = sorted((sum(1 for row in rows if row[1] == book_id) for book_id in range(1, 301)), reverse=True)
+    members = sorted((sum(1 for row in rows if row[0] == member_id) for member_id in range(1, 101)), reverse=True)
+    print(f"   ✓ Top 10% of titles: {sum(books[:30]) / len(rows):.0%} of loans, "
+          f"top 20% of members: {sum(members[:20]) / len(rows):.0%}")
+    assert sum(books[:30]) > 0.25 * len(rows) and sum(members[:20]) > 0.4 * len(rows)
+    
+    print("\n5. A load that breaks one index still gets every other object back:")
+    with temporary_database(), database.pooled_connection() as conn:
+        before = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type IN ('trigger', 'index') AND sql IS NOT NULL").fetchone()[0]
+        try:
+            with database.deferred_maintenance(conn, triggers=("books",), indexes=("books",)):
+                conn.executemany("INSERT INTO books (title, author, isbn, isbn_normalized) VALUES (?, ?, ?, ?)",
+                                 [("Twin A", "Author", "DUP-1", "DUP"), ("Twin B", "Author", "DUP-2", "DUP")])
+                conn.commit()
+            error = None
+        except sqlite3.DatabaseError as e:
+            error = str(e)
+        kept = [row[0] for row in conn.execute("SELECT name FROM deferred_objects")]
+        after = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type IN ('trigger', 'index') AND sql IS NOT NULL").fetchone()[0]
+        print(f"   ✓ {after} of {before} objects back, kept for later: {kept}")
+        assert error and "idx_books_isbn_normalized" in error
+        assert kept == ["idx_books_isbn_normalized"] and after == before - 1
+        conn.execute("UPDATE books SET isbn_normalized = 'DUP2' WHERE title = 'Twin B'")
+        conn.commit()
+        assert database.restore_deferred_objects(conn) == []
+        after = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type IN ('trigger', 'index') AND sql IS NOT NULL").fetchone()[0]
+        assert after == before and conn.execute("SELECT COUNT(*) FROM deferred_objects").fetchone()[0] == 0
+    print("   ✓ Restored once the data was fixed")
+
+def test_benchmark_suite():
+    """Test the scaling benchmark suite's coverage, timing and regression check"""
+    print_test_header("Benchmark Suite")
+    
+    print("1. Every public manager method has a workload:")
+    missing = benchmark_suite.uncovered_operations()
+    print(f"   ✓ {len(benchmark_suite.WORKLOADS)} workloads, uncovered: {missing}")
+    assert missing == []
+    
+    print("\n2. Timing one workload on a small library:")
+    with temporary_database():
+        report = generate_library(books=50, members=20, loans=200, progress=lambda message: None)
+        fixture = benchmark_suite.Fixture(50, report)
+        result = benchmark_suite.time_operation(lambda fx: BookManager.get_book_by_id(fx.book_id()), fixture)
+        print(f"   ✓ {result['calls']} calls, p50 {result['p50_ms']:.3f} ms, {result['ops_per_sec']:,.0f} ops/sec")
+        assert result["calls"] >= benchmark_suite.MIN_CALLS
+        assert result["p50_ms"] <= result["p90_ms"] <= result["p99_ms"] <= result["max_ms"]
+        fixture.unpaid_fines = []
+        pay_fine = dict(benchmark_suite.WORKLOADS)["FineManager.pay_fine"]
+        assert benchmark_suite.time_operation(pay_fine, fixture) is None
+    
+    print("\n3. Regressions are flagged against the baseline, noise is not:")
+    def run(search_ms, lookup_ms):
+        return {"results": {"1000": {"operations": {"search": {"p50_ms": search_ms}, "lookup": {"p50_ms": lookup_ms}}}}}
+    regressions = benchmark_suite.compare(run(3.0, 0.04), run(1.0, 0.01))
+    print(f"   ✓ {regressions}")
+    assert regressions == [("1000", "search", 1.0, 3.0)]
+    exponents = benchmark_suite.scaling_exponents({"10": {"operations": {"scan": {"p50_ms": 1.0}}},
+                                                   "1000": {"operations": {"scan": {"p50_ms": 100.0}}}})
+    assert abs(exponents["scan"] - 1.0) < 1e-9
+
+def test_query_instrumentation():
+    """Test per-statement timing, manager tags and the slow-query log"""
+    print_test_header("Query Instrumentation")
+    
+    with temporary_database(), tempfile.TemporaryDirectory() as tmp:
+        member = Member("Timed Reader", "timed@email.com")
+        MemberManager.add_member(member)
+        for i in range(3):
+            BookManager.add_book(Book(f"Stopwatch {i}", "Author", f"TIMED-{i}", 2020, 1))
+        log_path = os.path.join(tmp, "slow.log")
+        book_cache.clear()
+        
+        instrumentation.reset()
+        instrumentation.enable(slow_ms=0, log_path=log_path)
+        try:
+            BookManager.get_book_by_id(1)
+            assert len(BookManager.search_books("stopwatch")) == 3
+            assert len(list(BookManager.iter_books(batch_size=2))) == 3
+            BorrowingManager.borrow_book(member.member_id, 1)
+            borrow_id = BorrowingManager.get_active_borrowings(member.member_id)[0].borrow_id
+            BorrowingManager.return_book(borrow_id)
+        finally:
+            instrumentation.disable()
+        BookManager.get_book_by_id(2)
+        
+        print("1. Statements are tagged with the outermost manager method:")
+        methods = {row["tag"]: row for row in instrumentation.report()}
+        for tag in ("BookManager.get_book_by_id", "BookManager.search_books", "BookManager.iter_books",
+                    "BorrowingManager.borrow_book", "BorrowingManager.return_book"):
+            print(f"   ✓ {tag}: {methods[tag]['calls']} statements, {methods[tag]['rows']} rows")
+        assert "BorrowingManager.return_books" not in methods
+        assert methods["BookManager.iter_books"]["rows"] >= 3
+        
+        print("\n2. Row counts per statement and nothing recorded once disabled:")
+        statements = instrumentation.statement_stats()
+        by_id = [row for row in statements if row["tag"] == "BookManager.get_book_by_id"
+                 and row["sql"].startswith("SELECT * FROM books")]
+        print(f"   ✓ {by_id[0]['sql']}: {by_id[0]['calls']} call(s), {by_id[0]['rows']} row(s)")
+        assert by_id[0]["calls"] == 1 and by_id[0]["rows"] == 1
+        
+        print("\n3. Slow-query log carries the query plan:")
+        slow = [entry for entry in instrumentation.slow_queries() if entry["tag"] == "BookManager.get_book_by_id"
+                and entry["sql"].startswith("SELECT * FROM books")]
+        print(f"   ✓ {slow[0]['plan']}")
+        assert any("books" in line for line in slow[0]["plan"])
+        with open(log_path) as log:
+            assert "BookManager.get_book_by_id" in log.read()
+        instrumentation.reset()
+
+def test_metrics():
+    """Test the circulation metrics, their exposition format and the /metrics endpoint"""
+    print_test_header("Metrics")
+    
+    def count(operation, result="success"):
+        return metrics.OPERATIONS.labels(operation, result).value()
+    
+    with temporary_database():
+        member = Member("Counted Reader", "counted@email.com")
+        MemberManager.add_member(member)
+        BookManager.add_book(Book("Metered", "Author", "METRIC-1", 2020, 1))
+        before = {name: count(name) for name in ("checkout", "return", "search", "fine_payment")}
+        failed_before = count("checkout", "failure")
+        searches_timed = metrics.OPERATION_SECONDS.labels("search").snapshot()[1]
+        
+        print("1. Manager calls update the counters and histograms:")
+        BookManager.search_books("metered")
+        results = BorrowingManager.borrow_books(member.member_id, [1, 1])
+        borrow_id = BorrowingManager.get_active_borrowings(member.member_id)[0].borrow_id
+        BorrowingManager.return_book(borrow_id)
+        FineManager.pay_fine(999999)
+        assert [success for _, success, _ in results] == [True, False]
+        assert count("checkout") == before["checkout"] + 1
+        assert count("checkout", "failure") == failed_before + 1
+        assert count("return") == before["return"] + 1
+        assert count("search") == before["search"] + 1
+        assert count("fine_payment") == before["fine_payment"]
+        assert metrics.OPERATION_SECONDS.labels("search").snapshot()[1] == searches_timed + 1
+        print(f"   ✓ checkouts: {count('checkout'):.0f} ok / {count('checkout', 'failure'):.0f} failed, "
+              f"returns: {count('return'):.0f}, searches: {count('search'):.0f}")
+        
+        print("\n2. Gauges and text exposition:")
+        BorrowingManager.borrow_book(member.member_id, 1)
+        text = metrics.REGISTRY.render()
+        assert "# TYPE library_operation_duration_seconds histogram" in text
+        assert 'library_operation_duration_seconds_bucket{operation="search",le="+Inf"}' in text
+        assert "library_active_loans 1\n" in text and "library_overdue_loans 0\n" in text
+        print("   ✓ library_active_loans 1")
+        
+        print("\n3. Updates from many threads add up:")
+        registry = metrics.Registry()
+        counter = metrics.Counter("test_updates_total", "Test updates", registry=registry)
+        histogram = metrics.Histogram("test_seconds", "Test latency", buckets=(0.1, 1), registry=registry)
+        
+        def work():
+            for i in range(1000):
+                counter.inc()
+                histogram.observe(0.5)
+        workers = [threading.Thread(target=work) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert counter.value() == 4000
+        assert histogram.labels().snapshot() == ([0, 4000, 4000], 4000, 2000.0)
+        assert 'test_seconds_bucket{le="1"} 4000' in registry.render()
+        print(f"   ✓ 4 threads x 1000 updates = {counter.value():.0f}")
+        try:
+            metrics.Metric("test_base", "No child type", registry=registry)
+            assert False, "Metric is abstract"
+        except TypeError:
+            pass
+        
+        print("\n4. GET /metrics:")
+        server = make_server(port=0, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        try:
+            client.request("GET", "/metrics")
+            response = client.getresponse()
+            body = response.read().decode()
+            print(f"   ✓ {response.status} {response.getheader('Content-Type')}")
+            assert response.status == 200 and response.getheader("Content-Type") == metrics.CONTENT_TYPE
+            assert "library_outstanding_fines" in body
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+        
+        print("\n5. Paying the same fine twice counts one payment:")
+        with database.pooled_connection() as conn:
+            fine_id = conn.execute("INSERT INTO fines (member_id, amount, reason) VALUES (?, 2.0, 'Late')",
+                                   (member.member_id,)).lastrowid
+            conn.commit()
+        paid_before, repeats_before = count("fine_payment"), count("fine_payment", "failure")
+        assert [FineManager.pay_fine(fine_id)[0] for _ in range(2)] == [True, False]
+        assert count("fine_payment") == paid_before + 1
+        assert count("fine_payment", "failure") == repeats_before + 1
+        print(f"   ✓ fine payments: {count('fine_payment'):.0f} ok / {count('fine_payment', 'failure'):.0f} failed")
+
+def test_branches():
+    """Test per-branch shards, branch routing and cross-branch queries"""
+    print_test_header("Branches")
+    
+    with temporary_database():
+        print("1. Each branch gets its own shard:")
+        for branch_id, days in (("north", -3), ("south", -5)):
+            success, message = BranchManager.create_branch(branch_id)
+            assert success, message
+            with use_branch(branch_id):
+                MemberManager.add_member(Member(f"{branch_id.title()} Reader", "reader@email.com"))
+                # Same ISBN and email in both branches: the shards don't share constraints
+                BookManager.add_book(Book(f"Dune ({branch_id})", "Herbert", "DUNE-1", 1965, 2, "SF"))
+                BookManager.add_book(Book(f"Dune Messiah ({branch_id})", "Herbert", "DUNE-2", 1969, 1, "SF"))
+                assert BookManager.get_book_by_id(1).title == f"Dune ({branch_id})"
+                assert BorrowingManager.borrow_book(1, 1, days)[0]
+        assert BranchManager.get_branches() == ["north", "south"]
+        assert BookManager.get_book_by_id(1) is None
+        with use_branch("north"):
+            # Cached per branch: book 1 is still north's own
+            assert BookManager.get_book_by_id(1).title == "Dune (north)"
+        print(f"   ✓ {BranchManager.get_branches()}, main database untouched")
+        
+        print("\n2. Cross-branch search, statistics and overdue report:")
+        matches = BranchManager.search_catalog("dune", limit=3)
+        print(f"   ✓ search: {[(branch_id, book.title) for branch_id, book in matches]}")
+        assert [(branch_id, book.book_id) for branch_id, book in matches] == [("north", 1), ("south", 1), ("north", 2)]
+        stats = BranchManager.get_dashboard_stats()
+        print(f"   ✓ stats: {stats['total_books']} books, {stats['active_borrowings']} loans, "
+              f"{stats['overdue_books']} overdue")
+        assert stats["total_books"] == 4 and stats["active_borrowings"] == 2 and stats["overdue_books"] == 2
+        assert stats["top_categories"] == [("SF", 4)]
+        assert stats["branches"]["north"]["total_books"] == 2
+        overdue = BranchManager.get_overdue_books()
+        assert [(branch_id, name) for branch_id, _, name in overdue] == [("south", "South Reader"), ("north", "North Reader")]
+        print(f"   ✓ overdue: {[(branch_id, name) for branch_id, _, name in overdue]}")
+        
+        print("\n3. Routing through the async facade and the HTTP service:")
+        
+        async def on_branch():
+            with use_branch("south"):
+                return await AsyncBookManager.get_book_by_id(2)
+        assert asyncio.run(on_branch()).title == "Dune Messiah (south)"
+        server = make_server(port=0, quiet=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+        
+        def get(path, branch_id=None):
+            client.request("GET", path, headers={"X-Branch": branch_id} if branch_id else {})
+            response = client.getresponse()
+            return response.status, json.loads(response.read())
+        
+        try:
+            status, payload = get("/books/1", "north")
+            assert status == 200 and payload["title"] == "Dune (north)"
+            assert get("/books/1?branch=south")[1]["title"] == "Dune (south)"
+            assert get("/books/1", "east")[0] == 404 and get("/books/1", "../etc")[0] == 400
+            status, payload = get("/branches/stats")
+            assert status == 200 and payload["total_books"] == 4
+            assert len(get("/branches/search?q=messiah")[1]["items"]) == 2
+            print(f"   ✓ X-Branch: north -> {payload['branches']['north']['total_books']} books, unknown branch -> 404")
+        finally:
+            client.close()
+            server.shutdown()
+            server.server_close()
+        
+        try:
+            with use_branch("no/such"):
+                assert False, "invalid branch ID accepted"
+        except ValueError as e:
+            print(f"   ✓ {e}")
+
+def test_parallel_reports():
+    """Test partitioned circulation reports against direct queries"""
+    print_test_header("Parallel Reports")
+    
+    with temporary_database():
+        generate_library(books=300, members=100, loans=5000, seed=5, history_days=400, progress=lambda message: None)
+        start, end = date.today() - timedelta(days=200), date.today() - timedelta(days=20)
+        with database.pooled_connection() as conn:
+            loans, late = conn.execute("""
+                SELECT COUNT(*), COUNT(*) FILTER (WHERE return_date > due_date) FROM borrowing
+                WHERE borrow_date >= ? AND borrow_date < ?
+            """, (str(start), str(end))).fetchone()
+            fines, charged = conn.execute("SELECT COUNT(*), SUM(amount) FROM fines WHERE created_date >= ? AND created_date < ?",
+                                          (str(start), str(end))).fetchone()
+            branch = sqlite3.connect(database.branch_database_file("east"))
+            conn.backup(branch)
+            branch.close()
+        
+        print("1. Serial report matches direct queries:")
+        serial = circulation_report(start, end, workers=1)
+        print(f"   ✓ {serial['loans']['loans']:,} loans, {serial['loans']['late']:,} late, "
+              f"{serial['fines']['fines']:,} fines (${serial['fines']['charged']:,.2f}) in {serial['partitions']} partitions")
+        assert (serial["loans"]["loans"], serial["loans"]["late"]) == (loans, late)
+        assert serial["fines"]["fines"] == fines and abs(serial["fines"]["charged"] - charged) < 1e-6
+        assert sum(month["loans"] for month in serial["by_month"].values()) == loans
+        assert sum(serial["by_category"].values()) == loans
+        
+        print("\n2. Worker processes and date-bisected partitions agree:")
+        for partition in ("rowid", "date"):
+            report = circulation_report(start, end, workers=2, partition=partition)
+            # Float sums depend on the order partials are added in
+            average = report["loans"].pop("average_loan_days")
+            expected = dict(serial["loans"])
+            assert abs(average - expected.pop("average_loan_days")) < 1e-9
+            assert report["loans"] == expected
+            assert report["fines"] == serial["fines"] and report["by_month"] == serial["by_month"]
+            print(f"   ✓ {partition}: {report['partitions']} partitions on {report['workers']} workers")
+        
+        print("\n3. Branch shards:")
+        report = circulation_report(start, end, workers=2, branch_ids=["east"])
+        assert report["by_branch"] == {"east": loans}
+        print(f"   ✓ east: {report['by_branch']['east']:,} loans")
+
+def test_export():
+    """Test streaming full and incremental exports"""
+    print_test_header("Export")
+    
+    with temporary_database(), tempfile.TemporaryDirectory() as tmp:
+        generate_library(books=200, members=50, loans=1000, seed=6, history_days=100, progress=lambda message: None)
+        with database.pooled_connection() as conn:
+            counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("books", "members", "borrowing", "fines")}
+        watermark = os.path.join(tmp, "watermark.json")
+        
+        print("1. Full CSV export, in small batches:")
+        summary = export_tables(os.path.join(tmp, "full"), batch_size=7, watermark_file=watermark)
+        for table, result in summary["tables"].items():
+            with open(result["path"], newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            print(f"   ✓ {table}: {result['rows']:,} rows, {result['rows_per_sec']:,.0f} rows/sec")
+            assert result["rows"] == len(rows) == counts[table]
+        assert not summary["incremental"] and os.path.exists(watermark)
+        
+        print("\n2. Gzipped JSONL matches:")
+        summary = export_tables(os.path.join(tmp, "json"), tables=["members"], fmt="jsonl", compress=True)
+        with gzip.open(summary["tables"]["members"]["path"], "rt", encoding="utf-8") as f:
+            members = [json.loads(line) for line in f]
+        assert len(members) == counts["members"] and members[0]["member_id"] == 1
+        print(f"   ✓ {len(members)} members, first: {members[0]['name']}")
+        
+        print("\n3. Incremental export has only new and updated rows:")
+        with database.pooled_connection() as conn:
+            member_id, book_id = conn.execute("""
+                SELECT m.member_id, b.book_id FROM members m, books b
+                WHERE m.membership_status = 'active' AND b.available_quantity > 0 LIMIT 1
+            """).fetchone()
+            fine_id, fined_member = conn.execute("SELECT fine_id, member_id FROM fines WHERE paid = 0 LIMIT 1").fetchone()
+        success, _ = BorrowingManager.borrow_book(member_id, book_id)
+        assert success
+        success, _ = FineManager.pay_fine(fine_id)
+        assert success
+        summary = export_tables(os.path.join(tmp, "delta"), watermark_file=watermark)
+        changed = {}
+        for table, result in summary["tables"].items():
+            with open(result["path"], newline="", encoding="utf-8") as f:
+                changed[table] = {int(row[database.CHANGE_TRACKED[table]]) for row in csv.DictReader(f)}
+            print(f"   ✓ {table}: {sorted(changed[table])}")
+        assert summary["incremental"]
+        assert changed["books"] == {book_id}
+        assert changed["members"] == {fined_member}
+        assert changed["fines"] == {fine_id}
+        assert changed["borrowing"] == {counts["borrowing"] + 1}
+        
+        print("\n4. Next run re-sends only updates inside the overlap window:")
+        summary = export_tables(os.path.join(tmp, "again"), watermark_file=watermark)
+        rows = {table: result["rows"] for table, result in summary["tables"].items()}
+        print(f"   ✓ {rows}")
+        assert rows == {"books": 1, "members": 1, "borrowing": 0, "fines": 1}
+
 def run_all_tests():
     """Run all tests"""
     print("\n" + "="*60)
@@ -163,6 +1403,7 @@ def run_all_tests():
     
     # Initialize database
     print("\nInitializing database...")
+    close_pool()
     if os.path.exists(DATABASE_FILE):
         os.remove(DATABASE_FILE)
     init_database()
@@ -175,6 +1416,31 @@ def run_all_tests():
         test_borrowing_operations(member_id_1, book_id_1)
         test_overdue_scenario(member_id_2, book_id_2)
         test_fine_operations(member_id_1)
+        test_connection_pool()
+        test_schema_migrations()
+        test_full_text_search()
+        test_isbn_lookup()
+        test_bulk_import()
+        test_bulk_member_enrollment()
+        test_concurrent_borrowing()
+        test_batch_circulation()
+        test_paginated_iteration()
+        test_dashboard_stats()
+        test_unpaid_fines_listing()
+        test_member_dashboard()
+        test_row_models()
+        test_lookup_cache()
+        test_fine_accrual()
+        test_stats_counters()
+        test_async_managers()
+        test_http_service()
+        test_synthetic_data()
+        test_benchmark_suite()
+        test_query_instrumentation()
+        test_metrics()
+        test_branches()
+        test_parallel_reports()
+        test_export()
         
         print("\n" + "="*60)
         print("✓ ALL TESTS COMPLETED SUCCESSFULLY".center(60))